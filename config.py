@@ -9,6 +9,13 @@ load_dotenv()
 NEWSAPI_API_KEY = os.getenv("NEWSAPI_API_KEY")
 FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
 
+# --- NewsAPI квота и пакетиране на заявките ---
+NEWSAPI_DAILY_QUOTA = int(os.getenv("NEWSAPI_DAILY_QUOTA", "100"))  # Безплатният план: 100 заявки на ден
+NEWSAPI_MAX_REQUESTS_PER_RUN = 12   # Колко заявки може да изхарчи едно пускане на pipeline-а
+NEWSAPI_MAX_QUERY_LENGTH = 500      # Лимит на NewsAPI за дължината на параметъра q
+NEWSAPI_PAGE_SIZE = 100             # Максималният размер на страница
+NEWSAPI_MAX_PAGES = 1               # Developer планът връща само първите 100 резултата на заявка
+
 # --- ТУК Е ДОБАВКАТА ---
 KUCOIN_API_KEY = os.getenv("KUCOIN_API_KEY")
 KUCOIN_API_SECRET = os.getenv("KUCOIN_API_SECRET")
@@ -18,9 +25,21 @@ KUCOIN_API_PASSPHRASE = os.getenv("KUCOIN_API_PASSPHRASE")
 # --- Пътища ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_PATH = os.path.join(BASE_DIR, "data", "orbitron_db.sqlite")
+EMBEDDINGS_DIR = os.path.join(BASE_DIR, "data", "embeddings")
 
 # --- AI Настройки ---
 OLLAMA_MODEL = "llama3.2"
+# Списък с Ollama сървъри, разделени със запетая (напр. "http://localhost:11434,http://localhost:11435")
+OLLAMA_HOSTS = [h.strip() for h in os.getenv("OLLAMA_HOSTS", "http://localhost:11434").split(",") if h.strip()]
+OLLAMA_MAX_FAILURES = 3         # Последователни грешки, след които сървърът се изключва временно
+OLLAMA_EJECT_SECONDS = 30       # За колко секунди се изключва проблемен сървър
+OLLAMA_HEALTH_CHECK_INTERVAL = 15  # През колко секунди се проверяват изключените сървъри
+OLLAMA_EMBED_MODEL = "nomic-embed-text"  # Модел за embedding-и на новините
+OLLAMA_TRIAGE_MODEL = "llama3.2:1b"  # Малък и бърз модел за първичен подбор на заглавията
+OLLAMA_KEEP_ALIVE = "30m"            # Колко дълго Ollama държи моделите заредени между заявките
+TRIAGE_CONFIDENCE_THRESHOLD = 0.7    # Под този праг заглавието се ескалира към големия модел
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_MAX_FAILURES = 3       # След толкова поредни неуспеха партидата се индексира статия по статия
 
 # --- Списък с активи за следене ---
 ASSETS_TO_TRACK = {
@@ -31,5 +50,122 @@ ASSETS_TO_TRACK = {
     'pudgy-penguins': 'pudgy-penguins',
     'dogs-2': 'dogs-2'
 }
+# --- Синоними, по които откриваме споменаване на актив в текст ---
+ASSET_ALIASES = {
+    'bitcoin': ['bitcoin', 'btc'],
+    'solana': ['solana', 'sol'],
+    'ripple': ['ripple', 'xrp'],
+    'ethereum': ['ethereum', 'ether', 'eth'],
+    'pudgy-penguins': ['pudgy penguins', 'pudgy-penguins', 'pengu'],
+    'dogs-2': ['dogs token', '$dogs'],
+}
+# Символи на активите по борси (за свещите от KuCoin)
+ASSET_EXCHANGE_SYMBOLS = {
+    'bitcoin': {'kucoin': 'BTC-USDT'},
+    'ethereum': {'kucoin': 'ETH-USDT'},
+}
+# Горните речници само засяват таблицата assets при init_db - оттам нататък вселената от активи живее в базата
+
+# --- Вселена от активи и пазарни snapshot-и ---
+ASSET_REFRESH_INTERVALS = {1: 0, 2: 3600, 3: 6 * 3600}  # Tier -> минимум секунди между два snapshot-а
+ASSET_TIER_RANKS = {1: 100, 2: 250}   # Ранг по капитализация <= праг -> tier; останалите са tier 3
+COINGECKO_MARKETS_PAGE_SIZE = 250     # Максимумът активи в една /coins/markets заявка
+MARKET_BACKFILL_DAYS = 30             # История за нов актив
+MARKET_BACKFILL_MAX_ASSETS_PER_RUN = 10  # Исторически заявки (по една на актив) на пускане
+
 # Добави този ред при другите API ключове в config.py
-EODHD_API_KEY = os.getenv("EODHD_API_KEY")
\ No newline at end of file
+EODHD_API_KEY = os.getenv("EODHD_API_KEY")
+
+# --- Forex / макро символи от EODHD (формат: КОД.БОРСА) ---
+FOREX_SYMBOLS = [
+    'DXY.INDX',       # Доларов индекс
+    'EURUSD.FOREX',
+    'XAUUSD.FOREX',   # Злато
+    'US10Y.GBOND',    # 10-годишни US облигации
+]
+KUCOIN_TICKER_SNAPSHOT_INTERVAL = 300  # Секунди между два snapshot-а на всички KuCoin двойки
+ORDERBOOK_DEPTH = 100                  # Нива от всяка страна (KuCoin поддържа 20 или 100)
+ORDERBOOK_SNAPSHOT_INTERVAL = 60       # Секунди между два snapshot-а на стакана за една двойка
+ORDERBOOK_MAX_CONCURRENCY = 4          # Паралелни заявки за стакани
+# --- Откриване и запълване на дупки във времевите редове ---
+GAP_REPAIR_MAX_REQUESTS = {'coingecko': 5, 'kucoin': 10, 'eodhd': 5}  # Заявки за поправка на пускане
+GAP_MAX_ATTEMPTS = 3            # След толкова неуспешни опита дупката се отчита като невъзстановима
+GAP_MERGE_SLACK = 3             # Съседни дупки на до толкова налични точки се теглят с една заявка
+FOREX_INITIAL_DAYS = 30         # Колко дни история да изтеглим за нов символ
+EODHD_MAX_CONCURRENCY = 4       # Максимален брой паралелни заявки към EODHD
+
+# --- SQLite запис ---
+SQLITE_BUSY_TIMEOUT = 30        # Секунди изчакване на write lock-а преди "database is locked"
+WRITE_QUEUE_MAX_ROWS = 5000     # WriteQueue прави flush, щом натрупа толкова реда...
+WRITE_QUEUE_FLUSH_SECONDS = 0.5 # ...или щом най-старата заявка чака толкова секунди
+
+# --- Alert-и ---
+ALERT_COOLDOWN_SECONDS = 6 * 3600    # Едно правило не alert-ва повторно по-често от това
+ALERT_MAX_EVENT_AGE = 2 * 24 * 3600  # По-стари събития само обновяват състоянието на правилата
+ALERTS_FILE = os.path.join(os.path.dirname(DATABASE_PATH), "alerts.jsonl")
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")  # Без URL webhook sink-ът само логва
+# Правила: type е един от price_cross, percent_move, volume_spike, tvl_drop, negative_sentiment_surge;
+# key е asset_id от CoinGecko, KuCoin символ или верига от DefiLlama
+ALERT_RULES = [
+    {'type': 'percent_move', 'key': 'bitcoin', 'window': 1, 'pct': 5.0},
+    {'type': 'percent_move', 'key': 'ethereum', 'window': 1, 'pct': 7.0},
+    {'type': 'volume_spike', 'key': 'BTC-USDT', 'window': 24, 'multiplier': 3.0},
+    {'type': 'volume_spike', 'key': 'ETH-USDT', 'window': 24, 'multiplier': 3.0},
+    {'type': 'negative_sentiment_surge', 'key': 'bitcoin', 'window_hours': 6, 'min_count': 3, 'min_share': 0.6},
+    {'type': 'negative_sentiment_surge', 'key': 'ethereum', 'window_hours': 6, 'min_count': 3, 'min_share': 0.6},
+    {'type': 'tvl_drop', 'key': 'Ethereum', 'window': 1, 'pct': 10.0},
+    {'type': 'tvl_drop', 'key': 'Solana', 'window': 1, 'pct': 10.0},
+]
+
+# --- Локално HTTP API ---
+API_HOST = os.getenv("ORBITRON_API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("ORBITRON_API_PORT", "8765"))
+API_DEFAULT_PAGE_SIZE = 1000
+API_MAX_PAGE_SIZE = 10000
+API_STREAM_CHUNK_ROWS = 5000          # Редове на порция при NDJSON/Arrow стрийминг
+API_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Общ размер на кеша с готови отговори
+API_VERSION_TTL = 1.0                 # Колко секунди важи прочетената data_version
+
+# --- Езеро със сурови отговори от API-тата (за повторна обработка без мрежа) ---
+RAW_LAKE_ENABLED = os.getenv("RAW_LAKE_ENABLED", "1") != "0"
+RAW_LAKE_DIR = os.path.join(os.path.dirname(DATABASE_PATH), "raw")
+RAW_LAKE_COMPRESSION_LEVEL = 6      # gzip ниво: 6 е добър баланс между размер и CPU
+
+# --- In-memory hot store за последните пазарни данни ---
+HOT_STORE_CAPACITY = 1024       # Колко последни свещи/реда пазим в паметта за всеки символ
+
+# --- Опашка за AI анализ (позволява няколко паралелни worker процеса) ---
+ANALYSIS_LEASE_SECONDS = 600   # За колко секунди един worker "заема" статия
+ANALYSIS_MAX_ATTEMPTS = 3      # След толкова опита статията се счита за "отровена" и се пропуска
+
+# --- Индекс на настроенията ---
+SENTIMENT_INDEX_RESOLUTIONS = {3600: 24 * 3600, 86400: 7 * 86400}  # Размер на кофата (сек.) -> полуживот на затихващия индекс
+SENTIMENT_MACRO_SCOPE = 'macro'       # Обхватът на икономическите новини (category = economic_event)
+DEFAULT_SENTIMENT_CONFIDENCE = 0.5    # Увереност за статии, анализирани преди числовата оценка
+
+# --- Целево обновяване на един актив (CLI и бутонът в таблото) ---
+ASSET_REFRESH_MAX_STALENESS = 15 * 60   # Секунди, след които източникът се счита за остарял
+ASSET_REFRESH_MAX_ARTICLES = 10         # Най-много толкова статии за актива се анализират при обновяване
+ASSET_REFRESH_CANDLE_DAYS = 30          # История на свещите за символ без записани свещи
+
+# --- Корелации между активите ---
+CORRELATION_WINDOWS = [30, 90, 180]   # Плъзгащи прозорци (в дни) за корелация, бета и волатилност
+CORRELATION_DEFAULT_WINDOW = 90
+CORRELATION_MIN_OVERLAP = 20          # Минимум общи дневни доходности, за да се покаже корелация за двойка
+CORRELATION_BENCHMARK = 'cg:bitcoin'  # Серията, спрямо която се смятат бетите
+CORRELATION_MAX_GAP_DAYS = 5          # Доходност през по-дълга липса на данни се пропуска (Forex уикенди са до 3 дни)
+CORRELATION_HISTORY_DAYS = 730        # Колко дни история държи услугата в паметта
+
+# --- Извличане на пълния текст на статиите ---
+ARTICLE_FETCH_WORKERS = 16            # Паралелни изтегляния общо
+ARTICLE_FETCH_PER_DOMAIN = 2          # Паралелни връзки към един домейн
+ARTICLE_FETCH_DOMAIN_DELAY = 1.0      # Минимум секунди между две заявки към един домейн
+ARTICLE_FETCH_TIMEOUT = 15            # Секунди за свързване/четене
+ARTICLE_FETCH_MAX_BYTES = 2 * 1024 * 1024  # HTML-ът над този размер се отрязва при четенето
+ARTICLE_FETCH_MAX_ATTEMPTS = 3        # Неуспешните адреси се опитват наново до толкова пъти
+ARTICLE_FETCH_TIME_BUDGET = 300       # Секунди на пускане, след които стъпката спира да подава нови адреси
+ARTICLE_BODY_MAX_CHARS = 8000         # Колко символа от почистения текст се пазят
+ARTICLE_FETCH_USER_AGENT = "Mozilla/5.0 (compatible; OrbitronBot/1.0)"
+# Анализ по текста: резюме на текста на парчета, подадено на модела заедно със заглавието
+ARTICLE_BODY_ANALYSIS = os.getenv("ARTICLE_BODY_ANALYSIS", "0") == "1"
+ARTICLE_BODY_CHUNK_CHARS = 2000
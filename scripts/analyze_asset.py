@@ -1,71 +1,65 @@
 # scripts/analyze_asset.py
 import sys
 import os
-from datetime import datetime
+import argparse
 
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
-from config import ASSETS_TO_TRACK
+from config import ASSETS_TO_TRACK, ASSET_REFRESH_MAX_STALENESS
 from src.database.database_manager import DatabaseManager
-from src.data_ingestion.newsapi_client import NewsApiClient
-from src.data_ingestion.coingecko_client import CoinGeckoClient
+from src.data_ingestion.asset_refresh import AssetRefresher, build_asset_refresher, format_freshness
 from src.analysis.ai_analyzer import AIAnalyzer
+from src.analysis.asset_matcher import AssetMatcher
 
-def run_targeted_pipeline(asset_name: str):
-    if asset_name.lower() not in ASSETS_TO_TRACK:
+def run_targeted_pipeline(asset_name: str, max_staleness: int = ASSET_REFRESH_MAX_STALENESS,
+                          check_only: bool = False, with_analysis: bool = True):
+    """
+    Целево обновяване на един актив: тегли само остарелите му източници,
+    анализира първо неговите статии и отпечатва свежестта преди и след.
+    """
+    db_manager = DatabaseManager()
+    tracked_ids = db_manager.get_tracked_asset_ids()
+    asset_id = ASSETS_TO_TRACK.get(asset_name.lower(), asset_name.lower())
+    if asset_id not in tracked_ids:
         print(f"❌ Грешка: Активът '{asset_name}' не е намерен.")
-        print("Налични активи:", ", ".join(ASSETS_TO_TRACK.keys()))
+        print("Налични активи:", ", ".join(tracked_ids))
         return
 
-    asset_id = ASSETS_TO_TRACK[asset_name.lower()]
-    print(f"🚀🚀🚀 STARTING TARGETED ANALYSIS FOR: {asset_name.upper()} 🚀🚀🚀")
-
-    db_manager = DatabaseManager()
-    news_api_client = NewsApiClient()
-    coingecko_client = CoinGeckoClient()
-    ai_analyzer = AIAnalyzer()
-
-    print("\n--- 📰 STEP 1: COLLECTING NEWS ---")
-    targeted_keywords = ['crypto', 'blockchain', asset_name, asset_id]
-    news_articles = news_api_client.fetch_general_news(targeted_keywords)
-    if news_articles:
-        rows_saved = db_manager.save_articles(news_articles)
-        print(f"💾 Found {len(news_articles)} articles. Saved {rows_saved} new ones.")
-
-    print("\n--- 🧠 STEP 2: RUNNING AI ANALYSIS ---")
-    unprocessed_articles = db_manager.get_unprocessed_articles(limit=10)
-    if unprocessed_articles:
-        print(f"Found {len(unprocessed_articles)} articles. Analyzing...")
-        for article in unprocessed_articles:
-            analysis = ai_analyzer.analyze_article_title(article['title'])
-            if analysis:
-                db_manager.update_article_analysis(article['id'], analysis)
-                print(f"   -> ✅ AI analysis for article #{article['id']} saved.")
-    else:
-        print("No new articles to analyze.")
-
-    print("\n--- 📈 STEP 3: COLLECTING MARKET DATA ---")
-    last_date_str = db_manager.get_latest_market_data_date(asset_id)
-    days_to_fetch = 30
-    if last_date_str:
-        last_date = datetime.strptime(last_date_str, '%Y-%m-%d')
-        days_diff = (datetime.now() - last_date).days
-        days_to_fetch = days_diff if days_diff > 0 else 1
-    
-    print(f"Fetching last {days_to_fetch} days of market data for '{asset_name}'...")
-    market_data = coingecko_client.fetch_historical_data(asset_id, days=days_to_fetch)
-    if market_data:
-        rows_saved = db_manager.save_market_data(market_data)
-        print(f"   -> 💾 Saved {rows_saved} new market data records.")
+    if check_only:
+        refresher = AssetRefresher(db_manager, {})
+        print(f"🔎 Freshness of {asset_id} (max staleness {max_staleness // 60} min):")
+        for line in format_freshness(refresher.check(asset_id, max_staleness)):
+            print(f"   {line}")
+        return
 
-    print(f"\n🏁🏁🏁 TARGETED ANALYSIS FOR {asset_name.upper()} FINISHED! 🏁🏁🏁")
+    print(f"🎯 STARTING TARGETED REFRESH FOR: {asset_id.upper()}")
+    ai_analyzer = AIAnalyzer(asset_matcher=AssetMatcher.from_database(db_manager)) if with_analysis else None
+    report = build_asset_refresher(db_manager, ai_analyzer).refresh(asset_id, max_staleness)
+    print("\nBefore:")
+    for line in format_freshness(report['before']):
+        print(f"   {line}")
+    print(f"\nSaved: {report['saved'] or 'nothing - all sources were fresh'}")
+    print("\nAfter:")
+    for line in format_freshness(report['after']):
+        print(f"   {line}")
+    print(f"\n🏁 TARGETED REFRESH FOR {asset_id.upper()} FINISHED IN {report['seconds']}s")
 
 if __name__ == "__main__":
-    print("Available assets for analysis:")
-    print(" - " + "\n - ".join(ASSETS_TO_TRACK.keys()))
-    target_asset = input("\nEnter the name of the asset you want to analyze: ")
+    parser = argparse.ArgumentParser(description="Refresh a single asset: fetch only its stale sources and analyze its news")
+    parser.add_argument("asset", nargs="?", help="Id на актива (по подразбиране - пита интерактивно)")
+    parser.add_argument("--max-staleness", type=int, default=ASSET_REFRESH_MAX_STALENESS // 60,
+                        help="Минути, след които източникът се счита за остарял")
+    parser.add_argument("--check", action="store_true", help="Само проверка на свежестта, без заявки")
+    parser.add_argument("--no-analysis", action="store_true", help="Без AI анализ на статиите")
+    args = parser.parse_args()
+
+    target_asset = args.asset
+    if not target_asset:
+        print("Available assets for analysis:")
+        print(" - " + "\n - ".join(DatabaseManager().get_tracked_asset_ids()))
+        target_asset = input("\nEnter the name of the asset you want to analyze: ")
     if target_asset:
-        run_targeted_pipeline(target_asset)
+        run_targeted_pipeline(target_asset, args.max_staleness * 60, args.check, not args.no_analysis)
     else:
-        print("No asset entered. Exiting.")
\ No newline at end of file
+        print("No asset entered. Exiting.")
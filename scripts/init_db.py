@@ -9,6 +9,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 # --- КРАЙ НА ДОБАВЕНИЯ БЛОК ---
 
+from config import ASSETS_TO_TRACK, ASSET_ALIASES, ASSET_EXCHANGE_SYMBOLS
 from src.database.database_manager import DatabaseManager
 
 # Настройваме логър за скрипта
@@ -16,6 +17,9 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 # Дефинираме SQL командите за всички таблици в един стринг
 CREATE_TABLES_SQL = """
+-- WAL: читателите (dashboard, API) не блокират писателя и обратно --
+PRAGMA journal_mode = WAL;
+
 CREATE TABLE IF NOT EXISTS articles (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     source TEXT,
@@ -27,7 +31,9 @@ CREATE TABLE IF NOT EXISTS articles (
     summary TEXT,
     sentiment TEXT,
     reasoning TEXT,
-    investment_factors TEXT
+    investment_factors TEXT,
+    sentiment_score REAL,
+    sentiment_confidence REAL
 );
 
 CREATE TABLE IF NOT EXISTS market_data (
@@ -69,8 +75,235 @@ CREATE TABLE IF NOT EXISTS forex_data (
     volume INTEGER,
     PRIMARY KEY (symbol, date)
 );
+
+-- Опашка за AI анализ: кой worker държи статията, до кога, и колко опита са направени --
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    article_id INTEGER PRIMARY KEY REFERENCES articles(id),
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_articles_unprocessed
+    ON articles (category, fetched_at) WHERE summary IS NULL;
+
+-- Извлеченият основен текст на статиите (status: ok / failed / skipped) --
+CREATE TABLE IF NOT EXISTS article_bodies (
+    article_id INTEGER PRIMARY KEY REFERENCES articles(id),
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    http_status INTEGER,
+    content_hash TEXT,
+    body TEXT,
+    body_chars INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    fetched_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_article_bodies_hash ON article_bodies (content_hash);
+
+-- Резюмета на текстовете по съдържание: еднакъв текст на различни адреси се резюмира веднъж --
+CREATE TABLE IF NOT EXISTS body_summaries (
+    content_hash TEXT PRIMARY KEY,
+    model TEXT,
+    summary TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Към кои активи се отнася всяка анализирана статия --
+CREATE TABLE IF NOT EXISTS article_assets (
+    asset_id TEXT NOT NULL,
+    article_id INTEGER NOT NULL REFERENCES articles(id),
+    PRIMARY KEY (asset_id, article_id)
+);
+
+-- Индекс на настроенията по обхват (актив или 'macro') и размер на кофата (3600 / 86400 сек.) --
+-- Поддържа се инкрементално: нова статия обновява само своите кофи и затихващия индекс след тях --
+CREATE TABLE IF NOT EXISTS sentiment_index (
+    scope TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    bucket_start INTEGER NOT NULL,
+    positive INTEGER NOT NULL DEFAULT 0,
+    negative INTEGER NOT NULL DEFAULT 0,
+    neutral INTEGER NOT NULL DEFAULT 0,
+    article_count INTEGER NOT NULL DEFAULT 0,
+    score_sum REAL NOT NULL DEFAULT 0,      -- сума от score * confidence
+    weight_sum REAL NOT NULL DEFAULT 0,     -- сума от confidence
+    mean_score REAL,                        -- score_sum / weight_sum, в -1..1
+    decayed_score REAL,                     -- score_sum, затихващ с полуживота на резолюцията
+    decayed_weight REAL,
+    decayed_index REAL,                     -- decayed_score / decayed_weight, в -1..1
+    PRIMARY KEY (scope, resolution, bucket_start)
+) WITHOUT ROWID;
+
+-- Готово "табло" по актив, което pipeline-ът обновява и dashboard-ът само чете --
+CREATE TABLE IF NOT EXISTS asset_snapshots (
+    asset_id TEXT PRIMARY KEY,
+    price REAL,
+    price_change REAL,
+    price_change_pct REAL,
+    market_cap REAL,
+    total_volume REAL,
+    market_date TEXT,
+    positive_24h INTEGER NOT NULL DEFAULT 0,
+    negative_24h INTEGER NOT NULL DEFAULT 0,
+    neutral_24h INTEGER NOT NULL DEFAULT 0,
+    positive_7d INTEGER NOT NULL DEFAULT 0,
+    negative_7d INTEGER NOT NULL DEFAULT 0,
+    neutral_7d INTEGER NOT NULL DEFAULT 0,
+    positive_30d INTEGER NOT NULL DEFAULT 0,
+    negative_30d INTEGER NOT NULL DEFAULT 0,
+    neutral_30d INTEGER NOT NULL DEFAULT 0,
+    sentiment_index REAL,
+    recent_summaries TEXT,
+    market_updated_at DATETIME,
+    sentiment_updated_at DATETIME
+);
+
+-- Вселената от следени активи; id е CoinGecko id-то --
+CREATE TABLE IF NOT EXISTS assets (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    symbol TEXT,
+    exchange_symbols TEXT,              -- JSON: {"kucoin": "BTC-USDT"}
+    aliases TEXT,                       -- JSON списък със синоними за AssetMatcher
+    enabled INTEGER NOT NULL DEFAULT 1,
+    refresh_tier INTEGER NOT NULL DEFAULT 1,
+    market_cap_rank INTEGER,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_assets_enabled_tier ON assets (enabled, refresh_tier);
+
+-- Версия на всеки набор от данни; увеличава се при всеки запис (основа за ETag-овете на API-то) --
+CREATE TABLE IF NOT EXISTS data_version (
+    dataset TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Интернирани символи на борсовите двойки: snapshot-ите пазят малко цяло число вместо низ --
+CREATE TABLE IF NOT EXISTS market_symbols (
+    id INTEGER PRIMARY KEY,
+    exchange TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    UNIQUE(exchange, symbol)
+);
+
+-- Snapshot на всички двойки от една all-tickers заявка (24h прозорец към snapshot_ts) --
+CREATE TABLE IF NOT EXISTS ticker_snapshots (
+    snapshot_ts INTEGER NOT NULL,
+    symbol_id INTEGER NOT NULL REFERENCES market_symbols(id),
+    last REAL,
+    change_rate REAL,
+    volume_24h REAL,
+    quote_volume_24h REAL,
+    PRIMARY KEY (snapshot_ts, symbol_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_ticker_snapshots_symbol ON ticker_snapshots(symbol_id, snapshot_ts);
+
+-- Snapshot-и на стакана: нивата са в делта кодиран blob (src/analysis/orderbook.py), а
+-- характеристиките на ликвидността - в отделни колони за бързи заявки без декодиране --
+CREATE TABLE IF NOT EXISTS orderbook_snapshots (
+    symbol_id INTEGER NOT NULL REFERENCES market_symbols(id),
+    snapshot_ts INTEGER NOT NULL,
+    sequence INTEGER,
+    levels BLOB NOT NULL,
+    mid REAL,
+    spread_bps REAL,
+    imbalance REAL,
+    bid_depth REAL,
+    ask_depth REAL,
+    bid_slope REAL,
+    ask_slope REAL,
+    UNIQUE(symbol_id, snapshot_ts)
+);
+
+-- Открити дупки във времевите редове (gap_start/gap_end са Unix секунди на първата и последната липсваща точка).
+-- status: open (чака поправка), repaired, unrecoverable (доставчикът няма данни след GAP_MAX_ATTEMPTS опита) --
+CREATE TABLE IF NOT EXISTS series_gaps (
+    dataset TEXT NOT NULL,
+    series_key TEXT NOT NULL,
+    gap_start INTEGER NOT NULL,
+    gap_end INTEGER NOT NULL,
+    missing_points INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'open',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_attempt DATETIME,
+    last_error TEXT,
+    PRIMARY KEY (dataset, series_key, gap_start)
+);
+
+-- Манифест на езерото със сурови отговори: един ред за всяка различна (заявка, съдържание) двойка.
+-- Идентичните отговори споделят един компресиран blob (path), адресиран по SHA-256 (digest) --
+CREATE TABLE IF NOT EXISTS raw_responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    provider TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    params TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    path TEXT NOT NULL,
+    raw_bytes INTEGER,
+    stored_bytes INTEGER,
+    fetched_at INTEGER NOT NULL,
+    UNIQUE(provider, endpoint, params, digest)
+);
+CREATE INDEX IF NOT EXISTS idx_raw_responses_digest ON raw_responses(digest);
+CREATE INDEX IF NOT EXISTS idx_raw_responses_fetched ON raw_responses(provider, fetched_at);
+
+-- Изразходвани заявки по външно API и ден (UTC) - за следене на дневните квоти --
+CREATE TABLE IF NOT EXISTS api_usage (
+    provider TEXT NOT NULL,
+    day TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (provider, day)
+);
+
+-- Кога за последно е обновен даден източник за даден ключ (текущ пазарен snapshot и новини по актив, свещи по символ) --
+-- Стаканите имат собствени времена; тук са източниците, чиито данни не казват кога са проверени --
+-- Пази и курсори на ротация (source = доставчикът), напр. следващият пакет заявки на NewsAPI --
+CREATE TABLE IF NOT EXISTS freshness_watermarks (
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    refreshed_at INTEGER NOT NULL,
+    PRIMARY KEY (source, key)
+) WITHOUT ROWID;
+
+-- Alert-и от AlertEngine; dedup_key (правило + момент на събитието) не допуска дубликати --
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    rule_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    message TEXT NOT NULL,
+    value REAL,
+    event_ts INTEGER NOT NULL,
+    dedup_key TEXT NOT NULL UNIQUE,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Инкременталното състояние на всяко правило (плъзгащи се прозорци, watermark, cooldown) --
+CREATE TABLE IF NOT EXISTS alert_rule_state (
+    rule_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
 """
 
+# Колони, добавени след първата версия на таблиците - CREATE TABLE IF NOT EXISTS не ги добавя в съществуваща база
+ADDED_COLUMNS = {
+    'articles': {'sentiment_score': 'REAL', 'sentiment_confidence': 'REAL'},
+    'asset_snapshots': {'sentiment_index': 'REAL'},
+}
+
+# Таблици, които вече никой не чете и не пише; изтриват се едва след като заместникът им е попълнен.
+# asset_sentiment_hourly (почасови броячи по актив) е заменена от sentiment_index, който се
+# преизгражда от article_assets + articles, така че изтриването не губи данни.
+RETIRED_TABLES = ['asset_sentiment_hourly']
+
 def initialize_database():
     """
     Основна функция за инициализация на базата данни.
@@ -80,6 +313,17 @@ def initialize_database():
     try:
         db_manager = DatabaseManager()
         db_manager.execute_script(CREATE_TABLES_SQL)
+        for table, columns in ADDED_COLUMNS.items():
+            db_manager.add_missing_columns(table, columns)
+        if not db_manager.has_sentiment_index():
+            db_manager.rebuild_sentiment_index()
+        db_manager.execute_script("".join(f"DROP TABLE IF EXISTS {table};\n" for table in RETIRED_TABLES))
+        db_manager.seed_assets([
+            {'id': asset_id, 'name': asset_name, 'symbol': None,
+             'aliases': ASSET_ALIASES.get(asset_name, [asset_name]),
+             'exchange_symbols': ASSET_EXCHANGE_SYMBOLS.get(asset_id, {})}
+            for asset_name, asset_id in ASSETS_TO_TRACK.items()
+        ])
         logging.info("✅ Базата данни е инициализирана. Таблиците са създадени или вече съществуват.")
     except Exception as e:
         logging.error(f"❌ Възникна грешка при инициализация на базата данни: {e}")
@@ -0,0 +1,42 @@
+# scripts/rebuild_snapshots.py
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.database.database_manager import DatabaseManager
+from src.analysis.asset_matcher import AssetMatcher
+
+def rebuild_snapshots(batch_size: int = 500):
+    """
+    Попълва snapshot таблиците от вече съществуващите данни.
+    Нужно е само веднъж - след това pipeline-ът ги поддържа инкрементално.
+    """
+    db_manager = DatabaseManager()
+    matcher = AssetMatcher.from_database(db_manager)
+
+    print("--- 📰 Linking analyzed articles to assets ---")
+    last_id, total = 0, 0
+    while True:
+        articles = db_manager.get_analyzed_articles_after_id(last_id, limit=batch_size)
+        if not articles:
+            break
+        for article in articles:
+            article['asset_ids'] = matcher.match_asset_ids(article['title'], article.get('category'))
+        total += db_manager.link_article_scopes(
+            [a for a in articles if a['asset_ids'] or a.get('category') == 'economic_event'])
+        last_id = articles[-1]['id']
+    print(f"   -> Linked {total} article/scope pairs.")
+
+    print("--- 📊 Rebuilding the sentiment index ---")
+    print(f"   -> {db_manager.rebuild_sentiment_index()} buckets.")
+
+    print("--- 📈 Refreshing asset snapshots ---")
+    asset_ids = db_manager.get_tracked_asset_ids()
+    db_manager.refresh_sentiment_snapshots(asset_ids)
+    db_manager.refresh_market_snapshots(asset_ids)
+    print("🏁 Snapshots rebuilt.")
+
+if __name__ == "__main__":
+    rebuild_snapshots()
@@ -0,0 +1,53 @@
+# scripts/repair_gaps.py
+import sys
+import os
+import argparse
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.database.database_manager import DatabaseManager
+from src.data_ingestion.gap_repair import GapRepairer, GAP_DATASETS, format_gap_report
+
+def run_gap_repair(datasets, scan_only: bool):
+    """
+    Открива дупките в пазарните данни, свещите и Forex сериите и (освен при
+    --scan-only) ги запълва с целеви заявки само за липсващите прозорци.
+    Накрая отпечатва дупките, които доставчиците не могат да запълнят.
+    """
+    db_manager = DatabaseManager()
+    if scan_only:
+        repairer = GapRepairer(db_manager, {})
+        open_gaps = repairer.scan(datasets)
+        for dataset, gaps_by_key in sorted(open_gaps.items()):
+            total = sum(len(gaps) for gaps in gaps_by_key.values())
+            print(f"🔎 {dataset}: {total} open gaps in {len(gaps_by_key)} series")
+    else:
+        from src.data_ingestion.raw_lake import RawLake
+        from src.data_ingestion.coingecko_client import CoinGeckoClient
+        from src.data_ingestion.kucoin_client import KucoinHandler
+        from src.data_ingestion.eodhd_client import EODHDClient
+
+        raw_lake = RawLake(db_manager)
+        repairer = GapRepairer(db_manager, {
+            'coingecko': CoinGeckoClient(raw_lake=raw_lake),
+            'kucoin': KucoinHandler(raw_lake=raw_lake),
+            'eodhd': EODHDClient(raw_lake=raw_lake),
+        })
+        stats = repairer.repair(datasets)
+        print(f"🩹 Repair finished: {stats}")
+
+    unrecoverable = [g for g in db_manager.get_series_gaps(statuses=['unrecoverable'])
+                     if not datasets or g['dataset'] in datasets]
+    if unrecoverable:
+        print(f"\n⚠️ {len(unrecoverable)} unrecoverable gaps:")
+        for line in format_gap_report(unrecoverable):
+            print(f"   {line}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect and repair gaps in the stored time series")
+    parser.add_argument("--dataset", nargs="*", choices=sorted(GAP_DATASETS),
+                        help="Само тези набори (по подразбиране - всички)")
+    parser.add_argument("--scan-only", action="store_true", help="Само сканиране, без заявки към доставчиците")
+    args = parser.parse_args()
+    run_gap_repair(args.dataset, args.scan_only)
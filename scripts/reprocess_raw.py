@@ -0,0 +1,44 @@
+# scripts/reprocess_raw.py
+import sys
+import os
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.database.database_manager import DatabaseManager
+from src.data_ingestion.reprocessor import reprocess, PARSERS
+
+def _to_ts(date_str: str) -> int:
+    return int(datetime.strptime(date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+def run_reprocess(providers, since: str, until: str, workers: int):
+    """
+    Преизгражда пазарните данни, свещите, TVL, Forex и новините от езерото
+    със сурови отговори (data/raw) - без нито една заявка към външните API-та.
+    Използва се след поправка в парсер или промяна в схемата.
+    """
+    db_manager = DatabaseManager()
+    since_ts = _to_ts(since) if since else None
+    # --until е включителна дата
+    until_ts = _to_ts(until) + int(timedelta(days=1).total_seconds()) if until else None
+    started = time.perf_counter()
+    rows_by_kind = reprocess(db_manager, providers, since_ts, until_ts, workers)
+    if not rows_by_kind:
+        print("ℹ️ Nothing was reprocessed.")
+        return
+    for kind, rows in sorted(rows_by_kind.items()):
+        print(f"   -> 💾 {kind}: {rows} rows written")
+    print(f"⏱️ Reprocess finished in {time.perf_counter() - started:.1f}s.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild derived tables from the raw response lake (offline)")
+    parser.add_argument("--provider", nargs="*", choices=sorted({p for p, _ in PARSERS}),
+                        help="Само тези доставчици (по подразбиране - всички)")
+    parser.add_argument("--since", help="От дата на изтегляне YYYY-MM-DD (UTC)")
+    parser.add_argument("--until", help="До дата на изтегляне YYYY-MM-DD включително (UTC)")
+    parser.add_argument("--workers", type=int, default=None, help="Брой процеси (по подразбиране - всички ядра)")
+    args = parser.parse_args()
+    run_reprocess(args.provider, args.since, args.until, args.workers)
@@ -0,0 +1,52 @@
+# scripts/run_analysis_worker.py
+import sys
+import os
+import socket
+import time
+import argparse
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.database.database_manager import DatabaseManager
+from src.analysis.ai_analyzer import AIAnalyzer
+
+def run_worker(batch_size: int, idle_sleep: float, forever: bool):
+    """
+    Самостоятелен AI worker. Може да се стартират няколко копия едновременно
+    срещу една и съща база - опашката в analysis_jobs гарантира, че всяка
+    статия се анализира само от един процес.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    db_manager = DatabaseManager()
+    ai_analyzer = AIAnalyzer(warm_up=True)
+    print(f"🧠 Analysis worker {worker_id} started (batch size: {batch_size}).")
+
+    while True:
+        db_manager.recover_expired_leases()
+        claimed_articles = db_manager.claim_articles_for_analysis(worker_id, limit=batch_size)
+        if not claimed_articles:
+            if not forever:
+                break
+            time.sleep(idle_sleep)
+            continue
+
+        for article, analysis in ai_analyzer.analyze_articles(claimed_articles):
+            if analysis:
+                asset_ids = ai_analyzer.asset_matcher.match_asset_ids(article['title'], article.get('category'))
+                db_manager.update_article_analysis(article['id'], analysis, asset_ids=asset_ids, published_at=article.get('published_at'))
+                print(f"   -> ✅ [{worker_id}] article #{article['id']} analyzed.")
+            else:
+                db_manager.release_article_lease(article['id'], error=f"analysis failed on attempt {article['attempts']}")
+
+    ai_analyzer.pool.log_stats()
+    ai_analyzer.log_tier_stats()
+    print(f"🏁 Analysis worker {worker_id} finished - queue is empty.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Orbitron AI analysis worker")
+    parser.add_argument("--batch-size", type=int, default=10, help="Колко статии да се заемат наведнъж")
+    parser.add_argument("--idle-sleep", type=float, default=30.0, help="Пауза (сек.) при празна опашка в --forever режим")
+    parser.add_argument("--forever", action="store_true", help="Не спирай при празна опашка")
+    args = parser.parse_args()
+    run_worker(args.batch_size, args.idle_sleep, args.forever)
@@ -0,0 +1,36 @@
+# scripts/run_api.py
+import sys
+import os
+import argparse
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from config import API_HOST, API_PORT
+from src.api.server import create_server
+
+def run_api(host: str, port: int):
+    """
+    Локално read-only HTTP API върху базата. Примери:
+      /api/candles?symbol=BTC-USDT&start=1700000000&limit=500
+      /api/market_data?asset_id=bitcoin&start=2025-01-01&format=ndjson
+      /api/news?asset_id=ethereum&cursor=<next_cursor>
+      /api/tvl?chain=Ethereum&format=arrow
+      /api/tickers?symbol=SOL-USDT&start=1700000000
+    """
+    server = create_server(host, port)
+    print(f"🌐 Orbitron data API listening on http://{host}:{port}/api/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("🛑 API server stopped.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Orbitron read-only data API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    run_api(args.host, args.port)
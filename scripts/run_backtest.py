@@ -0,0 +1,46 @@
+# scripts/run_backtest.py
+import sys
+import os
+import time
+import argparse
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.database.database_manager import DatabaseManager
+from src.analysis.backtester import (
+    PricePanel, build_param_grid, sample_params, run_sweep, summarize_sweep
+)
+
+def run_backtest(asset_ids, mode: str, samples: int, workers: int, fee_bps: float,
+                 slippage_bps: float, top: int, output: str = None):
+    """Зарежда цените и настроенията веднъж и пуска параметричния sweep върху всички активи."""
+    db_manager = DatabaseManager()
+    panel = PricePanel.from_database(db_manager, asset_ids or db_manager.get_tracked_asset_ids())
+    params_list = build_param_grid() if mode == "grid" else sample_params(n=samples)
+    print(f"📊 Backtesting {len(params_list)} parameter sets x {len(panel.asset_ids)} assets "
+          f"over {len(panel.dates)} days ({panel.dates[0]} -> {panel.dates[-1]}).")
+
+    started = time.perf_counter()
+    results = run_sweep(panel, params_list, workers=workers, fee_bps=fee_bps, slippage_bps=slippage_bps)
+    print(f"⏱️ Sweep finished in {time.perf_counter() - started:.1f}s.")
+
+    print(f"\n🏆 Top {top} parameter sets (mean across assets):")
+    print(summarize_sweep(results, top).to_string(index=False))
+    if output:
+        results.to_csv(output, index=False)
+        print(f"💾 Full results saved to {output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Orbitron vectorized backtester")
+    parser.add_argument("--assets", nargs="*", help="CoinGecko id-та на активите (по подразбиране - всички следени)")
+    parser.add_argument("--mode", choices=["grid", "random"], default="grid", help="Пълна решетка или случайна извадка")
+    parser.add_argument("--samples", type=int, default=1000, help="Брой комбинации в random режим")
+    parser.add_argument("--workers", type=int, default=None, help="Брой процеси (по подразбиране - всички ядра)")
+    parser.add_argument("--fee-bps", type=float, default=10.0, help="Такса на сделка в базисни пунктове")
+    parser.add_argument("--slippage-bps", type=float, default=5.0, help="Slippage на сделка в базисни пунктове")
+    parser.add_argument("--top", type=int, default=10, help="Колко най-добри комбинации да се покажат")
+    parser.add_argument("--output", help="CSV файл за всички резултати")
+    args = parser.parse_args()
+    run_backtest(args.assets, args.mode, args.samples, args.workers, args.fee_bps,
+                 args.slippage_bps, args.top, args.output)
@@ -0,0 +1,45 @@
+# scripts/run_orderbook_collector.py
+import sys
+import os
+import time
+import argparse
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from config import ORDERBOOK_DEPTH, ORDERBOOK_SNAPSHOT_INTERVAL
+from src.database.database_manager import DatabaseManager
+from src.data_ingestion.kucoin_client import KucoinHandler
+from src.analysis.orderbook import capture_snapshots
+
+def run_collector(depth: int, interval: int, symbols=None, once: bool = False):
+    """
+    Непрекъснато събиране на стаканите за следените KuCoin двойки (или
+    подадените symbols) на всеки interval секунди. Списъкът със следени
+    двойки се чете наново всеки цикъл, така че нови активи се включват сами.
+    """
+    db_manager = DatabaseManager()
+    kucoin_handler = KucoinHandler()
+    print(f"📚 Order book collector started: {depth} levels every {interval}s (Ctrl+C to stop).")
+    try:
+        while True:
+            started = time.monotonic()
+            pairs = symbols or [a['exchange_symbols']['kucoin'] for a in db_manager.get_tracked_assets()
+                                if a['exchange_symbols'].get('kucoin')]
+            rows_saved = capture_snapshots(db_manager, kucoin_handler, pairs, depth)
+            elapsed = time.monotonic() - started
+            print(f"   -> 💾 Saved {rows_saved}/{len(pairs)} order book snapshots in {elapsed:.1f}s.")
+            if once:
+                return
+            time.sleep(max(0.0, interval - elapsed))
+    except KeyboardInterrupt:
+        print("🛑 Order book collector stopped.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Periodic KuCoin order book depth snapshots")
+    parser.add_argument("--depth", type=int, choices=[20, 100], default=ORDERBOOK_DEPTH, help="Нива от всяка страна")
+    parser.add_argument("--interval", type=int, default=ORDERBOOK_SNAPSHOT_INTERVAL, help="Секунди между snapshot-ите")
+    parser.add_argument("--symbols", nargs="*", help="KuCoin двойки (по подразбиране - следените активи)")
+    parser.add_argument("--once", action="store_true", help="Един snapshot и изход")
+    args = parser.parse_args()
+    run_collector(args.depth, args.interval, args.symbols, args.once)
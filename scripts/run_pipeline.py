@@ -2,6 +2,8 @@ print("DEBUG: Файлът run_pipeline.py започва да се изпълн
 
 import sys
 import os
+import socket
+from collections import Counter
 from datetime import datetime, timedelta
 
 print("DEBUG: Основните модули са импортирани.")
@@ -14,15 +16,29 @@ print(f"DEBUG: Пътят към проекта '{project_root}' е добаве
 
 # --- ИМПОРТИ ---
 try:
-    from config import ASSETS_TO_TRACK
+    from config import (
+        FOREX_SYMBOLS, FOREX_INITIAL_DAYS, ASSET_REFRESH_INTERVALS,
+        MARKET_BACKFILL_MAX_ASSETS_PER_RUN, KUCOIN_TICKER_SNAPSHOT_INTERVAL,
+        ORDERBOOK_DEPTH, ORDERBOOK_SNAPSHOT_INTERVAL
+    )
     from src.database.database_manager import DatabaseManager
+    from src.database.hot_store import HotStore, get_hot_store, peek_hot_store
+    from src.database.write_queue import WriteQueue
     from src.data_ingestion.rss_client import fetch_rss_articles
+    from src.data_ingestion.raw_lake import RawLake
+    from src.data_ingestion.article_fetcher import ArticleFetcher
     from src.data_ingestion.newsapi_client import NewsApiClient
     from src.data_ingestion.coingecko_client import CoinGeckoClient
     from src.analysis.ai_analyzer import AIAnalyzer
+    from src.analysis.embedding_index import ArticleEmbedder
+    from src.analysis.alert_engine import AlertEngine
+    from src.analysis.asset_matcher import AssetMatcher
+    from src.analysis.orderbook import capture_snapshots
     from src.data_ingestion.kucoin_client import KucoinHandler
     from src.data_ingestion.defillama_client import DefiLlamaHandler
     from src.data_ingestion.eodhd_client import EODHDClient
+    from src.data_ingestion.gap_repair import GapRepairer
+    from src.utils.time_utils import count_business_days
     print("DEBUG: Всички модули от проекта са импортирани успешно.")
 except ImportError as e:
     print(f"FATAL ERROR: Неуспешен импорт на модул от проекта: {e}")
@@ -32,58 +48,126 @@ except ImportError as e:
 ECONOMIC_NEWS_KEYWORDS = ['inflation', 'interest rate', 'GDP', 'FOMC', 'unemployment']
 
 # ... (всички run_..._pipeline функции остават същите) ...
-def run_news_pipeline(db_manager: DatabaseManager, news_api_client: NewsApiClient):
+def run_news_pipeline(db_manager: DatabaseManager, news_api_client: NewsApiClient, writer=None):
     print("\n--- 📰 STEP 1: COLLECTING NEWS ---")
+    writer = writer or db_manager
     rss_articles = fetch_rss_articles()
     asset_articles = news_api_client.fetch_asset_news()
+    db_manager.record_freshness('news', news_api_client.covered_assets)
     economic_articles = news_api_client.fetch_economic_news(ECONOMIC_NEWS_KEYWORDS)
+    news_api_client.log_usage()
     all_articles = rss_articles + asset_articles + economic_articles
     unique_articles = list({article['url']: article for article in all_articles if article.get('url')}.values())
     if unique_articles:
-        rows_saved = db_manager.save_articles(unique_articles)
+        rows_saved = writer.save_articles(unique_articles)
         print(f"💾 Found {len(unique_articles)} unique articles. Saved {rows_saved} new ones to the database.")
 
-def run_ai_analysis_pipeline(db_manager: DatabaseManager, ai_analyzer: AIAnalyzer):
+def run_embedding_pipeline(article_embedder: ArticleEmbedder):
+    print("\n--- 🧭 STEP 1b: EMBEDDING NEW ARTICLES ---")
+    embedded = article_embedder.run()
+    if embedded:
+        print(f"   -> Indexed {embedded} new articles for related-news search.")
+    else:
+        print("   -> No new articles to embed.")
+
+def run_article_body_pipeline(article_fetcher: ArticleFetcher):
+    print("\n--- 📄 STEP 1c: EXTRACTING ARTICLE BODIES ---")
+    stats = article_fetcher.run()
+    if stats:
+        print(f"   -> Extracted {stats.get('ok', 0)} bodies ({stats.get('failed', 0)} failed, {stats.get('skipped', 0)} skipped).")
+    else:
+        print("   -> No new articles to fetch.")
+
+def run_ai_analysis_pipeline(db_manager: DatabaseManager, ai_analyzer: AIAnalyzer, batch_size: int = 30,
+                             alert_engine: AlertEngine = None):
     print("\n--- 🧠 STEP 2: RUNNING AI ANALYSIS ---")
-    # ...
-    unprocessed_articles = db_manager.get_unprocessed_articles(limit=30)
-    if not unprocessed_articles:
+    # Всеки процес има уникален идентификатор, за да могат няколко worker-а да работят едновременно
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    # Прозорците 24h/7d/30d в snapshot-ите се плъзгат и без нови статии
+    db_manager.refresh_sentiment_snapshots(db_manager.get_tracked_asset_ids())
+    db_manager.recover_expired_leases()
+    claimed_articles = db_manager.claim_articles_for_analysis(worker_id, limit=batch_size)
+    if not claimed_articles:
         print("No new articles to analyze.")
         return
-    print(f"Found {len(unprocessed_articles)} unprocessed articles. Starting AI analysis...")
-    for article in unprocessed_articles:
-        is_economic = article.get('category') == 'economic_event'
-        analysis = ai_analyzer.analyze_article_title(article['title'], is_economic=is_economic)
+    print(f"Worker {worker_id} claimed {len(claimed_articles)} unprocessed articles. Starting AI analysis...")
+    # Статиите се анализират паралелно, разпределени между всички Ollama сървъри
+    for article, analysis in ai_analyzer.analyze_articles(claimed_articles):
         if analysis:
-            db_manager.update_article_analysis(article['id'], analysis)
+            if article.get('content_hash') and article.get('body_summary'):
+                db_manager.save_body_summary(article['content_hash'], ai_analyzer.triage_model or ai_analyzer.model,
+                                             article['body_summary'])
+            asset_ids = ai_analyzer.asset_matcher.match_asset_ids(article['title'], article.get('category'))
+            db_manager.update_article_analysis(article['id'], analysis, asset_ids=asset_ids,
+                                               published_at=article.get('published_at'), category=article.get('category'))
+            if alert_engine is not None and asset_ids:
+                alert_engine.on_article_analysis(article, analysis, asset_ids)
             print(f"   -> ✅ AI analysis for article #{article['id']} '{article['title'][:30]}...' saved.")
+        else:
+            db_manager.release_article_lease(article['id'], error=f"analysis failed on attempt {article['attempts']}")
+    poisoned = db_manager.count_poisoned_articles()
+    if poisoned:
+        print(f"   -> ⚠️ {poisoned} articles exceeded the retry limit and are skipped.")
+    ai_analyzer.pool.log_stats()
+    ai_analyzer.log_tier_stats()
 
 
-def run_market_data_pipeline(db_manager: DatabaseManager, coingecko_client: CoinGeckoClient):
-    print("\n--- 📈 STEP 3: COLLECTING COINGECKO MARKET DATA ---")
-    for asset_name, asset_id in ASSETS_TO_TRACK.items():
-        print(f"Processing market data for '{asset_name}'...")
-        last_date_str = db_manager.get_latest_market_data_date(asset_id)
-        days_to_fetch = 30
-        if last_date_str:
-            last_date = datetime.strptime(last_date_str, '%Y-%m-%d')
-            days_diff = (datetime.now() - last_date).days
-            if days_diff > 0:
-                days_to_fetch = days_diff
-                print(f"   -> Last data is from {days_diff} days ago. Fetching new data.")
-            else:
-                print("   -> Market data is up to date. Skipping.")
-                continue
-        else:
-            print(f"   -> No existing data. Fetching initial {days_to_fetch} days of data.")
+def _publish_market_data(market_data, hot_store: HotStore = None, alert_engine: AlertEngine = None):
+    """Подава току-що записаните пазарни редове към in-memory потребителите."""
+    hot_store = hot_store or peek_hot_store()
+    if hot_store is not None:
+        hot_store.append_market_data(market_data)
+    if alert_engine is not None:
+        alert_engine.on_market_data(market_data)
+
+def run_market_backfill_pipeline(db_manager: DatabaseManager, coingecko_client: CoinGeckoClient,
+                                 hot_store: HotStore = None, alert_engine: AlertEngine = None, writer=None):
+    """
+    Исторически заявки (по една на актив) само за запълване на история:
+    активи без история (вкл. такива само с днешния snapshot от sync_assets)
+    и активи, пропуснали повече от ден. Текущите стойности
+    идват от bulk snapshot-а в следващата стъпка.
+    """
+    print("\n--- 📈 STEP 3: BACKFILLING COINGECKO MARKET HISTORY ---")
+    writer = writer or db_manager
+    backfill = list(db_manager.get_market_backfill_days(db_manager.get_tracked_asset_ids()).items())
+    if not backfill:
+        print("   -> Market history is complete. Nothing to backfill.")
+        return
+    if len(backfill) > MARKET_BACKFILL_MAX_ASSETS_PER_RUN:
+        print(f"   -> {len(backfill)} assets need history; backfilling {MARKET_BACKFILL_MAX_ASSETS_PER_RUN} this run.")
+    for asset_id, days_to_fetch in backfill[:MARKET_BACKFILL_MAX_ASSETS_PER_RUN]:
+        print(f"Backfilling {days_to_fetch} days of market data for '{asset_id}'...")
         market_data = coingecko_client.fetch_historical_data(asset_id, days=days_to_fetch)
         if market_data:
-            rows_saved = db_manager.save_market_data(market_data)
-            print(f"   -> 💾 Saved {rows_saved} new market data records.")
+            rows_saved = writer.save_market_data(market_data)
+            print(f"   -> 💾 Saved {rows_saved} market data records.")
+            if rows_saved:
+                _publish_market_data(market_data, hot_store, alert_engine)
 
-def run_kucoin_historical_data_pipeline(db_manager: DatabaseManager, kucoin_handler: KucoinHandler):
+def run_market_snapshot_pipeline(db_manager: DatabaseManager, coingecko_client: CoinGeckoClient,
+                                 hot_store: HotStore = None, alert_engine: AlertEngine = None, writer=None):
+    """Текущи цена/капитализация/обем за всички дължими активи с до 250 актива на заявка."""
+    print("\n--- 🛰️ STEP 3b: BULK COINGECKO MARKET SNAPSHOT ---")
+    writer = writer or db_manager
+    due_asset_ids = db_manager.get_assets_due_for_snapshot(ASSET_REFRESH_INTERVALS)
+    if not due_asset_ids:
+        print("   -> All market snapshots are fresh. Skipping.")
+        return
+    market_data = coingecko_client.markets_to_market_data(coingecko_client.fetch_markets(due_asset_ids))
+    if market_data:
+        rows_saved = writer.save_market_data(market_data)
+        print(f"   -> 💾 Saved snapshots for {rows_saved} of {len(due_asset_ids)} due assets.")
+        db_manager.record_freshness('market', sorted({row['asset_id'] for row in market_data}))
+        if rows_saved:
+            _publish_market_data(market_data, hot_store, alert_engine)
+
+def run_kucoin_historical_data_pipeline(db_manager: DatabaseManager, kucoin_handler: KucoinHandler,
+                                        hot_store: HotStore = None, alert_engine: AlertEngine = None, writer=None):
     print("\n--- 💹 STEP 4: COLLECTING KUCOIN HISTORICAL DATA ---")
-    kucoin_symbols = ['BTC-USDT', 'ETH-USDT'] 
+    writer = writer or db_manager
+    kucoin_symbols = [a['exchange_symbols']['kucoin'] for a in db_manager.get_tracked_assets()
+                      if a['exchange_symbols'].get('kucoin')]
     end_date = datetime.now()
     start_date = end_date - timedelta(days=30)
     end_date_str = end_date.strftime('%Y-%m-%d')
@@ -93,33 +177,131 @@ def run_kucoin_historical_data_pipeline(db_manager: DatabaseManager, kucoin_hand
         historical_data = kucoin_handler.get_historical_data(symbol, start_date_str, end_date_str)
         if historical_data:
             print(f"  -> Fetched {len(historical_data)} records. Saving to database...")
-            db_manager.save_historical_prices(symbol, historical_data)
+            rows_saved = writer.save_historical_prices(symbol, historical_data)
+            db_manager.record_freshness('candles', [symbol])
+            store = hot_store or peek_hot_store()
+            if store is not None and rows_saved:
+                store.append_candles(symbol, historical_data)
+            if alert_engine is not None and rows_saved:
+                alert_engine.on_candles(symbol, historical_data)
         else:
             print(f"  -> No historical data received from KuCoin for {symbol}. Skipping.")
 
-def run_defillama_pipeline(db_manager: DatabaseManager, defillama_handler: DefiLlamaHandler):
+def run_kucoin_ticker_snapshot_pipeline(db_manager: DatabaseManager, kucoin_handler: KucoinHandler, writer=None):
+    """Една all-tickers заявка покрива всички двойки на KuCoin - най-много веднъж на интервал."""
+    print("\n--- 🌐 STEP 4b: KUCOIN MARKET-WIDE TICKER SNAPSHOT ---")
+    latest_ts = db_manager.get_latest_ticker_snapshot_ts('kucoin')
+    if latest_ts and datetime.now().timestamp() - latest_ts < KUCOIN_TICKER_SNAPSHOT_INTERVAL:
+        print(f"   -> Latest snapshot is younger than {KUCOIN_TICKER_SNAPSHOT_INTERVAL}s. Skipping.")
+        return
+    tickers = kucoin_handler.get_all_tickers()
+    if not tickers:
+        print("   -> No ticker data received from KuCoin. Skipping.")
+        return
+    rows_saved = (writer or db_manager).save_ticker_snapshot('kucoin', tickers)
+    print(f"   -> 💾 Saved a snapshot of {rows_saved} trading pairs.")
+    movers = db_manager.get_ticker_screen('kucoin', 'change_rate', limit=3, quote='USDT', min_quote_volume=100_000)
+    if movers:
+        print("   -> 🚀 Top USDT movers (24h): " + ", ".join(f"{m['symbol']} {m['change_rate']:+.1%}" for m in movers))
+
+def run_orderbook_snapshot_pipeline(db_manager: DatabaseManager, kucoin_handler: KucoinHandler, writer=None):
+    """
+    Snapshot на стакана за следените двойки. За snapshot всяка минута се
+    пуска scripts/run_orderbook_collector.py; тук се взима по един на пускане.
+    """
+    print("\n--- 📚 STEP 4c: ORDER BOOK DEPTH SNAPSHOTS ---")
+    kucoin_symbols = [a['exchange_symbols']['kucoin'] for a in db_manager.get_tracked_assets()
+                      if a['exchange_symbols'].get('kucoin')]
+    latest = db_manager.get_latest_orderbook_ts('kucoin')
+    now = datetime.now().timestamp()
+    due = [s for s in kucoin_symbols if now - latest.get(s, 0) >= ORDERBOOK_SNAPSHOT_INTERVAL]
+    if not due:
+        print("   -> All order book snapshots are fresh. Skipping.")
+        return
+    rows_saved = capture_snapshots(writer or db_manager, kucoin_handler, due, ORDERBOOK_DEPTH)
+    print(f"   -> 💾 Saved {rows_saved} order book snapshots ({ORDERBOOK_DEPTH} levels per side).")
+
+def run_defillama_pipeline(db_manager: DatabaseManager, defillama_handler: DefiLlamaHandler,
+                           alert_engine: AlertEngine = None, writer=None):
     print("\n--- 🔗 STEP 5: COLLECTING DEFI LLAMA ON-CHAIN DATA ---")
     chains_to_track = ["Ethereum", "Solana", "Arbitrum", "Polygon"]
     tvl_data = defillama_handler.get_chains_tvl(chains_to_track)
     if tvl_data:
         print(f"  -> Fetched TVL data for {len(tvl_data)} chains. Saving to database...")
-        db_manager.save_chain_tvl_data(tvl_data)
+        if (writer or db_manager).save_chain_tvl_data(tvl_data) and alert_engine is not None:
+            alert_engine.on_tvl(tvl_data)
     else:
         print(f"  -> No TVL data received from DefiLlama. Skipping.")
 
-def run_forex_data_pipeline(db_manager: DatabaseManager, eodhd_client: EODHDClient):
-    print("\n--- 💵 STEP 6: COLLECTING DXY FOREX DATA ---")
-    symbol = "DXY.INDX"
-    to_date = datetime.now()
-    from_date = to_date - timedelta(days=30)
-    from_date_str = from_date.strftime('%Y-%m-%d')
-    to_date_str = to_date.strftime('%Y-%m-%d')
-    forex_data = eodhd_client.get_forex_data(symbol, from_date_str, to_date_str)
-    if forex_data:
-        print(f"  -> Fetched {len(forex_data)} daily records for {symbol}. Saving to database...")
-        db_manager.save_forex_data(symbol, forex_data)
-    else:
-        print(f"  -> No data received from EODHD for {symbol}. Skipping.")
+def run_forex_data_pipeline(db_manager: DatabaseManager, eodhd_client: EODHDClient,
+                            write_queue: WriteQueue = None):
+    print("\n--- 💵 STEP 6: COLLECTING FOREX & MACRO DATA ---")
+    today = datetime.now().date()
+    latest_dates = db_manager.get_latest_forex_dates(FOREX_SYMBOLS)
+    date_ranges = {}
+    needs_last_bar = []
+    for symbol in FOREX_SYMBOLS:
+        last_date_str = latest_dates.get(symbol)
+        if not last_date_str:
+            from_date = today - timedelta(days=FOREX_INITIAL_DAYS)
+            print(f"  -> {symbol}: no existing data. Fetching initial {FOREX_INITIAL_DAYS} days.")
+            date_ranges[symbol] = (from_date.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'))
+            continue
+        last_date = datetime.strptime(last_date_str, '%Y-%m-%d').date()
+        missing_bars = count_business_days(last_date, today)
+        if missing_bars == 0:
+            print(f"  -> {symbol}: up to date ({last_date_str}). Skipping.")
+        elif missing_bars == 1:
+            needs_last_bar.append(symbol)
+        else:
+            # Тегли само от последната записана дата нататък, не фиксиран прозорец
+            from_date = last_date + timedelta(days=1)
+            date_ranges[symbol] = (from_date.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'))
+
+    # Bulk заявката се изплаща само ако поне два символа от една борса чакат само последния бар
+    exchanges = Counter(symbol.rpartition('.')[2] for symbol in needs_last_bar)
+    bulk_symbols = [s for s in needs_last_bar if exchanges[s.rpartition('.')[2]] > 1]
+    for symbol in needs_last_bar:
+        if symbol not in bulk_symbols:
+            last_date = datetime.strptime(latest_dates[symbol], '%Y-%m-%d').date()
+            date_ranges[symbol] = ((last_date + timedelta(days=1)).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'))
+
+    results = eodhd_client.get_forex_data_many(date_ranges)
+    if bulk_symbols:
+        results.update(eodhd_client.get_bulk_last_day(bulk_symbols))
+
+    pending = {}
+    for symbol in FOREX_SYMBOLS:
+        forex_data = results.get(symbol)
+        if forex_data:
+            print(f"  -> Fetched {len(forex_data)} daily records for {symbol}. Saving to database...")
+            if write_queue is not None:
+                pending[symbol] = write_queue.save_forex_data(symbol, forex_data)
+            else:
+                db_manager.save_forex_data(symbol, forex_data)
+        elif symbol in date_ranges or symbol in bulk_symbols:
+            print(f"  -> No data received from EODHD for {symbol}. Skipping.")
+    # Всички символи отиват в една транзакция на writer-а
+    for symbol, future in pending.items():
+        try:
+            print(f"  -> 💾 Saved {future.result()} records for {symbol}.")
+        except Exception as e:
+            print(f"  -> ❌ Failed to save forex data for {symbol}: {e}")
+
+def run_gap_repair_pipeline(db_manager: DatabaseManager, coingecko_client: CoinGeckoClient,
+                            kucoin_handler: KucoinHandler, eodhd_client: EODHDClient):
+    """Запълва дупките в средата на сериите с целеви заявки (в рамките на бюджета на всеки доставчик)."""
+    print("\n--- 🩹 STEP 7: REPAIRING TIME-SERIES GAPS ---")
+    repairer = GapRepairer(db_manager, {'coingecko': coingecko_client, 'kucoin': kucoin_handler, 'eodhd': eodhd_client})
+    stats = repairer.repair()
+    if not stats.get('gaps'):
+        print("  -> ✅ No open gaps found.")
+        return
+    print(f"  -> Open gaps: {stats['gaps']}, requests: {stats.get('requests', 0)}, "
+          f"rows saved: {stats.get('rows_saved', 0)}, deferred ranges: {stats.get('deferred_ranges', 0)}.")
+    unrecoverable = db_manager.get_series_gaps(statuses=['unrecoverable'])
+    if unrecoverable:
+        print(f"  -> ⚠️ {len(unrecoverable)} gaps are marked unrecoverable (see scripts/repair_gaps.py --scan-only).")
 
 def main():
     """Главната функция, която дирижира целия процес."""
@@ -128,22 +310,41 @@ def main():
 
     # --- ОБНОВЕНА ИНИЦИАЛИЗАЦИЯ ---
     db_manager = DatabaseManager()
-    news_api_client = NewsApiClient()
-    coingecko_client = CoinGeckoClient()
-    ai_analyzer = AIAnalyzer()
-    kucoin_handler = KucoinHandler()
-    defillama_handler = DefiLlamaHandler()
-    eodhd_client = EODHDClient()
+    asset_matcher = AssetMatcher.from_database(db_manager)
+    # Суровите отговори се пазят, за да може scripts/reprocess_raw.py да преизгради таблиците без мрежа
+    raw_lake = RawLake(db_manager)
+    news_api_client = NewsApiClient(db_manager, matcher=asset_matcher, raw_lake=raw_lake)
+    coingecko_client = CoinGeckoClient(raw_lake=raw_lake)
+    ai_analyzer = AIAnalyzer(asset_matcher=asset_matcher, warm_up=True)
+    article_embedder = ArticleEmbedder(db_manager, ai_analyzer.pool)
+    article_fetcher = ArticleFetcher(db_manager)
+    kucoin_handler = KucoinHandler(raw_lake=raw_lake)
+    defillama_handler = DefiLlamaHandler(raw_lake=raw_lake)
+    eodhd_client = EODHDClient(raw_lake=raw_lake)
+    # Всички пакетни записи на стъпките минават през един писател (по-малко транзакции и lock борби)
+    write_queue = WriteQueue(db_manager)
+    writer = write_queue.sync()
+    # Hot store-ът се зарежда от SQLite само ако ново ценово правило трябва да се засее;
+    # дотогава стъпките не го захранват (виж peek_hot_store)
+    alert_engine = AlertEngine(db_manager, hot_store=lambda: get_hot_store(db_manager))
 
     print("DEBUG: Всички клиенти са инициализирани.")
     
     # --- ИЗПЪЛНЕНИЕ НА ВСИЧКИ СТЪПКИ ---
-    run_news_pipeline(db_manager, news_api_client)
-    run_ai_analysis_pipeline(db_manager, ai_analyzer)
-    run_market_data_pipeline(db_manager, coingecko_client)
-    run_kucoin_historical_data_pipeline(db_manager, kucoin_handler)
-    run_defillama_pipeline(db_manager, defillama_handler)
-    run_forex_data_pipeline(db_manager, eodhd_client)
+    run_news_pipeline(db_manager, news_api_client, writer)
+    run_embedding_pipeline(article_embedder)
+    run_article_body_pipeline(article_fetcher)
+    run_ai_analysis_pipeline(db_manager, ai_analyzer, alert_engine=alert_engine)
+    run_market_backfill_pipeline(db_manager, coingecko_client, alert_engine=alert_engine, writer=writer)
+    run_market_snapshot_pipeline(db_manager, coingecko_client, alert_engine=alert_engine, writer=writer)
+    run_kucoin_historical_data_pipeline(db_manager, kucoin_handler, alert_engine=alert_engine, writer=writer)
+    run_kucoin_ticker_snapshot_pipeline(db_manager, kucoin_handler, writer)
+    run_orderbook_snapshot_pipeline(db_manager, kucoin_handler, writer)
+    run_defillama_pipeline(db_manager, defillama_handler, alert_engine, writer)
+    run_forex_data_pipeline(db_manager, eodhd_client, write_queue)
+    write_queue.close()
+    run_gap_repair_pipeline(db_manager, coingecko_client, kucoin_handler, eodhd_client)
+    raw_lake.log_stats()
 
     print("\n🏁🏁🏁 PIPELINE FINISHED SUCCESSFULLY! 🏁🏁🏁")
 
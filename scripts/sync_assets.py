@@ -0,0 +1,58 @@
+# scripts/sync_assets.py
+import sys
+import os
+import argparse
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from config import ASSET_TIER_RANKS
+from src.database.database_manager import DatabaseManager
+from src.data_ingestion.coingecko_client import CoinGeckoClient
+from src.data_ingestion.raw_lake import RawLake
+
+def tier_for_rank(rank) -> int:
+    for tier, max_rank in sorted(ASSET_TIER_RANKS.items()):
+        if rank is not None and rank <= max_rank:
+            return tier
+    return max(ASSET_TIER_RANKS) + 1
+
+def sync_assets(top_n: int, ticker_alias_rank: int):
+    """
+    Разширява таблицата assets до първите top_n актива по капитализация.
+    Същите /coins/markets отговори се записват и като днешен пазарен snapshot,
+    така че синхронизацията не струва допълнителни заявки.
+    """
+    db_manager = DatabaseManager()
+    coingecko_client = CoinGeckoClient(raw_lake=RawLake(db_manager))
+    markets = coingecko_client.fetch_top_markets(top_n)
+    if not markets:
+        print("❌ No market data received from CoinGecko.")
+        return
+
+    assets = []
+    for market in markets:
+        rank = market.get('market_cap_rank')
+        name = market.get('name') or market['id']
+        symbol = (market.get('symbol') or '').lower()
+        aliases = [name.lower()]
+        # Тикерите на малките активи ("one", "ai") дават твърде много фалшиви съвпадения
+        if symbol and len(symbol) >= 3 and rank is not None and rank <= ticker_alias_rank and symbol not in aliases:
+            aliases.append(symbol)
+        assets.append({
+            'id': market['id'], 'name': name, 'symbol': symbol, 'aliases': aliases,
+            'exchange_symbols': {}, 'refresh_tier': tier_for_rank(rank), 'market_cap_rank': rank,
+        })
+    db_manager.upsert_assets(assets)
+    market_data = coingecko_client.markets_to_market_data(markets)
+    rows_saved = db_manager.save_market_data(market_data)
+    db_manager.record_freshness('market', [row['asset_id'] for row in market_data])
+    print(f"✅ Synced {len(assets)} assets from CoinGecko and saved {rows_saved} market snapshots.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the tracked asset universe from CoinGecko")
+    parser.add_argument("--top", type=int, default=1000, help="Колко актива по капитализация да се следят")
+    parser.add_argument("--ticker-alias-rank", type=int, default=100,
+                        help="До кой ранг тикерът се добавя като синоним за откриване в новините")
+    args = parser.parse_args()
+    sync_assets(args.top, args.ticker_alias_rank)
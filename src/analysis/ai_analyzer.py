@@ -1,11 +1,20 @@
 # src/analysis/ai_analyzer.py
 
-import ollama
 import json
 import time  # Импортваме 'time', за да можем да правим паузи
 import logging # Ще използваме logging и тук за консистентност
-from typing import Dict, Any
-from config import OLLAMA_MODEL
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Iterator, Optional, Tuple, Type
+from pydantic import BaseModel, ValidationError
+from config import (
+    OLLAMA_MODEL, OLLAMA_TRIAGE_MODEL, OLLAMA_KEEP_ALIVE, TRIAGE_CONFIDENCE_THRESHOLD,
+    ARTICLE_BODY_ANALYSIS, ARTICLE_BODY_CHUNK_CHARS
+)
+from src.analysis.ollama_pool import OllamaEndpointPool
+from src.analysis.asset_matcher import AssetMatcher
+from src.analysis.schemas import ArticleAnalysis, TriageResult, ChunkSummary, schema_for_fields, invalid_fields, describe_errors
 
 # Използваме същия logger формат
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,74 +23,316 @@ class AIAnalyzer:
     """
     Клас, отговорен за комуникацията с Ollama и анализа на текст.
     Вече включва и механизъм за повторен опит при грешка.
+    Заявките се разпределят между всички Ollama сървъри в OLLAMA_HOSTS.
+
+    Анализът е каскаден: малкият triage модел оценява всяко заглавие и само
+    икономическите новини, новините за следени активи и несигурните оценки
+    стигат до големия модел.
+
+    При body_analysis=True статиите с извлечен текст (article_bodies) се
+    оценяват по заглавието и резюме на текста, направено на парчета.
+
+    warm_up=True зарежда моделите в Ollama още при създаването - за
+    дълготрайните процеси, които ще анализират веднага.
     """
-    def __init__(self, model: str = OLLAMA_MODEL, max_retries: int = 3):
+    def __init__(self, model: str = OLLAMA_MODEL, max_retries: int = 3,
+                 hosts: Optional[List[str]] = None, pool: Optional[OllamaEndpointPool] = None,
+                 triage_model: Optional[str] = OLLAMA_TRIAGE_MODEL,
+                 confidence_threshold: float = TRIAGE_CONFIDENCE_THRESHOLD,
+                 keep_alive: Any = OLLAMA_KEEP_ALIVE, asset_matcher: Optional[AssetMatcher] = None,
+                 warm_up: bool = False, body_analysis: bool = ARTICLE_BODY_ANALYSIS,
+                 chunk_chars: int = ARTICLE_BODY_CHUNK_CHARS):
         self.model = model
         self.max_retries = max_retries # Колко пъти да опитаме при грешка
-        logging.info(f"🧠 AI Analyzer initialized with model: {self.model}")
+        self.pool = pool or OllamaEndpointPool(hosts)
+        self.triage_model = triage_model
+        self.confidence_threshold = confidence_threshold
+        self.keep_alive = keep_alive
+        self.asset_matcher = asset_matcher or AssetMatcher()
+        self.body_analysis = body_analysis
+        self.chunk_chars = chunk_chars
+        self._stats_lock = threading.Lock()
+        self.tier_stats = {tier: {'count': 0, 'latency': 0.0} for tier in ('triage', 'full')}
+        self.escalations = Counter()
+        # requests / retries / invalid_json / repairs / transport_errors / failures
+        self.metrics = Counter()
+        logging.info(f"🧠 AI Analyzer initialized with model: {self.model}, triage: {self.triage_model} "
+                     f"({self.pool.size} Ollama host(s))")
+        if warm_up:
+            self.pool.warm_up([m for m in (self.triage_model, self.model) if m], keep_alive=self.keep_alive)
+
+    def analyze_articles(self, articles: List[Dict[str, Any]]) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """
+        Анализира партида статии паралелно - по една нишка на Ollama сървър -
+        и връща двойки (статия, анализ) по реда на завършване.
+        """
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            futures = {executor.submit(self.analyze_article, a): a for a in articles}
+            for future in as_completed(futures):
+                article = futures[future]
+                try:
+                    yield article, future.result()
+                except Exception as e:
+                    logging.error(f"❌ Unexpected error while analyzing article #{article.get('id')}: {e}")
+                    yield article, None
+
+    def get_endpoint_stats(self) -> List[Dict[str, Any]]:
+        """Статистика и хистограма на латентността по Ollama сървъри."""
+        return self.pool.get_stats()
+
+    def analyze_article(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Анализ на статия от опашката. В режим body_analysis към заглавието се
+        добавя резюмето на текста - готовото от body_summaries или ново, което
+        се оставя в article['body_summary'], за да го запише pipeline-ът.
+        """
+        context = None
+        if self.body_analysis and article.get('body'):
+            if not article.get('body_summary'):
+                article['body_summary'] = self.summarize_body(article['title'], article['body'])
+            context = article.get('body_summary')
+        return self.analyze_article_title(article['title'], article.get('category') == 'economic_event', context)
 
-    def analyze_article_title(self, title: str, is_economic: bool = False) -> Dict[str, Any] or None:
+    def summarize_body(self, title: str, body: str) -> Optional[str]:
+        """
+        Резюме на текста на парчета (по абзаци, до chunk_chars символа): всяко
+        парче се резюмира отделно с triage модела (или с големия, ако няма
+        triage), а резюметата се съединяват. Парчетата са малко, защото
+        текстът вече е съкратен до ARTICLE_BODY_MAX_CHARS.
+        """
+        model = self.triage_model or self.model
+        summaries = []
+        for chunk in self._chunk_text(body, self.chunk_chars):
+            result = self._request_structured(model, self._build_chunk_prompt(title, chunk), ChunkSummary, title, max_attempts=2)
+            if result is not None:
+                summaries.append(result.summary.strip())
+        return " ".join(summaries) or None
+
+    @staticmethod
+    def _chunk_text(text: str, chunk_chars: int) -> List[str]:
+        chunks, current = [], ""
+        for paragraph in text.split("\n\n"):
+            while len(paragraph) > chunk_chars:
+                chunks.append(paragraph[:chunk_chars])
+                paragraph = paragraph[chunk_chars:]
+            if current and len(current) + len(paragraph) + 2 > chunk_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def analyze_article_title(self, title: str, is_economic: bool = False,
+                              context: Optional[str] = None) -> Dict[str, Any] or None:
         """
         Анализира заглавие на статия и връща структуриран речник с резултатите.
+        Първо решава дали заглавието заслужава големия модел.
+        context е резюмето на текста на статията (ако има такова).
         """
-        prompt = self._build_prompt(title, is_economic)
+        if is_economic:
+            escalation_reason = 'economic_event'
+        elif self.asset_matcher.mentions_any(title):
+            escalation_reason = 'tracked_asset'
+        elif not self.triage_model:
+            escalation_reason = 'no_triage_model'
+        else:
+            triage_result = self._triage_title(title, context)
+            if triage_result and triage_result['confidence'] >= self.confidence_threshold:
+                return triage_result['analysis']
+            escalation_reason = 'low_confidence' if triage_result else 'triage_failed'
 
-        # --- НОВА ЛОГИКА: Цикъл за повторни опити ---
-        for attempt in range(self.max_retries):
+        with self._stats_lock:
+            self.escalations[escalation_reason] += 1
+        return self._analyze_with_full_model(title, is_economic, context)
+
+    def _triage_title(self, title: str, context: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Бърза оценка с малкия модел. Връща анализ и увереност или None при грешка."""
+        started = time.perf_counter()
+        # Triage-ът не прави повторни опити - при проблем просто ескалираме
+        result = self._request_structured(self.triage_model, self._build_triage_prompt(title, context), TriageResult, title, max_attempts=1)
+        self._record_tier('triage', time.perf_counter() - started)
+        if result is None:
+            return None
+
+        return {
+            'confidence': result.confidence,
+            'analysis': {
+                "summary": result.summary,
+                "sentiment": result.sentiment,
+                "score": result.score,
+                "confidence": result.confidence,
+                "reasoning": f"Triage ({self.triage_model}, confidence {result.confidence:.2f}): {result.reasoning}",
+                "investment_factors": "None"
+            }
+        }
+
+    def _analyze_with_full_model(self, title: str, is_economic: bool, context: Optional[str] = None) -> Dict[str, Any] or None:
+        started = time.perf_counter()
+        result = self._request_structured(self.model, self._build_prompt(title, is_economic, context), ArticleAnalysis, title)
+        self._record_tier('full', time.perf_counter() - started)
+        if result is None:
+            logging.error(f"❌ AI analysis failed for '{title}' after {self.max_retries} attempts.")
+            return None
+        return result.model_dump()
+
+    def _request_structured(self, model: str, prompt: str, schema: Type[BaseModel], title: str,
+                            max_attempts: Optional[int] = None) -> Optional[BaseModel]:
+        """
+        Иска от модела отговор по JSON схемата (constrained decoding) и го валидира.
+        Полетата, минали валидация, се запазват; при следващия опит моделът
+        получава схема само с липсващите или невалидните полета. Пауза
+        (exponential backoff) се прави само при мрежови грешки.
+        """
+        max_attempts = max_attempts or self.max_retries
+        field_names = list(schema.model_fields)
+        valid_data: Dict[str, Any] = {}
+        pending = field_names
+        messages = [{'role': 'user', 'content': prompt}]
+
+        for attempt in range(max_attempts):
+            self._count('requests')
+            if attempt:
+                self._count('retries')
             try:
-                # Опитваме да изпълним заявката
-                response = ollama.chat(
-                    model=self.model,
-                    format='json',
-                    messages=[{'role': 'user', 'content': prompt}]
+                response = self.pool.chat(
+                    model=model,
+                    format=schema_for_fields(schema, pending),
+                    keep_alive=self.keep_alive,
+                    messages=messages
                 )
+            except Exception as e:
+                self._count('transport_errors')
+                logging.warning(f"⚠️ Attempt {attempt + 1}/{max_attempts} failed for '{title}': {e}")
+                if attempt + 1 < max_attempts:
+                    time.sleep(0.5 * 2 ** attempt)
+                continue
+
+            content = response['message']['content']
+            try:
+                raw = json.loads(content)
+                if not isinstance(raw, dict):
+                    raise ValueError("response is not a JSON object")
+            except ValueError as e:
+                self._count('invalid_json')
+                logging.warning(f"⚠️ Attempt {attempt + 1}/{max_attempts}: malformed JSON for '{title}': {e}")
+                continue
+
+            candidate = {**valid_data, **{k: raw[k] for k in pending if k in raw}}
+            try:
+                return schema.model_validate(candidate)
+            except ValidationError as e:
+                bad_fields = invalid_fields(e)
+                valid_data = {k: v for k, v in candidate.items() if k not in bad_fields}
+                pending = [f for f in field_names if f not in valid_data]
+                self._count('repairs')
+                errors = "; ".join(f"{field}: {msg}" for field, msg in describe_errors(e))
+                logging.warning(f"⚠️ Attempt {attempt + 1}/{max_attempts}: invalid fields {pending} for '{title}' ({errors})")
+                # Поправката се иска в същия разговор, но само за сгрешените полета
+                messages = messages[:1] + [
+                    {'role': 'assistant', 'content': content},
+                    {'role': 'user', 'content': self._build_repair_prompt(pending, errors)},
+                ]
+
+        self._count('failures')
+        return None
+
+    def _count(self, metric: str):
+        with self._stats_lock:
+            self.metrics[metric] += 1
+
+    def _record_tier(self, tier: str, latency: float):
+        with self._stats_lock:
+            self.tier_stats[tier]['count'] += 1
+            self.tier_stats[tier]['latency'] += latency
 
-                # Ако всичко е успешно, обработваме и връщаме резултата
-                analysis_data = json.loads(response['message']['content'])
-                
-                # Връщаме целия речник, вместо отделни променливи
-                return {
-                    "summary": analysis_data.get("summary", "N/A"),
-                    "sentiment": analysis_data.get("sentiment", "Neutral"),
-                    "reasoning": analysis_data.get("reasoning", "N/A"),
-                    "investment_factors": analysis_data.get("investment_factors", "None")
+    def get_tier_stats(self) -> Dict[str, Any]:
+        """Брой заявки и средна латентност по нива на каскадата, плюс причините за ескалация."""
+        with self._stats_lock:
+            tiers = {
+                tier: {
+                    'count': data['count'],
+                    'avg_latency': data['latency'] / data['count'] if data['count'] else None,
                 }
-            except Exception as e:
-                # Ако има грешка, логваме я и продължаваме към следващия опит
-                logging.warning(f"⚠️ Attempt {attempt + 1}/{self.max_retries} failed for '{title}': {e}")
-                
-                # Ако това е последният опит, отказваме се
-                if attempt + 1 == self.max_retries:
-                    logging.error(f"❌ AI analysis failed for '{title}' after {self.max_retries} attempts.")
-                    return None
-                
-                # Изчакваме малко преди да опитаме отново
-                time.sleep(2)
-        
-        return None # Връщаме None, ако цикълът приключи неуспешно
-
-    def _build_prompt(self, title: str, is_economic: bool) -> str:
+                for tier, data in self.tier_stats.items()
+            }
+            return {'tiers': tiers, 'escalations': dict(self.escalations), 'metrics': dict(self.metrics)}
+
+    def log_tier_stats(self):
+        stats = self.get_tier_stats()
+        for tier, data in stats['tiers'].items():
+            avg = f"{data['avg_latency']:.2f}s" if data['avg_latency'] is not None else "N/A"
+            logging.info(f"📊 Tier '{tier}': {data['count']} calls, avg latency {avg}")
+        if stats['escalations']:
+            reasons = ", ".join(f"{k}: {v}" for k, v in stats['escalations'].items())
+            logging.info(f"📊 Escalations to '{self.model}': {reasons}")
+        if stats['metrics']:
+            metrics = ", ".join(f"{k}: {v}" for k, v in sorted(stats['metrics'].items()))
+            logging.info(f"📊 LLM requests: {metrics}")
+
+    def _build_repair_prompt(self, fields: List[str], errors: str) -> str:
+        """Промпт за поправка само на невалидните полета."""
+        return (
+            f"Some fields in your JSON response were invalid: {errors}.\n"
+            f"Respond with a JSON object containing ONLY these keys, with corrected values: {', '.join(fields)}."
+        )
+
+    @staticmethod
+    def _context_block(context: Optional[str]) -> str:
+        if not context:
+            return ""
+        return (f"\n\nKey points from the article body: \"{context}\"\n"
+                "Use these points together with the title; they take precedence over guesses based on the title alone.")
+
+    def _build_chunk_prompt(self, title: str, chunk: str) -> str:
+        return f"""
+        The following passage is part of a news article titled "{title}".
+        Summarize the market-relevant facts of the passage (assets, companies, numbers, regulation, events)
+        in two or three sentences. Respond with a single JSON object with key "summary".
+
+        Passage:
+        {chunk}
+        """
+
+    def _build_triage_prompt(self, title: str, context: Optional[str] = None) -> str:
+        """Кратък промпт за triage модела - само настроение, увереност и резюме."""
+        return f"""
+        Classify the market sentiment of this news title: "{title}"
+        Respond with a single JSON object with keys:
+        "sentiment" (one of "Positive", "Negative", "Neutral"),
+        "score" (a number from -1 for very bearish to 1 for very bullish, 0 for neutral),
+        "confidence" (a number from 0 to 1),
+        "summary" (one short sentence),
+        "reasoning" (a few words).
+        """ + self._context_block(context)
+
+    def _build_prompt(self, title: str, is_economic: bool, context: Optional[str] = None) -> str:
         """Помощен метод за конструиране на промпта за AI модела (остава непроменен)."""
         # ... съдържанието на този метод е същото като преди ...
         prompt = f"""
         Analyze the following news article title and provide a structured JSON response.
         The title is: "{title}"
 
-        Your response MUST be a single JSON object with the following four keys:
+        Your response MUST be a single JSON object with the following six keys:
         1. "summary": A brief, one-sentence summary of the article's likely content.
         2. "sentiment": The overall sentiment. Must be one of: "Positive", "Negative", "Neutral".
-        3. "reasoning": A short explanation for why you chose that sentiment, based ONLY on the title.
-        4. "investment_factors": Key factors or entities mentioned that could influence investment decisions (e.g., specific companies, regulations, market trends). List them as a comma-separated string. If none, return "None".
+        3. "score": The strength of the sentiment as a number from -1 (very bearish) to 1 (very bullish); 0 is neutral.
+        4. "confidence": How confident you are in the sentiment, from 0 to 1.
+        5. "reasoning": A short explanation for why you chose that sentiment, based ONLY on the title.
+        6. "investment_factors": Key factors or entities mentioned that could influence investment decisions (e.g., specific companies, regulations, market trends). List them as a comma-separated string. If none, return "None".
 
         Example response format:
         {{
             "summary": "The article discusses a significant price increase for Bitcoin, potentially driven by new institutional investments.",
             "sentiment": "Positive",
+            "score": 0.7,
+            "confidence": 0.8,
             "reasoning": "The title mentions a price surge and favorable market conditions, which is bullish for the asset.",
             "investment_factors": "Bitcoin, institutional investment"
         }}
         """
 
+        prompt += self._context_block(context)
         if is_economic:
             prompt += "\n\nIMPORTANT CONTEXT: This title is from a major economic news event. Analyze its potential market-wide significance with higher priority."
 
@@ -0,0 +1,348 @@
+# src/analysis/alert_engine.py
+
+import json
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Iterable
+
+import requests
+
+from config import ALERT_RULES, ALERT_COOLDOWN_SECONDS, ALERT_MAX_EVENT_AGE, ALERTS_FILE, ALERT_WEBHOOK_URL
+from src.utils.time_utils import to_epoch_seconds
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Потоци от събития, които ingestion стъпките подават към engine-а
+PRICE_STREAM = 'price'          # (ts, close, volume) по asset_id / KuCoin символ
+TVL_STREAM = 'tvl'              # (ts, tvl) по верига
+SENTIMENT_STREAM = 'sentiment'  # (ts, sentiment) по asset_id, за всяка анализирана статия
+
+
+class AlertRule(ABC):
+    """
+    База за правилата. Всяко правило следи един ключ (актив, символ или верига)
+    в един поток и пази малко, ограничено състояние, така че оценката струва
+    O(1) на ново събитие, независимо от историята в базата.
+    """
+    stream = PRICE_STREAM
+    ordered = True  # Събитията идват подредени по време - по-старите от watermark-а се пропускат
+    history_bars = 0  # Колко предходни бара са нужни, за да може правилото да се оцени
+
+    def __init__(self, rule_id: str, key: str, cooldown_seconds: int = ALERT_COOLDOWN_SECONDS):
+        self.rule_id = rule_id
+        self.key = key
+        self.cooldown_seconds = cooldown_seconds
+        self.state: Dict[str, Any] = {}
+
+    @abstractmethod
+    def evaluate(self, ts: int, **values) -> Optional[Dict[str, Any]]:
+        """Обработва едно събитие; връща alert (message, value) или None."""
+
+    def seed(self, events: Iterable[tuple]):
+        """Пълни състоянието от история (ts, {стойности}) без alert-и - за ново правило без запазено състояние."""
+        for ts, values in events:
+            self.evaluate(ts, **values)
+            self.state['last_ts'] = ts
+
+    def retract(self, ts: int):
+        """Връща назад наблюдението за бар ts, за да бъде заменено с обновената му версия."""
+
+    def process(self, ts: int, **values) -> Optional[Dict[str, Any]]:
+        if self.ordered:
+            last_ts = self.state.get('last_ts', -1)
+            # По-старите събития вече са обработени (напр. повторно изтеглени свещи)
+            if ts < last_ts:
+                return None
+            # Последният бар може още да е отворен - новата му версия заменя старата и се оценява наново
+            if ts == last_ts:
+                self.retract(ts)
+        alert = self.evaluate(ts, **values)
+        self.state['last_ts'] = max(ts, self.state.get('last_ts', ts))
+        if alert is None:
+            return None
+        if abs(ts - self.state.get('last_fired_ts', ts - self.cooldown_seconds - 1)) <= self.cooldown_seconds:
+            return None
+        self.state['last_fired_ts'] = ts
+        return dict(alert, rule_id=self.rule_id, key=self.key, event_ts=ts)
+
+
+class PriceCrossRule(AlertRule):
+    """Цената пресича ниво нагоре ('above') или надолу ('below')."""
+    history_bars = 1
+
+    def __init__(self, rule_id: str, key: str, level: float, direction: str = 'above', **kwargs):
+        super().__init__(rule_id, key, **kwargs)
+        self.level = level
+        self.direction = direction
+
+    def retract(self, ts):
+        if self.state.get('close_ts') == ts:
+            self.state['last_close'] = self.state.get('previous_close')
+
+    def evaluate(self, ts, close=None, **_):
+        previous = self.state.get('last_close')
+        self.state.update(last_close=close, previous_close=previous, close_ts=ts)
+        if previous is None or close is None:
+            return None
+        crossed = previous < self.level <= close if self.direction == 'above' else previous > self.level >= close
+        if crossed:
+            return {'message': f"{self.key} crossed {self.direction} {self.level:,.2f} (now {close:,.2f})", 'value': close}
+        return None
+
+
+class _WindowRule(AlertRule):
+    """Общо за правилата с плъзгащ се прозорец от последните `window` стойности."""
+    def __init__(self, rule_id: str, key: str, window: int, **kwargs):
+        super().__init__(rule_id, key, **kwargs)
+        self.window = window
+
+    @property
+    def history_bars(self) -> int:
+        return self.window
+
+    def _push(self, ts: int, value: float) -> List[float]:
+        values = self.state.setdefault('window', [])
+        values.append(value)
+        del values[:-(self.window + 1)]
+        self.state['window_ts'] = ts
+        return values
+
+    def retract(self, ts):
+        if self.state.get('window_ts') == ts and self.state.get('window'):
+            self.state['window'].pop()
+            self.state['window_ts'] = None
+
+
+class PercentMoveRule(_WindowRule):
+    """Движение с поне pct% спрямо цената преди `window` бара."""
+    def __init__(self, rule_id: str, key: str, window: int, pct: float, **kwargs):
+        super().__init__(rule_id, key, window, **kwargs)
+        self.pct = pct
+
+    def evaluate(self, ts, close=None, **_):
+        if close is None:
+            return None
+        values = self._push(ts, close)
+        if len(values) <= self.window or not values[0]:
+            return None
+        change = (close / values[0] - 1.0) * 100
+        if abs(change) >= self.pct:
+            return {'message': f"{self.key} moved {change:+.2f}% over {self.window} bars", 'value': change}
+        return None
+
+
+class VolumeSpikeRule(_WindowRule):
+    """Обем поне multiplier пъти над средния за предходните `window` бара."""
+    def __init__(self, rule_id: str, key: str, window: int, multiplier: float, **kwargs):
+        super().__init__(rule_id, key, window, **kwargs)
+        self.multiplier = multiplier
+
+    def evaluate(self, ts, volume=None, **_):
+        if volume is None:
+            return None
+        values = self._push(ts, volume)
+        if len(values) <= self.window:
+            return None
+        average = sum(values[:-1]) / self.window
+        if average > 0 and volume >= self.multiplier * average:
+            return {'message': f"{self.key} volume spike: {volume / average:.1f}x the {self.window}-bar average", 'value': volume}
+        return None
+
+
+class TvlDropRule(_WindowRule):
+    """TVL на веригата пада с поне pct% спрямо стойността преди `window` наблюдения."""
+    stream = TVL_STREAM
+
+    def __init__(self, rule_id: str, key: str, window: int, pct: float, **kwargs):
+        super().__init__(rule_id, key, window, **kwargs)
+        self.pct = pct
+
+    def evaluate(self, ts, tvl=None, **_):
+        if tvl is None:
+            return None
+        values = self._push(ts, tvl)
+        if len(values) <= self.window or not values[0]:
+            return None
+        change = (tvl / values[0] - 1.0) * 100
+        if change <= -self.pct:
+            return {'message': f"{self.key} TVL dropped {change:.2f}% over {self.window} observations", 'value': change}
+        return None
+
+
+class NegativeSentimentSurgeRule(AlertRule):
+    """Поне min_count негативни статии за актива в последните window_hours часа и дял >= min_share."""
+    stream = SENTIMENT_STREAM
+    ordered = False  # Статиите не идват подредени по published_at - всяка се подава точно веднъж
+
+    def __init__(self, rule_id: str, key: str, window_hours: int = 6, min_count: int = 3,
+                 min_share: float = 0.6, **kwargs):
+        super().__init__(rule_id, key, **kwargs)
+        self.window_seconds = window_hours * 3600
+        self.min_count = min_count
+        self.min_share = min_share
+
+    def evaluate(self, ts, sentiment=None, **_):
+        events = self.state.setdefault('events', [])
+        events.append([ts, 1 if sentiment == 'Negative' else 0])
+        newest = max(e[0] for e in events)
+        events[:] = [e for e in events if e[0] > newest - self.window_seconds]
+        negatives = sum(e[1] for e in events)
+        if negatives >= self.min_count and negatives / len(events) >= self.min_share:
+            return {'message': f"{self.key}: {negatives}/{len(events)} negative articles in {self.window_seconds // 3600}h",
+                    'value': float(negatives)}
+        return None
+
+
+RULE_TYPES = {
+    'price_cross': PriceCrossRule,
+    'percent_move': PercentMoveRule,
+    'volume_spike': VolumeSpikeRule,
+    'tvl_drop': TvlDropRule,
+    'negative_sentiment_surge': NegativeSentimentSurgeRule,
+}
+
+
+def build_rules(definitions: Iterable[Dict[str, Any]]) -> List[AlertRule]:
+    """Създава правила от конфигурация: {'type': ..., 'key': ..., <параметри>, 'id': незадължително}."""
+    rules = []
+    for definition in definitions:
+        params = dict(definition)
+        rule_type, key = params.pop('type'), params.pop('key')
+        rule_id = params.pop('id', None) or f"{rule_type}:{key}:" + ",".join(f"{k}={v}" for k, v in sorted(params.items()))
+        rules.append(RULE_TYPES[rule_type](rule_id, key, **params))
+    return rules
+
+
+# --- Sinks ---
+class TableSink:
+    """Записва alert-ите в таблица alerts (уникален dedup_key пази от дубликати)."""
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    def send(self, alerts: List[Dict[str, Any]]):
+        self.db_manager.save_alerts(alerts)
+
+
+class FileSink:
+    """Добавя alert-ите като JSON редове във файл."""
+    def __init__(self, path: str = ALERTS_FILE):
+        self.path = path
+
+    def send(self, alerts: List[Dict[str, Any]]):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    """POST към webhook; без URL само логва какво би изпратил (stand-in за локална работа)."""
+    def __init__(self, url: Optional[str] = ALERT_WEBHOOK_URL, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts: List[Dict[str, Any]]):
+        for alert in alerts:
+            if not self.url:
+                logging.info(f"🔔 [webhook stand-in] {alert['message']}")
+                continue
+            try:
+                requests.post(self.url, json=alert, timeout=self.timeout).raise_for_status()
+            except requests.RequestException as e:
+                logging.error(f"❌ Failed to deliver alert {alert['rule_id']} to webhook: {e}")
+
+
+class AlertEngine:
+    """
+    Оценява правилата инкрементално върху редовете, които всяка pipeline стъпка
+    току-що е записала. Правилата са индексирани по (поток, ключ), така че ново
+    събитие докосва само правилата за своя актив/верига. Състоянието на
+    правилата се пази в alert_rule_state и се зарежда веднъж при старт.
+    Събития, по-стари от max_event_age, само обновяват състоянието - така
+    първото изтегляне на история не залива sink-овете със стари alert-и.
+    С hot_store ново ценово правило (без запазено състояние) зарежда прозореца
+    си от последните барове в паметта и може да alert-не още на първия нов бар.
+    hot_store може да е и функция без аргументи - тогава store-ът се зарежда
+    едва когато някое правило наистина има нужда от история.
+    """
+    def __init__(self, db_manager, rules: List[AlertRule] = None, sinks: List[Any] = None,
+                 max_event_age: int = ALERT_MAX_EVENT_AGE, hot_store=None):
+        self.db_manager = db_manager
+        self.hot_store = hot_store
+        self.rules = build_rules(ALERT_RULES) if rules is None else rules
+        self.sinks = [TableSink(db_manager), FileSink(), WebhookSink()] if sinks is None else sinks
+        self.max_event_age = max_event_age
+        self._index: Dict[tuple, List[AlertRule]] = defaultdict(list)
+        for rule in self.rules:
+            self._index[(rule.stream, rule.key)].append(rule)
+        states = db_manager.get_alert_rule_states([r.rule_id for r in self.rules]) if self.rules else {}
+        for rule in self.rules:
+            rule.state = states.get(rule.rule_id, {})
+
+    def _dispatch(self, stream: str, key: str, events: Iterable[tuple]) -> List[Dict[str, Any]]:
+        """events: (ts, {стойности}); връща изпратените alert-и."""
+        rules = self._index.get((stream, key))
+        if not rules:
+            return []
+        events = sorted(events, key=lambda e: e[0])
+        if not events:
+            return []
+        if stream == PRICE_STREAM and self.hot_store is not None:
+            self._seed(key, rules, events[0][0])
+        cutoff = time.time() - self.max_event_age
+        alerts = []
+        for ts, values in events:
+            for rule in rules:
+                alert = rule.process(ts, **values)
+                if alert and ts >= cutoff:
+                    alerts.append(alert)
+        self.db_manager.save_alert_rule_states({r.rule_id: r.state for r in rules})
+        if alerts:
+            for sink in self.sinks:
+                sink.send(alerts)
+            logging.info(f"🔔 {len(alerts)} alert(s) fired for {key}.")
+        return alerts
+
+    def _seed(self, key: str, rules: List[AlertRule], before_ts: int):
+        """Зарежда правилата без състояние с баровете от hot store-а преди първото ново събитие."""
+        fresh = [rule for rule in rules if not rule.state and rule.history_bars]
+        if not fresh:
+            return
+        if callable(self.hot_store):
+            self.hot_store = self.hot_store()
+        window = self.hot_store.window(key)
+        window = window[window['timestamp'] < before_ts]
+        for rule in fresh:
+            rows = window[len(window) - min(rule.history_bars, len(window)):]
+            rule.seed((int(row['timestamp']), {'close': float(row['close']), 'volume': float(row['volume'])})
+                      for row in rows)
+            if rule.state:
+                logging.info(f"🔔 Rule {rule.rule_id} seeded with {len(rows)} bars from the hot store.")
+
+    # --- Входни точки за pipeline стъпките ---
+    def on_market_data(self, market_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        by_asset = defaultdict(list)
+        for row in market_data:
+            ts = to_epoch_seconds(row.get('date'))
+            if ts is not None:
+                by_asset[row['asset_id']].append((ts, {'close': row.get('price'), 'volume': row.get('total_volume')}))
+        return [a for asset_id, events in by_asset.items() for a in self._dispatch(PRICE_STREAM, asset_id, events)]
+
+    def on_candles(self, symbol: str, klines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        events = [(int(k['timestamp']), {'close': k.get('close'), 'volume': k.get('volume')}) for k in klines]
+        return self._dispatch(PRICE_STREAM, symbol, events)
+
+    def on_tvl(self, tvl_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        by_chain = defaultdict(list)
+        for row in tvl_data:
+            by_chain[row['chain']].append((int(row['timestamp']), {'tvl': row.get('tvl')}))
+        return [a for chain, events in by_chain.items() for a in self._dispatch(TVL_STREAM, chain, events)]
+
+    def on_article_analysis(self, article: Dict[str, Any], analysis: Dict[str, Any],
+                            asset_ids: List[str]) -> List[Dict[str, Any]]:
+        ts = to_epoch_seconds(article.get('published_at')) or int(time.time())
+        event = [(ts, {'sentiment': analysis.get('sentiment')})]
+        return [a for asset_id in asset_ids for a in self._dispatch(SENTIMENT_STREAM, asset_id, event)]
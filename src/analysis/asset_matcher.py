@@ -0,0 +1,60 @@
+# src/analysis/asset_matcher.py
+
+import re
+from typing import Dict, List, Optional
+
+from config import ASSETS_TO_TRACK, ASSET_ALIASES
+
+
+class AssetMatcher:
+    """
+    Открива кои от следените активи се споменават в даден текст.
+    Всички синоними се компилират в един регулярен израз с граници на думи,
+    така че проверката е едно преминаване през текста, независимо от броя активи.
+    """
+    def __init__(self, aliases: Optional[Dict[str, List[str]]] = None):
+        if aliases is None:
+            aliases = {name: ASSET_ALIASES.get(name, [name]) for name in ASSETS_TO_TRACK}
+        self.aliases = aliases
+        self._alias_to_asset = {}
+        for asset_name, asset_aliases in aliases.items():
+            for alias in asset_aliases:
+                self._alias_to_asset[alias.lower()] = asset_name
+        # По-дългите синоними първи, за да печелят пред по-късите си префикси
+        alternatives = sorted(self._alias_to_asset, key=len, reverse=True)
+        self._pattern = re.compile(
+            r"(?<![\w$])(" + "|".join(re.escape(a) for a in alternatives) + r")(?!\w)",
+            re.IGNORECASE
+        ) if alternatives else None
+
+    @classmethod
+    def from_database(cls, db_manager) -> 'AssetMatcher':
+        """Синонимите на включените активи от таблицата assets (ключът е CoinGecko id-то)."""
+        assets = db_manager.get_tracked_assets()
+        if not assets:
+            return cls()
+        return cls({a['id']: a['aliases'] or [a['name'].lower()] for a in assets})
+
+    def match(self, text: Optional[str]) -> List[str]:
+        """Връща уникалните активи, споменати в текста, по реда на първото споменаване."""
+        if not text or self._pattern is None:
+            return []
+        found = []
+        for m in self._pattern.finditer(text):
+            asset_name = self._alias_to_asset[m.group(1).lower()]
+            if asset_name not in found:
+                found.append(asset_name)
+        return found
+
+    def match_asset_ids(self, title: Optional[str], category: Optional[str] = None) -> List[str]:
+        """
+        Id-тата (CoinGecko) на активите, за които е статията: споменатите в
+        заглавието плюс категорията, ако статията е събрана за конкретен актив.
+        """
+        names = self.match(title)
+        if category in self.aliases and category not in names:
+            names.insert(0, category)
+        return [ASSETS_TO_TRACK.get(name, name) for name in names]
+
+    def mentions_any(self, text: Optional[str]) -> bool:
+        return bool(text) and self._pattern is not None and self._pattern.search(text) is not None
@@ -0,0 +1,256 @@
+# src/analysis/backtester.py
+
+import itertools
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Параметри на стратегията "тренд + филтър по настроенията" и стойности за sweep по подразбиране
+DEFAULT_PARAM_SPACE = {
+    'fast': [5, 10, 20],
+    'slow': [30, 50, 100],
+    'sent_window': [1, 3, 7],
+    'sent_entry': [-1.0, 0.0, 0.2, 0.4],   # -1.0 = без филтър по настроенията
+    'sent_exit': [-1.0, -0.4, -0.2, 0.0],
+}
+METRICS = ('total_return', 'sharpe', 'max_drawdown', 'trades', 'exposure')
+PERIODS_PER_YEAR = 365  # Крипто се търгува всеки ден
+
+
+@dataclass
+class PricePanel:
+    """Подравнени дневни серии: редовете са дни, колоните - активи."""
+    dates: np.ndarray          # datetime64[D], (T,)
+    asset_ids: List[str]
+    close: np.ndarray          # float64, (T, A); NaN преди първата цена на актива
+    sentiment: np.ndarray      # float64, (T, A); среден score от sentiment_index за деня (-1..1), 0 без новини
+
+    @classmethod
+    def from_database(cls, db_manager, asset_ids: List[str]) -> 'PricePanel':
+        price_rows = db_manager.get_price_rows(asset_ids)
+        if not price_rows:
+            raise ValueError("No market data for the requested assets.")
+        dates = np.unique(np.array([r[1] for r in price_rows], dtype='datetime64[D]'))
+        columns = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+        close = np.full((len(dates), len(asset_ids)), np.nan)
+        row_idx = np.searchsorted(dates, np.array([r[1] for r in price_rows], dtype='datetime64[D]'))
+        col_idx = np.array([columns[r[0]] for r in price_rows])
+        close[row_idx, col_idx] = [r[2] for r in price_rows]
+        close = _forward_fill(close)
+
+        sentiment = np.zeros_like(close)
+        sentiment_rows = db_manager.get_daily_sentiment_rows(asset_ids)
+        if sentiment_rows:
+            days = np.array([r[1] for r in sentiment_rows], dtype='datetime64[s]').astype('datetime64[D]')
+            scores = np.array([r[2] for r in sentiment_rows], dtype=np.float64)
+            inside = (days >= dates[0]) & (days <= dates[-1])
+            rows = np.searchsorted(dates, days[inside])
+            cols = np.array([columns[r[0]] for r in sentiment_rows])[inside]
+            # Ден без цена (rows сочи следващия) - настроението се отчита в следващия търговски ден
+            np.add.at(sentiment, (rows, cols), scores[inside])
+        return cls(dates, list(asset_ids), close, np.clip(sentiment, -1.0, 1.0))
+
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    """Попълва NaN с последната известна стойност по колона (водещите NaN остават)."""
+    valid = ~np.isnan(values)
+    idx = np.where(valid, np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    filled = values[idx, np.arange(values.shape[1])]
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return filled
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Плъзгаща средна по колона чрез cumsum; NaN, докато прозорецът не е пълен."""
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = sums / counts
+    out[counts < window] = np.nan
+    return out
+
+
+def lag(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    """Измества редовете надолу с periods бара (първите стават NaN) - стойността от ден t е видима от t + periods."""
+    lagged = np.full(values.shape, np.nan)
+    lagged[periods:] = values[:-periods]
+    return lagged
+
+
+def positions_from_signals(entries: np.ndarray, exits: np.ndarray) -> np.ndarray:
+    """
+    Превръща сигналите за вход/изход в позиция 1/0 без цикъл:
+    всеки сигнал задава състояние, което се пренася напред до следващия.
+    При едновременен вход и изход печели изходът.
+    """
+    state = np.where(exits, 0.0, np.where(entries, 1.0, np.nan))
+    return np.nan_to_num(_forward_fill(state), nan=0.0)
+
+
+def strategy_positions(close: np.ndarray, sentiment: np.ndarray, params: Dict[str, Any],
+                       cache: Optional[Dict[Tuple[str, int], np.ndarray]] = None) -> np.ndarray:
+    """
+    Позицията 1/0 в края на всеки ден: вход при fast SMA > slow SMA и средно
+    настроение >= sent_entry, изход при обърнат тренд или средно настроение <= sent_exit.
+    close[t] е цената в 00:00 UTC на ден t, а sentiment[t] - статиите, публикувани
+    през целия ден t, затова настроението се взима с един бар закъснение:
+    новини от ден t променят позицията най-рано на t + 1.
+    """
+    cache = {} if cache is None else cache
+
+    def indicator(kind: str, window: int, source: np.ndarray) -> np.ndarray:
+        key = (kind, window)
+        if key not in cache:
+            cache[key] = rolling_mean(source, window)
+        return cache[key]
+
+    fast = indicator('sma', params['fast'], close)
+    slow = indicator('sma', params['slow'], close)
+    if ('lagged_sentiment', 1) not in cache:
+        cache[('lagged_sentiment', 1)] = lag(sentiment)
+    mood = indicator('sentiment', params['sent_window'], cache[('lagged_sentiment', 1)])
+    with np.errstate(invalid='ignore'):
+        trend_up = fast > slow
+        trend_down = fast <= slow
+        entries = trend_up & (mood >= params['sent_entry'])
+        exits = trend_down | (mood <= params['sent_exit'])
+    return positions_from_signals(entries, exits)
+
+
+def run_strategy(close: np.ndarray, sentiment: np.ndarray, params: Dict[str, Any],
+                 fee_bps: float = 10.0, slippage_bps: float = 5.0,
+                 cache: Optional[Dict[Tuple[str, int], np.ndarray]] = None) -> Dict[str, np.ndarray]:
+    """
+    Long/flat стратегия върху всички активи наведнъж (сигналите - в strategy_positions).
+    Позицията се изпълнява на следващия бар (без поглед в бъдещето),
+    а всяка промяна в позицията плаща такса + slippage.
+    Връща метриките по актив (масиви с дължина A).
+    """
+    position = strategy_positions(close, sentiment, params, cache)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.nan_to_num(close[1:] / close[:-1] - 1.0)
+    held = position[:-1]  # Сигнал в края на ден t -> доходност през ден t+1
+    turnover = np.abs(np.diff(position, axis=0, prepend=0.0))[:-1]
+    strategy_returns = held * returns - turnover * (fee_bps + slippage_bps) / 10_000
+
+    equity = np.cumprod(1.0 + strategy_returns, axis=0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1.0
+    std = strategy_returns.std(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sharpe = np.where(std > 0, strategy_returns.mean(axis=0) / std * np.sqrt(PERIODS_PER_YEAR), 0.0)
+    return {
+        'total_return': equity[-1] - 1.0 if len(equity) else np.zeros(close.shape[1]),
+        'sharpe': sharpe,
+        'max_drawdown': drawdown.min(axis=0) if len(drawdown) else np.zeros(close.shape[1]),
+        'trades': (np.diff(position, axis=0, prepend=0.0) > 0).sum(axis=0).astype(np.float64),
+        'exposure': held.mean(axis=0) if len(held) else np.zeros(close.shape[1]),
+    }
+
+
+# --- Параметрични sweep-ове ---
+def _is_valid(params: Dict[str, Any]) -> bool:
+    return params['fast'] < params['slow'] and params['sent_exit'] < params['sent_entry']
+
+
+def build_param_grid(space: Dict[str, List[Any]] = None) -> List[Dict[str, Any]]:
+    """Всички валидни комбинации от пространството."""
+    space = space or DEFAULT_PARAM_SPACE
+    keys = list(space)
+    combos = (dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys)))
+    return [p for p in combos if _is_valid(p)]
+
+
+def sample_params(space: Dict[str, List[Any]] = None, n: int = 1000, seed: int = 42) -> List[Dict[str, Any]]:
+    """Случайна извадка от n различни валидни комбинации (или всички, ако са по-малко)."""
+    grid = build_param_grid(space)
+    return random.Random(seed).sample(grid, min(n, len(grid)))
+
+
+# Състояние на worker процеса: масивите се закачат веднъж към shared memory, не се pickle-ват за всяка задача
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(descriptors: Dict[str, Tuple[str, tuple, str]], fee_bps: float, slippage_bps: float):
+    _WORKER.clear()
+    _WORKER['segments'] = []
+    for name, (shm_name, shape, dtype) in descriptors.items():
+        segment = shared_memory.SharedMemory(name=shm_name)
+        _WORKER['segments'].append(segment)
+        array = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+        array.flags.writeable = False
+        _WORKER[name] = array
+    _WORKER['fee_bps'] = fee_bps
+    _WORKER['slippage_bps'] = slippage_bps
+    _WORKER['cache'] = {}  # Индикаторите се преизползват между комбинациите в процеса
+
+
+def _run_chunk(params_chunk: List[Dict[str, Any]]) -> np.ndarray:
+    """Резултат: (len(chunk), A, len(METRICS)) - компактен за връщане към главния процес."""
+    out = np.empty((len(params_chunk), _WORKER['close'].shape[1], len(METRICS)))
+    for i, params in enumerate(params_chunk):
+        metrics = run_strategy(_WORKER['close'], _WORKER['sentiment'], params,
+                               _WORKER['fee_bps'], _WORKER['slippage_bps'], _WORKER['cache'])
+        out[i] = np.column_stack([metrics[m] for m in METRICS])
+    return out
+
+
+def run_sweep(panel: PricePanel, params_list: List[Dict[str, Any]], workers: Optional[int] = None,
+              fee_bps: float = 10.0, slippage_bps: float = 5.0, chunk_size: int = 64) -> pd.DataFrame:
+    """
+    Пуска всички комбинации върху всички активи в ProcessPoolExecutor.
+    Цените и настроенията се копират веднъж в shared memory и всеки worker
+    ги закача при стартиране; задачите носят само списъци с параметри.
+    Връща по един ред за (комбинация, актив).
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [params_list[i:i + chunk_size] for i in range(0, len(params_list), chunk_size)]
+    arrays = {'close': panel.close, 'sentiment': panel.sentiment}
+
+    if workers == 1 or len(chunks) == 1:
+        _WORKER.clear()
+        _WORKER.update(arrays, fee_bps=fee_bps, slippage_bps=slippage_bps, cache={})
+        results = [_run_chunk(chunk) for chunk in chunks]
+    else:
+        segments = []
+        try:
+            descriptors = {}
+            for name, array in arrays.items():
+                segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                segments.append(segment)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[:] = array
+                descriptors[name] = (segment.name, array.shape, array.dtype.str)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(descriptors, fee_bps, slippage_bps)) as executor:
+                results = list(executor.map(_run_chunk, chunks))
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+
+    metrics = np.concatenate(results) if results else np.empty((0, len(panel.asset_ids), len(METRICS)))
+    n_params, n_assets = metrics.shape[0], metrics.shape[1]
+    frame = pd.DataFrame(metrics.reshape(-1, len(METRICS)), columns=list(METRICS))
+    frame.insert(0, 'asset_id', np.tile(panel.asset_ids, n_params))
+    params_frame = pd.DataFrame(params_list).loc[np.repeat(np.arange(n_params), n_assets)].reset_index(drop=True)
+    return pd.concat([params_frame, frame], axis=1)
+
+
+def summarize_sweep(results: pd.DataFrame, top: int = 10) -> pd.DataFrame:
+    """Средни метрики по комбинация през всички активи, подредени по Sharpe."""
+    param_columns = [c for c in results.columns if c not in METRICS and c != 'asset_id']
+    summary = results.groupby(param_columns, as_index=False)[list(METRICS)].mean()
+    return summary.sort_values('sharpe', ascending=False).head(top)
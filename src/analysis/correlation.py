@@ -0,0 +1,276 @@
+# src/analysis/correlation.py
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    CORRELATION_WINDOWS, CORRELATION_MIN_OVERLAP, CORRELATION_BENCHMARK,
+    CORRELATION_MAX_GAP_DAYS, CORRELATION_HISTORY_DAYS
+)
+from src.analysis.backtester import _forward_fill
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Наборите, от които се строят сериите; промяна във версията им означава нови данни
+CORRELATION_DATASETS = ('market_data', 'candles', 'forex', 'tvl')
+DAYS_PER_YEAR = 365
+
+
+def build_price_panel(rows: List[tuple]) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    (серия, ден, стойност) -> (дни (T,) datetime64[D], серии, цени (T, N)).
+    Дните са непрекъснат календар (криптото се търгува всеки ден); липсите са NaN.
+    """
+    labels = sorted({r[0] for r in rows})
+    days = np.array([r[1] for r in rows], dtype='datetime64[D]')
+    dates = np.arange(days.min(), days.max() + 1) if len(days) else np.array([], dtype='datetime64[D]')
+    prices = np.full((len(dates), len(labels)), np.nan)
+    if len(days):
+        columns = {label: i for i, label in enumerate(labels)}
+        values = np.array([r[2] for r in rows], dtype=np.float64)
+        prices[(days - dates[0]).astype(np.int64), [columns[r[0]] for r in rows]] = values
+    prices[~(prices > 0)] = np.nan  # Нулеви/отрицателни стойности нямат логаритмична доходност
+    return dates, labels, prices
+
+
+def log_returns(prices: np.ndarray, max_gap: int = CORRELATION_MAX_GAP_DAYS) -> np.ndarray:
+    """
+    Дневни логаритмични доходности (T, N) спрямо последната известна цена.
+    Доходност през липса, по-дълга от max_gap дни, е NaN - така Forex
+    уикендите и единичните пропуски не чупят серията, а дългите дупки не се
+    превръщат в един огромен скок.
+    """
+    valid = ~np.isnan(prices)
+    last_seen = np.where(valid, np.arange(len(prices))[:, None], -1)
+    np.maximum.accumulate(last_seen, axis=0, out=last_seen)
+    previous = np.full_like(prices, np.nan)
+    previous[1:] = _forward_fill(prices)[:-1]
+    gap = np.full(prices.shape, max_gap + 1)
+    gap[1:] = np.arange(1, len(prices))[:, None] - last_seen[:-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.log(prices / previous)
+    returns[gap > max_gap] = np.nan
+    return returns
+
+
+class RollingMoments:
+    """
+    Достатъчните статистики на двойките серии в един прозорец от редове:
+    n = MᵀM, sx = XᵀM, sxx = (X²)ᵀM, sxy = XᵀX (M - маска на наличните
+    доходности, X - доходностите с 0 на мястото на NaN). Всички двойки се
+    смятат с четири матрични умножения, а редовете могат да се добавят и
+    премахват поотделно - плъзгането на прозореца с един ден струва O(N²).
+    """
+    def __init__(self, n_series: int):
+        self.n = np.zeros((n_series, n_series))
+        self.sx = np.zeros((n_series, n_series))
+        self.sxx = np.zeros((n_series, n_series))
+        self.sxy = np.zeros((n_series, n_series))
+
+    def update(self, returns: np.ndarray, sign: float = 1.0):
+        """Добавя (sign=1) или премахва (sign=-1) редовете returns (k, N)."""
+        if not len(returns):
+            return
+        mask = (~np.isnan(returns)).astype(np.float64)
+        x = np.nan_to_num(returns, nan=0.0)
+        self.n += sign * (mask.T @ mask)
+        self.sx += sign * (x.T @ mask)
+        self.sxx += sign * ((x * x).T @ mask)
+        self.sxy += sign * (x.T @ x)
+
+    def stats(self, window: int, min_overlap: int = CORRELATION_MIN_OVERLAP) -> Dict[str, np.ndarray]:
+        """
+        corr[i, j] и beta[i, j] (на i спрямо j) по общите наблюдения на двойката,
+        годишна волатилност vol[i] и броят общи наблюдения overlap[i, j].
+        Двойките с по-малко от min_overlap общи наблюдения са NaN.
+        """
+        n = np.round(self.n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = (self.sxy - self.sx * self.sx.T / n) / (n - 1)
+            var_i = (self.sxx - self.sx ** 2 / n) / (n - 1)   # Дисперсия на i върху общите с j дни
+            var_j = var_i.T
+            corr = np.clip(cov / np.sqrt(var_i * var_j), -1.0, 1.0)
+            beta = cov / var_j
+            own = np.diag(n)
+            # Годишна волатилност по броя наблюдения в прозореца (Forex има ~5 на 7 дни)
+            vol = np.sqrt(np.maximum(np.diag(var_i), 0.0) * own * DAYS_PER_YEAR / window)
+        too_short = n < min_overlap
+        corr[too_short], beta[too_short] = np.nan, np.nan
+        vol[own < min_overlap] = np.nan
+        np.fill_diagonal(corr, np.where(own >= min_overlap, 1.0, np.nan))
+        return {'corr': corr, 'beta': beta, 'vol': vol, 'overlap': n.astype(np.int64)}
+
+
+@dataclass
+class CorrelationMatrices:
+    """Матриците на корелация, бета и волатилност в края на един прозорец."""
+    window: int
+    as_of: np.datetime64
+    labels: List[str]
+    corr: np.ndarray
+    beta: np.ndarray
+    vol: np.ndarray
+    overlap: np.ndarray
+
+
+def rolling_pair_stats(returns: np.ndarray, benchmark: np.ndarray, window: int,
+                       min_overlap: int = CORRELATION_MIN_OVERLAP) -> Dict[str, np.ndarray]:
+    """
+    Плъзгаща корелация и бета на всяка колона на returns (T, K) спрямо
+    benchmark (T,) за всеки ден - с кумулативни суми, O(T·K) вместо
+    по една матрица на ден.
+    """
+    mask = ~np.isnan(returns) & ~np.isnan(benchmark)[:, None]
+    x = np.where(mask, returns, 0.0)
+    y = np.where(mask, np.nan_to_num(benchmark, nan=0.0)[:, None], 0.0)
+
+    def windowed(values):
+        sums = np.cumsum(values, axis=0)
+        sums[window:] = sums[window:] - sums[:-window]
+        return sums
+
+    n, sx, sy = windowed(mask.astype(np.float64)), windowed(x), windowed(y)
+    sxx, syy, sxy = windowed(x * x), windowed(y * y), windowed(x * y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxy - sx * sy / n
+        var_x, var_y = sxx - sx ** 2 / n, syy - sy ** 2 / n
+        corr = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+        beta = cov / var_y
+    too_short = np.round(n) < min_overlap
+    corr[too_short], beta[too_short] = np.nan, np.nan
+    return {'corr': corr, 'beta': beta}
+
+
+class CorrelationService:
+    """
+    Подравнена матрица от дневни доходности за всички серии (CoinGecko цени,
+    KuCoin свещи, Forex/DXY и TVL по вериги) и плъзгащи корелации, бети и
+    волатилности за прозорците от CORRELATION_WINDOWS.
+    Резултатът се кешира по версиите на наборите: докато те не се сменят,
+    refresh() не чете базата. При нови барове се зареждат само дните от
+    последния кеширан нататък, а статистиките на прозорците се обновяват с
+    изваждане на излезлите и добавяне на новите редове. Ако по-стари дни са се
+    променили (напр. след поправка на дупки) или се появи нова серия, всичко се
+    построява наново.
+    """
+    def __init__(self, db_manager, windows: List[int] = None, history_days: int = CORRELATION_HISTORY_DAYS,
+                 max_gap: int = CORRELATION_MAX_GAP_DAYS):
+        self.db_manager = db_manager
+        self.windows = sorted(windows or CORRELATION_WINDOWS)
+        self.history_days = max(history_days, self.windows[-1] + 1)
+        self.max_gap = max_gap
+        self.dates = np.array([], dtype='datetime64[D]')
+        self.labels: List[str] = []
+        self.prices = np.empty((0, 0))
+        self.returns = np.empty((0, 0))
+        self._moments: Dict[int, RollingMoments] = {}
+        self._versions: Optional[Dict[str, int]] = None
+        self._stable_fingerprint: Optional[Tuple[int, float]] = None
+        self._lock = threading.Lock()
+
+    # --- Зареждане ---
+    def refresh(self) -> bool:
+        """Синхронизира с базата; връща True, ако данните са се променили."""
+        with self._lock:
+            all_versions = self.db_manager.get_data_versions()
+            versions = {dataset: all_versions.get(dataset, 0) for dataset in CORRELATION_DATASETS}
+            if versions == self._versions:
+                return False
+            if not len(self.dates) or not self._append_latest():
+                self._rebuild()
+            self._versions = versions
+            return True
+
+    def _since_day(self) -> Optional[str]:
+        """Първият ден от прозореца history_days, броен от последния ден с данни (не от днес - базата може да е стара)."""
+        latest_day = self.db_manager.get_latest_daily_close_day()
+        if latest_day is None:
+            return None
+        return str(np.datetime64(latest_day[:10], 'D') - (self.history_days - 1))
+
+    def _rebuild(self):
+        dates, labels, prices = build_price_panel(self.db_manager.get_daily_closes(self._since_day()))
+        self._set_panel(dates[-self.history_days:], labels, prices[-self.history_days:])
+        self._moments = {}
+        for window in self.windows:
+            moments = RollingMoments(len(self.labels))
+            moments.update(self.returns[-window:])
+            self._moments[window] = moments
+        logging.info(f"🔗 Correlation panel rebuilt: {len(self.dates)} days x {len(self.labels)} series")
+
+    def _set_panel(self, dates: np.ndarray, labels: List[str], prices: np.ndarray):
+        self.dates, self.labels, self.prices = dates, labels, prices
+        self.returns = log_returns(prices, self.max_gap)
+        self._stable_fingerprint = self._fingerprint(dates[-1]) if len(dates) else None
+
+    def _fingerprint(self, until_day: np.datetime64) -> Tuple[int, float]:
+        """Отпечатък само на дните в паметта - по-старите не влияят на панела и не се сканират."""
+        return self.db_manager.get_daily_closes_fingerprint(str(self.dates[0]), str(until_day))
+
+    def _append_latest(self) -> bool:
+        """
+        Презарежда дните от последния кеширан нататък и обновява прозорците
+        инкрементално. Връща False, когато е нужно пълно построяване.
+        """
+        cut_day = self.dates[-1]
+        if self._fingerprint(cut_day) != self._stable_fingerprint:
+            return False
+        rows = self.db_manager.get_daily_closes(str(cut_day))
+        known = set(self.labels)
+        if not rows or any(r[0] not in known for r in rows):
+            return False
+        tail_dates, tail_labels, tail_prices = build_price_panel(rows)
+        if tail_dates[0] != cut_day:
+            return False
+        columns = [self.labels.index(label) for label in tail_labels]
+        old_returns = self.returns
+        prices = np.vstack([self.prices[:-1], np.full((len(tail_dates), len(self.labels)), np.nan)])
+        prices[len(self.prices) - 1:, columns] = tail_prices
+        dates = np.concatenate([self.dates[:-1], tail_dates])
+
+        # Кои редове са се сменили (първият променен е последният кеширан ден) и колко се изрязват отпред
+        first_changed = len(self.dates) - 1
+        dropped = max(0, len(dates) - self.history_days)
+        self._set_panel(dates[dropped:], self.labels, prices[dropped:])
+        new_total, old_total = len(self.dates) + dropped, len(old_returns)
+        for window, moments in self._moments.items():
+            if new_total - window >= first_changed:  # Целият прозорец е нов - по-евтино е да се сметне наново
+                moments = self._moments[window] = RollingMoments(len(self.labels))
+                moments.update(self.returns[-window:])
+                continue
+            old_rows = np.arange(max(old_total - window, 0), old_total)
+            leaving = old_rows[(old_rows < new_total - window) | (old_rows >= first_changed)]
+            moments.update(old_returns[leaving], sign=-1.0)
+            moments.update(self.returns[first_changed - dropped:])
+        return True
+
+    # --- Резултати ---
+    def matrices(self, window: int) -> Optional[CorrelationMatrices]:
+        """Корелация, бета и волатилност за последните window дни (window от self.windows)."""
+        self.refresh()
+        if window not in self._moments or not len(self.dates):
+            return None
+        stats = self._moments[window].stats(window)
+        return CorrelationMatrices(window, self.dates[-1], list(self.labels), **stats)
+
+    def rolling_vs_benchmark(self, labels: List[str], window: int,
+                             benchmark: str = CORRELATION_BENCHMARK) -> Optional[Dict[str, Any]]:
+        """Плъзгаща корелация и бета на сериите спрямо benchmark за всеки ден от историята."""
+        self.refresh()
+        if benchmark not in self.labels:
+            return None
+        columns = [self.labels.index(label) for label in labels if label in self.labels]
+        stats = rolling_pair_stats(self.returns[:, columns], self.returns[:, self.labels.index(benchmark)], window)
+        return {'dates': self.dates, 'labels': [self.labels[c] for c in columns], **stats}
+
+    def cumulative_returns(self, labels: List[str], days: int) -> Dict[str, Any]:
+        """Натрупаната доходност (в %) на сериите за последните days дни, от 0 в началото на периода."""
+        self.refresh()
+        columns = [self.labels.index(label) for label in labels if label in self.labels]
+        returns = np.nan_to_num(self.returns[-days:, columns], nan=0.0)
+        return {'dates': self.dates[-days:], 'labels': [self.labels[c] for c in columns],
+                'values': np.expm1(np.cumsum(returns, axis=0)) * 100}
@@ -0,0 +1,72 @@
+# src/analysis/downsampling.py
+
+from typing import Dict
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: избира threshold точки, които запазват
+    визуалната форма на линията (върхове и дъна), и връща индексите им.
+    Първата и последната точка винаги се запазват.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Граници на threshold - 2 вътрешни кофи (първата и последната точка са отделно)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Средната точка на следващата кофа (за последната - последната точка)
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # Площ на триъгълника (a, кандидат, средна точка) - векторизирано за цялата кофа
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int):
+    """Удобна обвивка - връща самите (x, y) вместо индексите."""
+    idx = lttb_indices(x, y, threshold)
+    return np.asarray(x)[idx], np.asarray(y)[idx]
+
+
+def bucket_ohlcv(timestamps: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray, max_buckets: int) -> Dict[str, np.ndarray]:
+    """
+    Min/max агрегиране на свещи в до max_buckets равни по време интервала:
+    open на първата свещ, max(high), min(low), close на последната, sum(volume).
+    Така екстремумите никога не се губят, за разлика от прореждането.
+    Очаква timestamps да са сортирани възходящо.
+    """
+    n = len(timestamps)
+    if n <= max_buckets:
+        return {'timestamp': timestamps, 'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}
+
+    edges = np.linspace(timestamps[0], timestamps[-1], max_buckets + 1)[:-1]
+    starts = np.unique(np.searchsorted(timestamps, edges, side='left'))
+    starts = starts[starts < n]
+    ends = np.append(starts[1:], n)
+    return {
+        'timestamp': timestamps[starts],
+        'open': open_[starts],
+        'high': np.maximum.reduceat(high, starts),
+        'low': np.minimum.reduceat(low, starts),
+        'close': close[ends - 1],
+        'volume': np.add.reduceat(volume, starts),
+    }
@@ -0,0 +1,285 @@
+# src/analysis/embedding_index.py
+
+import os
+import json
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config import EMBEDDINGS_DIR, OLLAMA_EMBED_MODEL, EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_FAILURES
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+VECTORS_FILE = "vectors.f32"
+IDS_FILE = "ids.i64"
+META_FILE = "meta.json"
+SEARCH_CHUNK_ROWS = 65536  # Колко реда се умножават наведнъж при търсене
+
+
+class EmbeddingStore:
+    """
+    Компактно хранилище за нормализирани float32 вектори.
+    Векторите са в memmap файл (capacity x dim), а id-тата на статиите - в
+    паралелен int64 memmap. meta.json пази броя на валидните редове и се
+    обновява само след flush на данните, така че прекъснат запис никога
+    не оставя "полузаписан" ред видим. Id-тата се добавят във възходящ ред,
+    което позволява търсене по id с двоично търсене вместо речник.
+    Очаква се един пишещ процес; четящите (напр. dashboard-ът) виждат
+    новите редове след refresh().
+    """
+    def __init__(self, directory: str = EMBEDDINGS_DIR, dim: Optional[int] = None,
+                 model: str = OLLAMA_EMBED_MODEL, initial_capacity: int = 4096, readonly: bool = False):
+        self.directory = directory
+        self.readonly = readonly
+        self.initial_capacity = initial_capacity
+        self.meta = {'dim': dim, 'count': 0, 'capacity': 0, 'model': model, 'max_id': 0}
+        self.vectors = None
+        self.ids = None
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+        self.refresh()
+
+    # --- Метаданни и файлове ---
+    @property
+    def count(self) -> int:
+        return self.meta['count']
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.meta['dim']
+
+    @property
+    def max_id(self) -> int:
+        """Най-голямото вече индексирано article id - водната линия за продължаване."""
+        return self.meta['max_id']
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def refresh(self):
+        """Презарежда meta.json и memmap-ите, ако хранилището е нараснало."""
+        meta_path = self._path(META_FILE)
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['capacity'] and (self.vectors is None or meta['capacity'] != self.meta['capacity']):
+            self._open_maps(meta['dim'], meta['capacity'])
+        self.meta = meta
+
+    def _open_maps(self, dim: int, capacity: int):
+        mode = 'r' if self.readonly else 'r+'
+        self.vectors = np.memmap(self._path(VECTORS_FILE), dtype=np.float32, mode=mode, shape=(capacity, dim))
+        self.ids = np.memmap(self._path(IDS_FILE), dtype=np.int64, mode=mode, shape=(capacity,))
+
+    def _write_meta(self):
+        tmp_path = self._path(META_FILE + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._path(META_FILE))
+
+    def _ensure_capacity(self, required: int):
+        capacity = self.meta['capacity']
+        if required <= capacity:
+            return
+        new_capacity = max(self.initial_capacity, capacity)
+        while new_capacity < required:
+            new_capacity *= 2
+        dim = self.meta['dim']
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.ids.flush()
+            self.vectors = self.ids = None
+        # Разширяваме файловете на място - съществуващите данни не се копират
+        for name, row_bytes in ((VECTORS_FILE, dim * 4), (IDS_FILE, 8)):
+            with open(self._path(name), 'ab') as f:
+                f.truncate(new_capacity * row_bytes)
+        self.meta['capacity'] = new_capacity
+        self._open_maps(dim, new_capacity)
+
+    # --- Запис ---
+    def add(self, article_ids: List[int], vectors: np.ndarray):
+        """Добавя вектори за статии с id-та, по-големи от max_id."""
+        if self.readonly:
+            raise RuntimeError("EmbeddingStore е отворен само за четене.")
+        if not article_ids:
+            return
+        ids = np.asarray(article_ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if ids[0] <= self.max_id or np.any(np.diff(ids) <= 0):
+            raise ValueError("Id-тата трябва да са строго растящи и по-големи от max_id.")
+        if self.meta['dim'] is None:
+            self.meta['dim'] = int(vectors.shape[1])
+        elif vectors.shape[1] != self.meta['dim']:
+            raise ValueError(f"Очаквана размерност {self.meta['dim']}, получена {vectors.shape[1]}.")
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        start = self.count
+        end = start + len(ids)
+        self._ensure_capacity(end)
+        self.vectors[start:end] = vectors
+        self.ids[start:end] = ids
+        self.vectors.flush()
+        self.ids.flush()
+
+        self.meta['count'] = end
+        self.meta['max_id'] = int(ids[-1])
+        self.meta['failures'] = 0
+        self._write_meta()
+
+    def record_failure(self) -> int:
+        """Отбелязва неуспешна партида от текущия max_id. Връща броя поредни неуспехи от него (пази се в meta.json)."""
+        self.meta['failures'] = self.meta.get('failures', 0) + 1
+        self._write_meta()
+        return self.meta['failures']
+
+    def skip(self, article_id: int):
+        """Премества max_id след статия, която моделът не може да индексира, без да добавя ред."""
+        if self.readonly:
+            raise RuntimeError("EmbeddingStore е отворен само за четене.")
+        self.meta['max_id'] = max(self.max_id, int(article_id))
+        self.meta['skipped'] = self.meta.get('skipped', 0) + 1
+        self.meta['failures'] = 0
+        self._write_meta()
+
+    # --- Търсене ---
+    def get_vector(self, article_id: int) -> Optional[np.ndarray]:
+        if not self.count:
+            return None
+        ids = self.ids[:self.count]
+        row = int(np.searchsorted(ids, article_id))
+        if row < self.count and ids[row] == article_id:
+            return np.array(self.vectors[row])
+        return None
+
+    def search(self, query: np.ndarray, k: int = 10, exclude_ids: Optional[List[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Top-k косинусово търсене. Векторите са нормализирани, така че
+        сходството е просто скаларно произведение; матрицата се обхожда на
+        парчета (BLAS matmul + argpartition), за да не се зарежда изцяло в RAM.
+        """
+        if not self.count:
+            return []
+        query = np.asarray(query, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        exclude = np.asarray(exclude_ids or [], dtype=np.int64)
+        want = k + len(exclude)
+
+        best_scores = np.empty(0, dtype=np.float32)
+        best_ids = np.empty(0, dtype=np.int64)
+        for start in range(0, self.count, SEARCH_CHUNK_ROWS):
+            end = min(start + SEARCH_CHUNK_ROWS, self.count)
+            scores = self.vectors[start:end] @ query
+            if len(scores) > want:
+                top = np.argpartition(scores, -want)[-want:]
+            else:
+                top = np.arange(len(scores))
+            best_scores = np.concatenate([best_scores, scores[top]])
+            best_ids = np.concatenate([best_ids, self.ids[start:end][top]])
+            if len(best_scores) > want:
+                keep = np.argpartition(best_scores, -want)[-want:]
+                best_scores, best_ids = best_scores[keep], best_ids[keep]
+
+        if len(exclude):
+            mask = ~np.isin(best_ids, exclude)
+            best_scores, best_ids = best_scores[mask], best_ids[mask]
+        order = np.argsort(-best_scores)[:k]
+        return [(int(best_ids[i]), float(best_scores[i])) for i in order]
+
+    def search_by_id(self, article_id: int, k: int = 5) -> List[Tuple[int, float]]:
+        """Намира най-близките статии до вече индексирана статия."""
+        vector = self.get_vector(article_id)
+        if vector is None:
+            return []
+        return self.search(vector, k=k, exclude_ids=[article_id])
+
+
+class ArticleEmbedder:
+    """
+    Изчислява embedding-и за новите статии през Ollama и ги добавя в EmbeddingStore.
+    Работи на партиди и продължава от store.max_id, така че прекъснато
+    изпълнение просто продължава от последната записана партида.
+    """
+    def __init__(self, db_manager, pool, store: Optional[EmbeddingStore] = None,
+                 model: str = OLLAMA_EMBED_MODEL, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.db_manager = db_manager
+        self.pool = pool
+        self.store = store or EmbeddingStore(model=model)
+        self.model = model
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _article_text(article: Dict[str, Any]) -> str:
+        return article.get('title') or ''
+
+    def _embed(self, articles: List[Dict[str, Any]]) -> np.ndarray:
+        response = self.pool.embed(model=self.model, input=[self._article_text(a) for a in articles])
+        embeddings = response['embeddings']
+        if len(embeddings) != len(articles):
+            raise ValueError(f"expected {len(articles)} embeddings, got {len(embeddings)}")
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def _isolate(self, articles: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Индексира партидата статия по статия и прескача тези, които моделът
+        отхвърля. Ако не мине нито една от няколко, проблемът е в сървъра, а не
+        в статиите - нищо не се прескача и се връща None.
+        """
+        added, rejected = 0, []
+        for article in articles:
+            try:
+                vectors = self._embed([article])
+            except Exception as e:
+                rejected.append((article, e))
+                continue
+            self._skip(rejected)  # max_id расте монотонно - по-ранните отхвърлени се прескачат преди add
+            rejected = []
+            self.store.add([article['id']], vectors)
+            added += 1
+        if rejected and not added and len(articles) > 1:
+            return None
+        self._skip(rejected)
+        return added
+
+    def _skip(self, rejected):
+        for article, error in rejected:
+            self.store.skip(article['id'])
+            logging.warning(f"⚠️ Skipping article #{article['id']} - it cannot be embedded: {error}")
+
+    def run(self, max_batches: Optional[int] = None) -> int:
+        """
+        Индексира всички още неиндексирани статии. Връща броя добавени вектори.
+        Партида, която се проваля EMBEDDING_MAX_FAILURES пъти подред, се
+        индексира статия по статия, а отхвърлените статии се прескачат -
+        една лоша статия не спира индексирането завинаги.
+        """
+        total = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            articles = self.db_manager.get_articles_after_id(self.store.max_id, limit=self.batch_size)
+            if not articles:
+                break
+            try:
+                vectors = self._embed(articles)
+            except Exception as e:
+                failures = self.store.record_failure()
+                if failures < EMBEDDING_MAX_FAILURES:
+                    logging.error(f"❌ Embedding request failed (attempt {failures}/{EMBEDDING_MAX_FAILURES}, "
+                                  f"resuming from article #{self.store.max_id} next run): {e}")
+                    break
+                added = self._isolate(articles)
+                if added is None:
+                    logging.error(f"❌ Embedding service keeps failing at article #{self.store.max_id}: {e}")
+                    break
+                total += added
+                batches += 1
+                continue
+            self.store.add([a['id'] for a in articles], vectors)
+            total += len(articles)
+            batches += 1
+        if total:
+            logging.info(f"🧭 Embedded {total} articles (index size: {self.store.count}).")
+        return total
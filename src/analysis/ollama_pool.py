@@ -0,0 +1,196 @@
+# src/analysis/ollama_pool.py
+
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+
+import ollama
+
+from config import OLLAMA_HOSTS, OLLAMA_MAX_FAILURES, OLLAMA_EJECT_SECONDS, OLLAMA_HEALTH_CHECK_INTERVAL
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Горни граници (в секунди) на кофите в хистограмата на латентността
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+
+class OllamaEndpoint:
+    """Един Ollama сървър и натрупаната статистика за него."""
+    def __init__(self, host: str, timeout: Optional[float] = None):
+        self.host = host
+        self.client = ollama.Client(host=host, timeout=timeout)
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.total_requests = 0
+        self.total_failures = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+
+    def is_available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def record_latency(self, seconds: float):
+        self.latency_sum += seconds
+        for i, upper_bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= upper_bound:
+                self.latency_buckets[i] += 1
+                break
+
+
+class OllamaEndpointPool:
+    """
+    Разпределя заявките между няколко Ollama сървъра (least-outstanding-requests).
+    Сървър, който върне max_failures поредни грешки, се изключва за eject_seconds.
+    Фонова нишка периодично проверява изключените сървъри и ги връща обратно.
+    """
+    def __init__(self, hosts: Optional[List[str]] = None,
+                 max_failures: int = OLLAMA_MAX_FAILURES,
+                 eject_seconds: float = OLLAMA_EJECT_SECONDS,
+                 health_check_interval: Optional[float] = OLLAMA_HEALTH_CHECK_INTERVAL,
+                 timeout: Optional[float] = None):
+        hosts = hosts or OLLAMA_HOSTS
+        if not hosts:
+            raise ValueError("Необходим е поне един Ollama сървър.")
+        self.endpoints = [OllamaEndpoint(host, timeout=timeout) for host in hosts]
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._health_thread = None
+        if health_check_interval and len(self.endpoints) > 1:
+            self._health_thread = threading.Thread(
+                target=self._health_check_loop, args=(health_check_interval,), daemon=True
+            )
+            self._health_thread.start()
+        logging.info(f"🔀 Ollama pool initialized with {len(self.endpoints)} host(s): {', '.join(hosts)}")
+
+    @property
+    def size(self) -> int:
+        return len(self.endpoints)
+
+    # --- Публични методи, огледални на ollama.Client ---
+    def chat(self, **kwargs) -> Any:
+        return self._call('chat', **kwargs)
+
+    def generate(self, **kwargs) -> Any:
+        return self._call('generate', **kwargs)
+
+    def embed(self, **kwargs) -> Any:
+        return self._call('embed', **kwargs)
+
+    def _call(self, method: str, **kwargs) -> Any:
+        endpoint = self._acquire()
+        started = time.perf_counter()
+        try:
+            result = getattr(endpoint.client, method)(**kwargs)
+        except Exception:
+            self._release(endpoint, time.perf_counter() - started, failed=True)
+            raise
+        self._release(endpoint, time.perf_counter() - started, failed=False)
+        return result
+
+    def _acquire(self) -> OllamaEndpoint:
+        with self._lock:
+            now = time.time()
+            candidates = [e for e in self.endpoints if e.is_available(now)]
+            if not candidates:
+                # Всички са изключени - пробваме този, който ще се върне най-скоро,
+                # вместо да откажем заявката изцяло.
+                candidates = [min(self.endpoints, key=lambda e: e.ejected_until)]
+            endpoint = min(candidates, key=lambda e: (e.outstanding, e.total_requests))
+            endpoint.outstanding += 1
+            endpoint.total_requests += 1
+            return endpoint
+
+    def _release(self, endpoint: OllamaEndpoint, latency: float, failed: bool):
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.record_latency(latency)
+            if failed:
+                endpoint.total_failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.max_failures:
+                    self._eject(endpoint)
+            else:
+                endpoint.consecutive_failures = 0
+
+    def _eject(self, endpoint: OllamaEndpoint):
+        endpoint.ejected_until = time.time() + self.eject_seconds
+        logging.warning(f"⛔ Ollama host {endpoint.host} ejected for {self.eject_seconds}s "
+                        f"after {endpoint.consecutive_failures} consecutive failures.")
+
+    def warm_up(self, models: List[str], keep_alive: Any = None):
+        """
+        Зарежда моделите на всеки сървър предварително (празен generate),
+        така че първата истинска заявка не плаща за зареждането им.
+        """
+        for endpoint in self.endpoints:
+            for model in models:
+                try:
+                    endpoint.client.generate(model=model, prompt='', keep_alive=keep_alive)
+                    logging.info(f"🔥 Model '{model}' warmed up on {endpoint.host}.")
+                except Exception as e:
+                    logging.warning(f"⚠️ Could not warm up '{model}' on {endpoint.host}: {e}")
+
+    # --- Health checks ---
+    def health_check(self) -> Dict[str, bool]:
+        """Проверява всички сървъри с лека заявка (списък с модели)."""
+        results = {}
+        for endpoint in self.endpoints:
+            try:
+                endpoint.client.list()
+                healthy = True
+            except Exception as e:
+                healthy = False
+                logging.warning(f"⚠️ Health check failed for Ollama host {endpoint.host}: {e}")
+            with self._lock:
+                if healthy:
+                    if endpoint.ejected_until:
+                        logging.info(f"✅ Ollama host {endpoint.host} is healthy again.")
+                    endpoint.consecutive_failures = 0
+                    endpoint.ejected_until = 0.0
+                else:
+                    endpoint.consecutive_failures = max(endpoint.consecutive_failures, self.max_failures)
+                    self._eject(endpoint)
+            results[endpoint.host] = healthy
+        return results
+
+    def _health_check_loop(self, interval: float):
+        while not self._stop_event.wait(interval):
+            now = time.time()
+            if any(not e.is_available(now) or e.consecutive_failures for e in self.endpoints):
+                self.health_check()
+
+    def close(self):
+        self._stop_event.set()
+
+    # --- Статистика ---
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Връща текущото състояние и хистограма на латентността за всеки сървър."""
+        now = time.time()
+        stats = []
+        with self._lock:
+            for e in self.endpoints:
+                completed = sum(e.latency_buckets)
+                stats.append({
+                    'host': e.host,
+                    'healthy': e.is_available(now),
+                    'outstanding': e.outstanding,
+                    'requests': e.total_requests,
+                    'failures': e.total_failures,
+                    'avg_latency': e.latency_sum / completed if completed else None,
+                    'latency_histogram': {
+                        (f"<={b:g}s" if b != float('inf') else f">{LATENCY_BUCKETS[-2]:g}s"): count
+                        for b, count in zip(LATENCY_BUCKETS, e.latency_buckets)
+                    },
+                })
+        return stats
+
+    def log_stats(self):
+        for s in self.get_stats():
+            avg = f"{s['avg_latency']:.2f}s" if s['avg_latency'] is not None else "N/A"
+            histogram = ", ".join(f"{k}: {v}" for k, v in s['latency_histogram'].items() if v)
+            logging.info(f"📊 Ollama {s['host']} - requests: {s['requests']}, failures: {s['failures']}, "
+                         f"avg latency: {avg}, healthy: {s['healthy']} [{histogram}]")
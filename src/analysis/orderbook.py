@@ -0,0 +1,165 @@
+# src/analysis/orderbook.py
+
+import logging
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Формат на blob-а (версия 1):
+#   заглавие <B H H B B 4s>: версия, брой bid нива, брой ask нива, десетични знаци на цената и на размера,
+#   ширини в байтове (1/2/4/8) на четирите масива;
+#   след него zlib(bid цени | ask цени | bid размери | ask размери) - делта кодирани цели числа.
+# Цените и размерите се мащабират до цели числа по десетичните знаци от низовете на борсата,
+# така че кодирането е без загуба, а делтите между съседни нива (обикновено няколко тика) се побират в 1-2 байта.
+BLOB_VERSION = 1
+_HEADER = struct.Struct('<BHHBB4s')
+_WIDTHS = {1: np.int8, 2: np.int16, 4: np.int32, 8: np.int64}
+IMBALANCE_LEVELS = 10       # Нива от всяка страна за depth imbalance
+DEPTH_BAND = 0.01           # Дълбочината се мери в ±1% от средната цена
+
+
+@dataclass
+class BookLevels:
+    """Нивата на един snapshot: bid-овете са низходящи по цена, ask-овете - възходящи."""
+    bid_prices: np.ndarray
+    bid_sizes: np.ndarray
+    ask_prices: np.ndarray
+    ask_sizes: np.ndarray
+
+
+def _scale(values: Sequence[str]) -> Tuple[np.ndarray, int]:
+    """Десетични низове -> цели числа при общ брой десетични знаци (точно, без float грешки)."""
+    decimals = max((len(v.partition('.')[2].rstrip('0')) for v in values), default=0)
+    scaled = []
+    for v in values:
+        whole, _, frac = v.partition('.')
+        frac = frac.rstrip('0')
+        scaled.append(int(whole + frac.ljust(decimals, '0')) if decimals else int(whole))
+    return np.array(scaled, dtype=np.int64), decimals
+
+
+def _delta(values: np.ndarray) -> Tuple[bytes, int]:
+    """Първата стойност + разликите, в най-тесния цял тип, в който се побират."""
+    deltas = np.diff(values, prepend=np.int64(0))
+    for width, dtype in _WIDTHS.items():
+        info = np.iinfo(dtype)
+        if deltas.size == 0 or (deltas.min() >= info.min and deltas.max() <= info.max):
+            return deltas.astype(dtype).tobytes(), width
+    raise ValueError("Order book values do not fit in int64")
+
+
+def encode_levels(bids: List[List[str]], asks: List[List[str]]) -> bytes:
+    """Кодира [[цена, размер], ...] от борсата (като низове) в компактен blob."""
+    prices, price_decimals = _scale([p for p, _ in bids] + [p for p, _ in asks])
+    sizes, size_decimals = _scale([s for _, s in bids] + [s for _, s in asks])
+    n_bids = len(bids)
+    parts = [_delta(prices[:n_bids]), _delta(prices[n_bids:]), _delta(sizes[:n_bids]), _delta(sizes[n_bids:])]
+    header = _HEADER.pack(BLOB_VERSION, n_bids, len(asks), price_decimals, size_decimals,
+                          bytes(width for _, width in parts))
+    return header + zlib.compress(b"".join(data for data, _ in parts), 6)
+
+
+def decode_levels(blob: bytes) -> BookLevels:
+    """Обратното на encode_levels: NumPy масиви float64 с цените и размерите."""
+    version, n_bids, n_asks, price_decimals, size_decimals, widths = _HEADER.unpack_from(blob)
+    if version != BLOB_VERSION:
+        raise ValueError(f"Unsupported order book blob version: {version}")
+    body = zlib.decompress(blob[_HEADER.size:])
+    arrays, offset = [], 0
+    for count, width in zip((n_bids, n_asks, n_bids, n_asks), widths):
+        deltas = np.frombuffer(body, dtype=_WIDTHS[width], count=count, offset=offset)
+        arrays.append(np.cumsum(deltas, dtype=np.int64))
+        offset += count * width
+    price_scale, size_scale = 10.0 ** price_decimals, 10.0 ** size_decimals
+    return BookLevels(arrays[0] / price_scale, arrays[2] / size_scale, arrays[1] / price_scale, arrays[3] / size_scale)
+
+
+def _side_slope(prices: np.ndarray, sizes: np.ndarray, mid: float) -> Optional[float]:
+    """Наклон на кумулативния размер спрямо отдалечеността от mid (в bps): колко base се натрупва на 1 bps."""
+    if len(prices) < 2:
+        return None
+    distance_bps = np.abs(prices - mid) / mid * 10_000
+    cumulative = np.cumsum(sizes)
+    if np.ptp(distance_bps) == 0:
+        return None
+    return float(np.polyfit(distance_bps, cumulative, 1)[0])
+
+
+def compute_features(book: BookLevels) -> Dict[str, Optional[float]]:
+    """
+    Характеристики на ликвидността за един snapshot: mid, spread (в bps),
+    imbalance в първите IMBALANCE_LEVELS нива ((bid - ask) / (bid + ask), в -1..1),
+    дълбочина в quote валута в ±DEPTH_BAND от mid и наклон на двете страни.
+    """
+    features: Dict[str, Optional[float]] = dict.fromkeys(
+        ('mid', 'spread_bps', 'imbalance', 'bid_depth', 'ask_depth', 'bid_slope', 'ask_slope'))
+    if not len(book.bid_prices) or not len(book.ask_prices):
+        return features
+    best_bid, best_ask = book.bid_prices[0], book.ask_prices[0]
+    mid = (best_bid + best_ask) / 2
+    bid_top = book.bid_sizes[:IMBALANCE_LEVELS].sum()
+    ask_top = book.ask_sizes[:IMBALANCE_LEVELS].sum()
+    in_band_bids = book.bid_prices >= mid * (1 - DEPTH_BAND)
+    in_band_asks = book.ask_prices <= mid * (1 + DEPTH_BAND)
+    features.update(
+        mid=float(mid),
+        spread_bps=float((best_ask - best_bid) / mid * 10_000),
+        imbalance=float((bid_top - ask_top) / (bid_top + ask_top)) if bid_top + ask_top > 0 else None,
+        bid_depth=float((book.bid_prices[in_band_bids] * book.bid_sizes[in_band_bids]).sum()),
+        ask_depth=float((book.ask_prices[in_band_asks] * book.ask_sizes[in_band_asks]).sum()),
+        bid_slope=_side_slope(book.bid_prices, book.bid_sizes, mid),
+        ask_slope=_side_slope(book.ask_prices, book.ask_sizes, mid),
+    )
+    return features
+
+
+def build_snapshot_row(symbol: str, order_book: Dict[str, Any]) -> Dict[str, Any]:
+    """Ред за orderbook_snapshots от отговор на KuCoin (time в ms, нива като низове)."""
+    blob = encode_levels(order_book.get('bids') or [], order_book.get('asks') or [])
+    row = {
+        'symbol': symbol,
+        'snapshot_ts': int(order_book['time']) // 1000,
+        'sequence': int(order_book['sequence']) if order_book.get('sequence') else None,
+        'levels': blob,
+    }
+    row.update(compute_features(decode_levels(blob)))
+    return row
+
+
+def stack_levels(books: List[BookLevels], depth: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Подрежда много snapshot-а в масиви (T, depth, 2) с [цена, размер] за
+    bid и ask страната; липсващите нива са NaN.
+    """
+    bids = np.full((len(books), depth, 2), np.nan)
+    asks = np.full((len(books), depth, 2), np.nan)
+    for i, book in enumerate(books):
+        n_bids, n_asks = min(depth, len(book.bid_prices)), min(depth, len(book.ask_prices))
+        bids[i, :n_bids, 0], bids[i, :n_bids, 1] = book.bid_prices[:n_bids], book.bid_sizes[:n_bids]
+        asks[i, :n_asks, 0], asks[i, :n_asks, 1] = book.ask_prices[:n_asks], book.ask_sizes[:n_asks]
+    return bids, asks
+
+
+def load_book_history(db_manager, symbol: str, start_ts: int, end_ts: int,
+                      depth: int = 20) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Времена (T,) и нивата (T, depth, 2) на bid/ask страната за символ в интервала [start_ts, end_ts]."""
+    rows = db_manager.get_orderbook_blobs(symbol, start_ts, end_ts)
+    timestamps = np.array([ts for ts, _ in rows], dtype=np.int64)
+    bids, asks = stack_levels([decode_levels(blob) for _, blob in rows], depth)
+    return timestamps, bids, asks
+
+
+def capture_snapshots(db_manager, kucoin_handler, symbols: List[str], depth: int) -> int:
+    """Изтегля стаканите на символите, кодира ги и ги записва с една транзакция. Връща броя записани."""
+    rows = []
+    for symbol, order_book in kucoin_handler.get_order_books(symbols, depth).items():
+        try:
+            rows.append(build_snapshot_row(symbol, order_book))
+        except (KeyError, ValueError, TypeError) as e:
+            logging.warning(f"⚠️ Skipping malformed order book for {symbol}: {e}")
+    return db_manager.save_orderbook_snapshots('kucoin', rows) if rows else 0
@@ -0,0 +1,94 @@
+# src/analysis/schemas.py
+
+from typing import Any, Dict, Iterable, List, Literal, Set, Tuple, Type
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+Sentiment = Literal["Positive", "Negative", "Neutral"]
+
+
+def _normalize_sentiment(value: Any) -> Any:
+    """Приема "positive", " NEUTRAL " и т.н. - моделите не винаги спазват регистъра."""
+    return value.strip().capitalize() if isinstance(value, str) else value
+
+
+def _join_if_list(value: Any, separator: str) -> Any:
+    """Моделите понякога връщат списък там, където очакваме низ."""
+    if isinstance(value, (list, tuple)):
+        return separator.join(str(v).strip() for v in value if str(v).strip())
+    return value
+
+
+class ArticleAnalysis(BaseModel):
+    """Договорът за отговора на големия модел."""
+    summary: str = Field(min_length=1, description="A brief, one-sentence summary of the article's likely content.")
+    sentiment: Sentiment = Field(description="The overall sentiment of the title.")
+    score: float = Field(ge=-1.0, le=1.0, description="Sentiment strength from -1 (very bearish) to 1 (very bullish); 0 is neutral.")
+    confidence: float = Field(ge=0.0, le=1.0, description="Confidence in the sentiment, from 0 to 1.")
+    reasoning: str = Field(min_length=1, description="A short explanation for the sentiment, based ONLY on the title.")
+    investment_factors: str = Field(description="Comma-separated entities or factors relevant to investors, or \"None\".")
+
+    @field_validator('sentiment', mode='before')
+    @classmethod
+    def _check_sentiment(cls, value: Any) -> Any:
+        return _normalize_sentiment(value)
+
+    @field_validator('summary', 'reasoning', mode='before')
+    @classmethod
+    def _join_text(cls, value: Any) -> Any:
+        return _join_if_list(value, " ")
+
+    @field_validator('investment_factors', mode='before')
+    @classmethod
+    def _join_factors(cls, value: Any) -> Any:
+        value = _join_if_list(value, ", ")
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return "None"
+        return value
+
+
+class TriageResult(BaseModel):
+    """Договорът за отговора на малкия triage модел."""
+    sentiment: Sentiment = Field(description="The market sentiment of the title.")
+    score: float = Field(ge=-1.0, le=1.0, description="Sentiment strength from -1 (very bearish) to 1 (very bullish).")
+    confidence: float = Field(ge=0.0, le=1.0, description="Confidence in the sentiment, from 0 to 1.")
+    summary: str = Field(min_length=1, description="One short sentence summarizing the title.")
+    reasoning: str = Field(default="N/A", description="A few words explaining the sentiment.")
+
+    @field_validator('sentiment', mode='before')
+    @classmethod
+    def _check_sentiment(cls, value: Any) -> Any:
+        return _normalize_sentiment(value)
+
+    @field_validator('summary', 'reasoning', mode='before')
+    @classmethod
+    def _join_text(cls, value: Any) -> Any:
+        return _join_if_list(value, " ")
+
+
+class ChunkSummary(BaseModel):
+    """Договорът за резюмето на едно парче от текста на статия."""
+    summary: str = Field(min_length=1, description="Two or three sentences with the market-relevant facts of the passage.")
+
+    @field_validator('summary', mode='before')
+    @classmethod
+    def _join_text(cls, value: Any) -> Any:
+        return _join_if_list(value, " ")
+
+
+def schema_for_fields(model_cls: Type[BaseModel], fields: Iterable[str]) -> Dict[str, Any]:
+    """JSON схема, ограничена до подадените полета - за поправка само на тях."""
+    fields = set(fields)
+    schema = model_cls.model_json_schema()
+    schema['properties'] = {k: v for k, v in schema['properties'].items() if k in fields}
+    schema['required'] = [k for k in schema.get('required', []) if k in fields]
+    return schema
+
+
+def invalid_fields(error: ValidationError) -> Set[str]:
+    """Имената на полетата от първо ниво, които не са минали валидация."""
+    return {str(e['loc'][0]) for e in error.errors() if e.get('loc')}
+
+
+def describe_errors(error: ValidationError) -> List[Tuple[str, str]]:
+    return [(str(e['loc'][0]) if e.get('loc') else '?', e['msg']) for e in error.errors()]
@@ -0,0 +1,300 @@
+# src/api/server.py
+
+import base64
+import hashlib
+import io
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from config import (
+    API_HOST, API_PORT, API_DEFAULT_PAGE_SIZE, API_MAX_PAGE_SIZE, API_STREAM_CHUNK_ROWS,
+    API_CACHE_MAX_BYTES, API_VERSION_TTL
+)
+from src.database.database_manager import DatabaseManager, SERIES_DATASETS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# URL -> (набор, име на query параметъра за ключа; None = ключът не е задължителен)
+ROUTES = {
+    '/api/candles': ('candles', 'symbol'),
+    '/api/market_data': ('market_data', 'asset_id'),
+    '/api/tvl': ('tvl', 'chain'),
+    '/api/forex': ('forex', 'symbol'),
+    '/api/tickers': ('tickers', 'symbol'),
+    '/api/sentiment': ('sentiment', 'scope'),
+    '/api/news': ('news', None),
+}
+OPTIONAL_KEYS = {'news': 'asset_id'}
+INTEGER_COLUMNS = {'timestamp', 'id', 'snapshot_ts', 'bucket_start', 'article_count', 'positive', 'negative', 'neutral'}
+TEXT_COLUMNS = {'date', 'source', 'title', 'url', 'published_at', 'category', 'fetched_at',
+                'summary', 'sentiment', 'reasoning', 'investment_factors'}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def encode_cursor(value: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Any:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise ApiError(400, "Invalid cursor.")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Файлов обект, който събира записаното от Arrow writer-а до следващото изпразване."""
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ResponseCache:
+    """
+    LRU кеш на готови (сериализирани) отговори, ограничен по общ размер.
+    Ключът съдържа версията на набора, така че нов запис в базата прави
+    старите отговори недостижими, без изрично инвалидиране.
+    Едновременните заявки за един и същ ключ чакат първата (single-flight),
+    вместо всяка да сканира SQLite.
+    """
+    def __init__(self, max_bytes: int = API_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[tuple, threading.Event] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_or_compute(self, key: tuple, compute: Callable[[], bytes]) -> bytes:
+        while True:
+            with self._lock:
+                body = self._entries.get(key)
+                if body is not None:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return body
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self._inflight[key] = threading.Event()
+                    self.stats['misses'] += 1
+                    break
+            waiter.wait()
+        try:
+            body = compute()
+            self._put(key, body)
+            return body
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _put(self, key: tuple, body: bytes):
+        if len(body) > self.max_bytes // 4:
+            return  # Огромните отговори не изместват целия кеш
+        with self._lock:
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.stats['evictions'] += 1
+
+
+class DataAPI:
+    """
+    Логиката на API-то, независима от HTTP сървъра: валидира параметрите,
+    изчислява ETag от data_version и връща (статус, хедъри, тяло), където
+    тялото е bytes или итератор от bytes за стрийминг.
+    """
+    def __init__(self, db_manager: Optional[DatabaseManager] = None, cache: Optional[ResponseCache] = None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.cache = cache or ResponseCache()
+        self._versions: Dict[str, int] = {}
+        self._versions_read_at = 0.0
+        self._versions_lock = threading.Lock()
+
+    def data_versions(self) -> Dict[str, int]:
+        """data_version се чете най-много веднъж на API_VERSION_TTL секунди, независимо от броя заявки."""
+        with self._versions_lock:
+            if time.monotonic() - self._versions_read_at > API_VERSION_TTL:
+                self._versions = self.db_manager.get_data_versions(raise_errors=True)
+                self._versions_read_at = time.monotonic()
+            return self._versions
+
+    def handle(self, path: str, query: Dict[str, List[str]], if_none_match: Optional[str]) -> Tuple[int, Dict[str, str], Any]:
+        try:
+            if path == '/api/version':
+                return self._json(200, {'datasets': self.data_versions(), 'cache': self.cache.stats})
+            if path not in ROUTES:
+                raise ApiError(404, f"Unknown endpoint: {path}")
+            return self._series(ROUTES[path], {k: v[-1] for k, v in query.items()}, if_none_match)
+        except ApiError as e:
+            return self._json(e.status, {'error': str(e)})
+        except sqlite3.Error as e:
+            logging.error(f"❌ Database error while serving {path}: {e}")
+            return self._json(500, {'error': "Database error."})
+        except Exception:
+            logging.exception(f"❌ Unexpected error while serving {path}")
+            return self._json(500, {'error': "Internal server error."})
+
+    def _series(self, route: Tuple[str, Optional[str]], params: Dict[str, str], if_none_match: Optional[str]):
+        dataset, key_param = route
+        key_param = key_param or OPTIONAL_KEYS.get(dataset)
+        key = params.get(key_param)
+        if key is None and dataset not in OPTIONAL_KEYS:
+            raise ApiError(400, f"Missing required parameter: {key_param}")
+        output = params.get('format', 'json')
+        if output not in ('json', 'ndjson', 'arrow'):
+            raise ApiError(400, "format must be one of json, ndjson, arrow")
+        start, end = self._time_param(dataset, params.get('start')), self._time_param(dataset, params.get('end'))
+        after = decode_cursor(params['cursor']) if params.get('cursor') else None
+        try:
+            limit = int(params.get('limit', API_DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ApiError(400, "limit must be an integer")
+        if not 1 <= limit <= API_MAX_PAGE_SIZE:
+            raise ApiError(400, f"limit must be between 1 and {API_MAX_PAGE_SIZE}")
+
+        version = self.data_versions().get(dataset, 0)
+        request_key = (dataset, key, start, end, after, limit, output)
+        etag = f'W/"{dataset}-{version}-{hashlib.sha1(repr(request_key).encode()).hexdigest()[:12]}"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if if_none_match and etag in [t.strip() for t in if_none_match.split(',')]:
+            return 304, headers, b''
+
+        if output == 'json':
+            body = self.cache.get_or_compute((version,) + request_key,
+                                             lambda: self._json_page(dataset, key, start, end, after, limit))
+            return 200, dict(headers, **{'Content-Type': 'application/json'}), body
+        # Стриймингът обхожда целия интервал на порции и не минава през кеша.
+        # Първата порция се чете веднага - грешка в базата става 500, а не прекъснат поток
+        pages = self._iter_pages(dataset, key, start, end, after)
+        first_page = next(pages, None)
+        pages = itertools.chain([first_page], pages) if first_page is not None else iter(())
+        if output == 'ndjson':
+            return 200, dict(headers, **{'Content-Type': 'application/x-ndjson'}), self._ndjson(dataset, pages)
+        return 200, dict(headers, **{'Content-Type': 'application/vnd.apache.arrow.stream'}), self._arrow(dataset, pages)
+
+    @staticmethod
+    def _time_param(dataset: str, value: Optional[str]) -> Any:
+        """Числовите времеви колони приемат Unix секунди; текстовите - дата 'YYYY-MM-DD'."""
+        if value is None:
+            return None
+        if SERIES_DATASETS[dataset]['time_column'] in INTEGER_COLUMNS:
+            try:
+                return int(value)
+            except ValueError:
+                raise ApiError(400, "start/end must be Unix timestamps for this endpoint")
+        return value
+
+    def _json_page(self, dataset, key, start, end, after, limit) -> bytes:
+        columns = SERIES_DATASETS[dataset]['columns']
+        order_index = columns.index(SERIES_DATASETS[dataset]['order_column'])
+        rows = self.db_manager.get_series_page(dataset, key, start, end, after, limit, raise_errors=True)
+        next_cursor = encode_cursor(rows[-1][order_index]) if len(rows) == limit else None
+        payload = {'data': [dict(zip(columns, row)) for row in rows], 'next_cursor': next_cursor}
+        return json.dumps(payload, separators=(',', ':')).encode()
+
+    def _iter_pages(self, dataset, key, start, end, after) -> Iterator[List[tuple]]:
+        order_index = SERIES_DATASETS[dataset]['columns'].index(SERIES_DATASETS[dataset]['order_column'])
+        while True:
+            rows = self.db_manager.get_series_page(dataset, key, start, end, after, API_STREAM_CHUNK_ROWS, raise_errors=True)
+            if not rows:
+                return
+            yield rows
+            if len(rows) < API_STREAM_CHUNK_ROWS:
+                return
+            after = rows[-1][order_index]
+
+    @staticmethod
+    def _ndjson(dataset: str, pages: Iterator[List[tuple]]) -> Iterator[bytes]:
+        columns = SERIES_DATASETS[dataset]['columns']
+        for rows in pages:
+            yield "".join(json.dumps(dict(zip(columns, row)), separators=(',', ':')) + "\n" for row in rows).encode()
+
+    @staticmethod
+    def _arrow(dataset: str, pages: Iterator[List[tuple]]) -> Iterator[bytes]:
+        import pyarrow as pa
+
+        columns = SERIES_DATASETS[dataset]['columns']
+        schema = pa.schema([
+            (c, pa.int64() if c in INTEGER_COLUMNS else pa.string() if c in TEXT_COLUMNS else pa.float64())
+            for c in columns
+        ])
+        sink = _ChunkSink()
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+        yield sink.drain()
+        for rows in pages:
+            arrays = [pa.array([row[i] for row in rows], type=schema.field(i).type) for i in range(len(columns))]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+    @staticmethod
+    def _json(status: int, payload: Dict[str, Any]):
+        return status, {'Content-Type': 'application/json'}, json.dumps(payload).encode()
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'OrbitronAPI/1.0'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        status, headers, body = self.server.api.handle(url.path, parse_qs(url.query), self.headers.get('If-None-Match'))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if isinstance(body, bytes):
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        # Стрийминг с chunked transfer encoding - паметта не зависи от размера на интервала
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for chunk in body:
+                if chunk:
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            logging.warning("⚠️ Client disconnected during a streamed response.")
+        except Exception:
+            # Хедърите вече са изпратени - прекъсваме връзката без крайния chunk, за да види клиентът непълен отговор
+            logging.exception(f"❌ Streamed response for {url.path} failed")
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        logging.info(f"🌐 {self.address_string()} {format % args}")
+
+
+def create_server(host: str = API_HOST, port: int = API_PORT, db_manager: Optional[DatabaseManager] = None) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), APIRequestHandler)
+    server.daemon_threads = True
+    server.api = DataAPI(db_manager)
+    return server
@@ -3,6 +3,7 @@ import sys
 import os
 import streamlit as st
 import pandas as pd
+from datetime import datetime, timezone
 
 # --- ТРИКЪТ ЗА ПРАВИЛНИТЕ ИМПОРТИ ---
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -11,38 +12,83 @@ sys.path.append(project_root)
 # --- Новите, по-чисти импорти ---
 from config import ASSETS_TO_TRACK
 from src.database.database_manager import DatabaseManager
+from src.analysis.embedding_index import EmbeddingStore
+from src.analysis.correlation import CorrelationService
+from src.analysis.ai_analyzer import AIAnalyzer
+from src.analysis.asset_matcher import AssetMatcher
+from src.data_ingestion.asset_refresh import build_asset_refresher
+from src.dashboard.charts import (
+    render_market_chart, render_candle_chart, render_tvl_chart, render_sentiment_chart, render_correlation_view
+)
 
 # --- Конфигурация на страницата ---
 st.set_page_config(layout="wide", page_title="Orbitron AI Dashboard")
 st.title("🚀 ORBITRON AI - Аналитично Табло")
 
-# Преобразуваме речника с активи в списък за селекцията
-ASSET_NAMES = list(ASSETS_TO_TRACK.keys())
-
-@st.cache_data(ttl=600)  # Кешираме данните за 10 минути
-def load_data():
-    """Зарежда всички анализирани статии и пазарни данни."""
-    db = DatabaseManager()
-    news_list = db.get_all_analyzed_articles()
-    market_data_list = db.get_all_market_data()
-    
-    news_df = pd.DataFrame(news_list)
-    market_df = pd.DataFrame(market_data_list)
-    
-    # Обработваме датите
-    if not market_df.empty:
-        market_df['date'] = pd.to_datetime(market_df['date'])
-    
-    if not news_df.empty:
-        # Превръщаме published_at в дата, като грешките стават NaT (Not a Time)
-        news_df['published_at'] = pd.to_datetime(news_df['published_at'], errors='coerce', utc=True)
-    
-    return news_df, market_df
+@st.cache_data(ttl=300)
+def load_asset_universe():
+    """Име -> CoinGecko id за включените активи от таблицата assets (config е резервен вариант)."""
+    assets = DatabaseManager().get_tracked_assets()
+    return {a['name']: a['id'] for a in assets} if assets else dict(ASSETS_TO_TRACK)
+
+@st.cache_data(ttl=60)
+def load_snapshots():
+    """Зарежда готовите snapshot-и - по един ред на актив, независимо от историята."""
+    return DatabaseManager().get_asset_snapshots()
+
+@st.cache_data(ttl=60)
+def load_asset_news(asset_id: str, limit: int = 20):
+    """Зарежда последните анализирани статии за избрания актив."""
+    return DatabaseManager().get_asset_articles(asset_id, limit=limit)
+
+@st.cache_data(ttl=60)
+def load_recent_alerts(limit: int = 10):
+    """Последните alert-и от AlertEngine."""
+    return DatabaseManager().get_recent_alerts(limit=limit)
+
+@st.cache_data(ttl=60)
+def load_ticker_screen(metric: str, ascending: bool = False, limit: int = 15):
+    """Скрийнинг на USDT двойките от последния KuCoin all-tickers snapshot."""
+    return DatabaseManager().get_ticker_screen('kucoin', metric, limit=limit, ascending=ascending,
+                                               quote='USDT', min_quote_volume=100_000)
+
+@st.cache_resource
+def load_embedding_store():
+    """Отваря индекса с embedding-и само за четене (споделен между сесиите)."""
+    return EmbeddingStore(readonly=True)
+
+@st.cache_resource
+def load_correlation_service():
+    """Матрицата от доходности и прозорците живеят между презарежданията и се обновяват само при нови данни."""
+    return CorrelationService(DatabaseManager())
+
+@st.cache_resource
+def load_refresh_analyzer():
+    """AI анализаторът за бутона "Обнови" - създава се (и загрява моделите) веднъж."""
+    return AIAnalyzer(asset_matcher=AssetMatcher.from_database(DatabaseManager()), warm_up=True)
+
+def find_related_articles(article_id: int, k: int = 3):
+    """Връща семантично най-близките статии до дадена статия (кеширани, докато индексът не нарасне)."""
+    store = load_embedding_store()
+    store.refresh()
+    return _search_related_articles(int(article_id), store.count, k)
+
+@st.cache_data(ttl=3600)
+def _search_related_articles(article_id: int, index_size: int, k: int):
+    """index_size е част от ключа на кеша - нови embedding-и правят старите резултати невалидни."""
+    matches = load_embedding_store().search_by_id(article_id, k=k)
+    if not matches:
+        return []
+    scores = dict(matches)
+    related = DatabaseManager().get_articles_by_ids([article_id for article_id, _ in matches])
+    for article in related:
+        article['similarity'] = scores[article['id']]
+    return related
 
 # --- Зареждане на данните ---
-news_data, market_data = load_data()
+snapshots = load_snapshots()
 
-if market_data.empty:
+if not snapshots:
     st.warning("Няма налични пазарни данни. Стартирайте `scripts/run_pipeline.py`, за да съберете данни.")
     st.stop()
 
@@ -50,53 +96,107 @@ if market_data.empty:
 if os.path.exists("assets/logo.png"):
     st.sidebar.image("assets/logo.png", use_container_width=True)
 st.sidebar.header("Настройки на Анализа")
-selected_asset_name = st.sidebar.selectbox("Избери Актив:", ASSET_NAMES)
-selected_asset_id = ASSETS_TO_TRACK[selected_asset_name]
-
-# --- Филтриране на данните ---
-asset_market_data = market_data[market_data['asset_id'] == selected_asset_id].copy()
-
-search_pattern = selected_asset_name.split('-')[0]
-asset_news_data = news_data[news_data['title'].str.contains(search_pattern, case=False, na=False)].copy()
-
-if asset_market_data.empty:
+asset_universe = load_asset_universe()
+selected_asset_name = st.sidebar.selectbox("Избери Актив:", list(asset_universe))
+selected_asset_id = asset_universe[selected_asset_name]
+sentiment_window = st.sidebar.radio("Период на настроенията:", ['24h', '7d', '30d'], index=1, horizontal=True)
+
+if st.sidebar.button("🔄 Обнови актива", help="Тегли само остарелите данни за актива и анализира новините му"):
+    with st.spinner(f"Обновяване на {selected_asset_name}..."):
+        db_manager = DatabaseManager()
+        report = build_asset_refresher(db_manager, load_refresh_analyzer()).refresh(selected_asset_id)
+    st.cache_data.clear()
+    still_stale = [source for source, state in report['after'].items() if state['stale']]
+    st.session_state['refresh_note'] = f"Обновено за {report['seconds']} сек." + (
+        f" Все още остарели: {', '.join(still_stale)}." if still_stale else " Всички източници са актуални.")
+    st.rerun()
+if st.session_state.get('refresh_note'):
+    st.sidebar.caption(st.session_state['refresh_note'])
+
+recent_alerts = load_recent_alerts()
+if recent_alerts:
+    st.sidebar.subheader("🔔 Последни Alert-и")
+    for alert in recent_alerts:
+        fired_at = datetime.fromtimestamp(alert['event_ts'], tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+        st.sidebar.caption(f"**{fired_at}** · {alert['message']}")
+
+snapshot = snapshots.get(selected_asset_id)
+if not snapshot or snapshot['price'] is None:
     st.warning(f"Няма пазарни данни за '{selected_asset_name}'.")
     st.stop()
 
 # --- Показване на ключови метрики ---
 st.header(f"Ключови Метрики за {selected_asset_name.capitalize()}")
-asset_market_data.sort_values('date', inplace=True, ascending=False)
-latest_data = asset_market_data.iloc[0]
 
 price_change_str = "N/A"
-if len(asset_market_data) > 1:
-    previous_data = asset_market_data.iloc[1]
-    price_change = latest_data['price'] - previous_data['price']
-    price_change_percent = (price_change / previous_data['price']) * 100 if previous_data['price'] != 0 else 0
-    price_change_str = f"{price_change:,.4f} ({price_change_percent:.2f}%)"
+if snapshot['price_change'] is not None:
+    price_change_str = f"{snapshot['price_change']:,.4f} ({snapshot['price_change_pct']:.2f}%)"
 
 col1, col2, col3 = st.columns(3)
-col1.metric("Последна Цена (USD)", f"${latest_data['price']:,.4f}", price_change_str)
-col2.metric("Пазарна Капитализация", f"${latest_data['market_cap']:,.0f}")
-col3.metric("Обем за 24ч", f"${latest_data['total_volume']:,.0f}")
+col1.metric("Последна Цена (USD)", f"${snapshot['price']:,.4f}", price_change_str)
+col2.metric("Пазарна Капитализация", f"${(snapshot['market_cap'] or 0):,.0f}")
+col3.metric("Обем за 24ч", f"${(snapshot['total_volume'] or 0):,.0f}")
+st.caption(f"Данни към {snapshot['market_date']}")
+st.markdown("---")
+
+# --- ГРАФИКИ (само видимият прозорец, downsampled на сървъра) ---
+st.header("📈 Графики")
+db_for_charts = DatabaseManager()
+price_tab, candles_tab, tvl_tab, screener_tab, correlation_tab = st.tabs(
+    ["Цена и обем", "Свещи (KuCoin)", "TVL по вериги", "Скрийнър (KuCoin)", "Корелации"])
+with price_tab:
+    render_market_chart(db_for_charts, selected_asset_id)
+with candles_tab:
+    candle_symbols = db_for_charts.get_candle_symbols()
+    if candle_symbols:
+        selected_symbol = st.selectbox("Търговска двойка:", candle_symbols)
+        render_candle_chart(db_for_charts, selected_symbol)
+    else:
+        st.info("Няма исторически свещи. Стартирайте pipeline-а, за да ги съберете.")
+with tvl_tab:
+    render_tvl_chart(db_for_charts)
+with screener_tab:
+    gainers, losers, volume_leaders = (load_ticker_screen('change_rate'), load_ticker_screen('change_rate', ascending=True),
+                                       load_ticker_screen('quote_volume_24h'))
+    if gainers:
+        snapshot_time = datetime.fromtimestamp(gainers[0]['snapshot_ts'], tz=timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
+        st.caption(f"USDT двойки с 24h оборот над $100k · snapshot към {snapshot_time}")
+        columns = ['symbol', 'last', 'change_rate', 'quote_volume_24h']
+        for column, title, rows in zip(st.columns(3), ["🚀 Най-голям ръст", "📉 Най-голям спад", "💰 Лидери по оборот"],
+                                       [gainers, losers, volume_leaders]):
+            with column:
+                st.markdown(f"**{title}**")
+                table = pd.DataFrame(rows)[columns]
+                table['change_rate'] = table['change_rate'] * 100
+                st.dataframe(table.rename(columns={'symbol': 'Двойка', 'last': 'Цена', 'change_rate': 'Промяна %',
+                                                   'quote_volume_24h': 'Оборот 24h'}),
+                             hide_index=True, use_container_width=True)
+    else:
+        st.info("Няма ticker snapshot-и. Стартирайте pipeline-а, за да ги съберете.")
+with correlation_tab:
+    render_correlation_view(load_correlation_service(), selected_asset_id)
 st.markdown("---")
 
 # --- AI ОБОБЩЕН АНАЛИЗ ---
 st.header(f"🤖 AI Обобщен Анализ за {selected_asset_name.capitalize()}")
 
-if asset_news_data.empty:
+pos_count = snapshot[f'positive_{sentiment_window}']
+neg_count = snapshot[f'negative_{sentiment_window}']
+neu_count = snapshot[f'neutral_{sentiment_window}']
+
+if pos_count + neg_count + neu_count == 0:
     st.info("Няма налични AI анализи за този актив.")
 else:
-    sentiment_counts = asset_news_data['sentiment'].value_counts()
-    pos_count = sentiment_counts.get("Positive", 0)
-    neg_count = sentiment_counts.get("Negative", 0)
-    neu_count = sentiment_counts.get("Neutral", 0)
-
-    st.subheader("Разбивка на Настроенията")
-    scol1, scol2, scol3 = st.columns(3)
+    st.subheader(f"Разбивка на Настроенията ({sentiment_window})")
+    scol1, scol2, scol3, scol4 = st.columns(4)
     scol1.metric("🟢 Позитивни Новини", pos_count)
     scol2.metric("🔴 Негативни Новини", neg_count)
     scol3.metric("⚪ Неутрални Новини", neu_count)
+    sentiment_index = snapshot.get('sentiment_index')
+    scol4.metric("🧭 Индекс на настроенията", f"{sentiment_index:+.2f}" if sentiment_index is not None else "N/A")
+
+    st.subheader("Настроения във времето")
+    render_sentiment_chart(db_for_charts, selected_asset_id)
 
     st.subheader("AI Обосновка на Настроенията")
     total_news = pos_count + neg_count
@@ -115,29 +215,34 @@ else:
         st.info("Няма достатъчно позитивни или негативни новини за формиране на ясна обосновка.")
 
     st.subheader("Ключови теми от последните новини")
-    recent_news = asset_news_data.sort_values(by='published_at', ascending=False).head(5)
-    
-    for index, row in recent_news.iterrows():
-        st.markdown(f"- **{row['sentiment']}**: *{row['summary']}*")
+    for item in snapshot['recent_summaries']:
+        st.markdown(f"- **{item['sentiment']}**: *{item['summary']}*")
 
 # --- СЕКЦИЯ С ДЕТАЙЛНИ НОВИНИ ---
 st.markdown("---")
 st.header("Всички свързани новини")
-if not asset_news_data.empty:
-    sorted_news = asset_news_data.sort_values(by='published_at', ascending=False)
-    for index, row in sorted_news.head(20).iterrows():
+asset_news = load_asset_news(selected_asset_id)
+if asset_news:
+    for row in asset_news:
         with st.expander(f"**{row['title']}** (Настроение: {row['sentiment']})"):
             st.markdown(f"**AI Резюме:** *{row['summary']}*")
             st.markdown(f"**AI Обосновка:** {row['reasoning']}")
             st.markdown(f"**AI Фактори:** {row['investment_factors']}")
-            
+
             # --- ТУК Е КОРЕКЦИЯТА ---
             # Проверяваме дали датата е валидна (не е NaT), преди да я форматираме
             published_time_str = "N/A"
-            if pd.notna(row['published_at']):
-                published_time_str = row['published_at'].strftime('%Y-%m-%d %H:%M')
+            published_at = pd.to_datetime(row['published_at'], errors='coerce', utc=True)
+            if pd.notna(published_at):
+                published_time_str = published_at.strftime('%Y-%m-%d %H:%M')
             
             st.markdown(f"**Източник:** {row['source']} | **Публикувано на:** {published_time_str}")
             st.markdown(f"[Прочети цялата статия]({row['url']})")
+
+            related_articles = find_related_articles(row['id'])
+            if related_articles:
+                st.markdown("**Свързани новини:**")
+                for related in related_articles:
+                    st.markdown(f"- [{related['title']}]({related['url']}) *(сходство: {related['similarity']:.2f})*")
 else:
     st.write("Няма намерени новини за този актив.")
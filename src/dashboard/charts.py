@@ -0,0 +1,251 @@
+# src/dashboard/charts.py
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from plotly.subplots import make_subplots
+
+from config import (
+    SENTIMENT_MACRO_SCOPE, CORRELATION_WINDOWS, CORRELATION_DEFAULT_WINDOW, CORRELATION_BENCHMARK, CORRELATION_MIN_OVERLAP
+)
+from src.analysis.correlation import CorrelationService
+from src.analysis.downsampling import lttb_indices, bucket_ohlcv
+from src.database.database_manager import DatabaseManager
+
+# Колко точки изпращаме към браузъра - ограничено от ширината на графиката в пиксели
+MAX_LINE_POINTS = 1200
+MAX_CANDLES = 400
+
+
+def _utc(ts: int) -> datetime:
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc).replace(tzinfo=None)
+
+
+def _window_controls(key: str, min_dt: datetime, max_dt: datetime) -> Tuple[datetime, datetime]:
+    """
+    Плъзгач за видимия прозорец. Box-select върху графиката задава "pending"
+    прозорец, който се прилага тук при следващия rerun - така zoom-ът
+    изтегля данни с по-висока резолюция само за избрания интервал.
+    """
+    slider_key = f"{key}_window"
+    pending = st.session_state.pop(f"{key}_pending_zoom", None)
+    if pending:
+        st.session_state[slider_key] = (max(pending[0], min_dt), min(pending[1], max_dt))
+    elif slider_key not in st.session_state:
+        st.session_state[slider_key] = (min_dt, max_dt)
+
+    col_slider, col_reset = st.columns([6, 1])
+    if col_reset.button("↺ Целият период", key=f"{key}_reset"):
+        st.session_state[slider_key] = (min_dt, max_dt)
+    return col_slider.slider("Видим период", min_value=min_dt, max_value=max_dt,
+                             key=slider_key, format="YYYY-MM-DD", label_visibility="collapsed")
+
+
+def _show_chart(key: str, fig: go.Figure):
+    """Показва графиката и превръща box-select в нов видим прозорец."""
+    fig.update_layout(dragmode="select", margin=dict(l=10, r=10, t=30, b=10), height=480)
+    event = st.plotly_chart(fig, use_container_width=True, key=f"{key}_chart",
+                            on_select="rerun", selection_mode="box")
+    selection = event.get("selection", {}) if event else {}
+    boxes = selection.get("box", [])
+    if boxes and len(boxes[0].get("x", [])) == 2:
+        x0, x1 = sorted(pd.to_datetime(boxes[0]["x"]).to_pydatetime())
+        if x1 > x0:
+            st.session_state[f"{key}_pending_zoom"] = (x0, x1)
+            st.rerun()
+
+
+def _caption(shown: int, total: int):
+    note = f"Показани {shown:,} от {total:,} точки"
+    if shown < total:
+        note += " (downsampled - маркирайте интервал, за да видите детайли)"
+    st.caption(note)
+
+
+def render_market_chart(db: DatabaseManager, asset_id: str):
+    """Цена и обем от market_data (дневни данни от CoinGecko)."""
+    first, last = db.get_market_data_date_range(asset_id)
+    if first is None:
+        st.info("Няма пазарни данни за графика.")
+        return
+    min_dt, max_dt = datetime.strptime(first, '%Y-%m-%d'), datetime.strptime(last, '%Y-%m-%d')
+    if min_dt == max_dt:
+        max_dt = min_dt + timedelta(days=1)
+    start, end = _window_controls(f"market_{asset_id}", min_dt, max_dt)
+
+    rows = db.get_market_data_window(asset_id, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+    if not rows:
+        st.info("Няма данни в избрания период.")
+        return
+    dates = np.array([r[0] for r in rows], dtype='datetime64[D]')
+    price = np.array([r[1] for r in rows], dtype=np.float64)
+    volume = np.array([r[3] or 0 for r in rows], dtype=np.float64)
+
+    x = dates.astype(np.int64).astype(np.float64)
+    price_idx = lttb_indices(x, price, MAX_LINE_POINTS)
+    volume_idx = lttb_indices(x, volume, MAX_LINE_POINTS)
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.03)
+    fig.add_trace(go.Scatter(x=dates[price_idx], y=price[price_idx], mode="lines", name="Цена (USD)"), row=1, col=1)
+    fig.add_trace(go.Bar(x=dates[volume_idx], y=volume[volume_idx], name="Обем", marker_color="#7f8c8d"), row=2, col=1)
+    _show_chart(f"market_{asset_id}", fig)
+    _caption(len(price_idx), len(rows))
+
+
+def render_candle_chart(db: DatabaseManager, asset_symbol: str):
+    """Свещи от historical_prices с min/max агрегиране до MAX_CANDLES."""
+    first, last = db.get_candle_time_range(asset_symbol)
+    if first is None:
+        st.info("Няма исторически свещи за графика.")
+        return
+    min_dt, max_dt = _utc(first), _utc(last)
+    if min_dt == max_dt:
+        max_dt = min_dt + timedelta(days=1)
+    start, end = _window_controls(f"candles_{asset_symbol}", min_dt, max_dt)
+
+    start_ts = int(start.replace(tzinfo=timezone.utc).timestamp())
+    end_ts = int(end.replace(tzinfo=timezone.utc).timestamp())
+    rows = db.get_candles_window(asset_symbol, start_ts, end_ts)
+    if not rows:
+        st.info("Няма данни в избрания период.")
+        return
+    data = np.array(rows, dtype=np.float64)
+    bars = bucket_ohlcv(data[:, 0].astype(np.int64), data[:, 1], data[:, 2], data[:, 3],
+                        data[:, 4], data[:, 5], MAX_CANDLES)
+    times = bars['timestamp'].astype('datetime64[s]')
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.03)
+    fig.add_trace(go.Candlestick(x=times, open=bars['open'], high=bars['high'], low=bars['low'],
+                                 close=bars['close'], name=asset_symbol), row=1, col=1)
+    fig.add_trace(go.Bar(x=times, y=bars['volume'], name="Обем", marker_color="#7f8c8d"), row=2, col=1)
+    fig.update_layout(xaxis_rangeslider_visible=False)
+    _show_chart(f"candles_{asset_symbol}", fig)
+    _caption(len(times), len(rows))
+
+
+def render_tvl_chart(db: DatabaseManager, chains: Optional[list] = None):
+    """TVL по вериги от chain_tvl_data, всяка линия - с LTTB."""
+    chains = chains or db.get_tvl_chains()
+    if not chains:
+        st.info("Няма TVL данни за графика.")
+        return
+    first, last = db.get_tvl_time_range()
+    if first is None:
+        st.info("Няма TVL данни за графика.")
+        return
+    min_dt, max_dt = _utc(first), _utc(last)
+    if min_dt == max_dt:
+        max_dt = min_dt + timedelta(days=1)
+    start, end = _window_controls("tvl", min_dt, max_dt)
+    start_ts = int(start.replace(tzinfo=timezone.utc).timestamp())
+    end_ts = int(end.replace(tzinfo=timezone.utc).timestamp())
+
+    fig = go.Figure()
+    shown = total = 0
+    for chain in chains:
+        rows = db.get_tvl_window(chain, start_ts, end_ts)
+        if not rows:
+            continue
+        data = np.array(rows, dtype=np.float64)
+        idx = lttb_indices(data[:, 0], data[:, 1], max(3, MAX_LINE_POINTS // len(chains)))
+        fig.add_trace(go.Scatter(x=data[idx, 0].astype(np.int64).astype('datetime64[s]'), y=data[idx, 1],
+                                 mode="lines", name=chain))
+        shown += len(idx)
+        total += len(rows)
+    if not total:
+        st.info("Няма данни в избрания период.")
+        return
+    _show_chart("tvl", fig)
+    _caption(shown, total)
+
+
+def render_sentiment_chart(db: DatabaseManager, asset_id: str, days: int = 90):
+    """
+    Дневният индекс на настроенията на актива и на макро новините от
+    sentiment_index: среден score по дни (стълбове), затихващ индекс (линии)
+    и брой статии. Едно четене по първичния ключ - без преброяване на статии.
+    """
+    start_ts = int((datetime.now(timezone.utc) - timedelta(days=days)).timestamp())
+    asset_rows = db.get_sentiment_index(asset_id, 86400, start_ts)
+    macro_rows = db.get_sentiment_index(SENTIMENT_MACRO_SCOPE, 86400, start_ts)
+    if not asset_rows and not macro_rows:
+        st.info("Няма индекс на настроенията за този период.")
+        return
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.75, 0.25], vertical_spacing=0.03)
+    if asset_rows:
+        days_x = [_utc(r['bucket_start']) for r in asset_rows]
+        scores = [r['mean_score'] for r in asset_rows]
+        fig.add_trace(go.Bar(x=days_x, y=scores, name="Среден score за деня",
+                             marker_color=["#2ecc71" if (v or 0) >= 0 else "#e74c3c" for v in scores]), row=1, col=1)
+        fig.add_trace(go.Scatter(x=days_x, y=[r['decayed_index'] for r in asset_rows], mode="lines",
+                                 name="Индекс (актив)", line=dict(color="#2980b9", width=2)), row=1, col=1)
+        fig.add_trace(go.Bar(x=days_x, y=[r['article_count'] for r in asset_rows], name="Статии",
+                             marker_color="#7f8c8d"), row=2, col=1)
+    if macro_rows:
+        fig.add_trace(go.Scatter(x=[_utc(r['bucket_start']) for r in macro_rows], y=[r['decayed_index'] for r in macro_rows],
+                                 mode="lines", name="Индекс (макро)", line=dict(color="#8e44ad", dash="dot")), row=1, col=1)
+    fig.update_yaxes(range=[-1.05, 1.05], row=1, col=1)
+    fig.update_layout(margin=dict(l=10, r=10, t=30, b=10), height=420, barmode="overlay")
+    st.plotly_chart(fig, use_container_width=True, key=f"sentiment_{asset_id}_chart")
+
+
+def render_correlation_view(service: CorrelationService, asset_id: str):
+    """
+    Корелации между всички серии (топлинна карта на корелацията или бетата за
+    избрания прозорец) и сравнение на няколко серии: натрупана доходност,
+    волатилност/бета спрямо бенчмарка и плъзгаща корелация с него.
+    """
+    col_window, col_metric = st.columns([1, 1])
+    window = col_window.radio("Прозорец (дни)", CORRELATION_WINDOWS, horizontal=True, key="corr_window",
+                              index=CORRELATION_WINDOWS.index(CORRELATION_DEFAULT_WINDOW))
+    metric = col_metric.radio("Матрица", ["Корелация", "Бета"], horizontal=True, key="corr_metric")
+    matrices = service.matrices(window)
+    if matrices is None or len(matrices.labels) < 2:
+        st.info("Няма достатъчно серии за корелации.")
+        return
+
+    values = matrices.corr if metric == "Корелация" else matrices.beta
+    fig = go.Figure(go.Heatmap(
+        z=values, x=matrices.labels, y=matrices.labels, zmid=0, colorscale="RdBu",
+        zmin=-1 if metric == "Корелация" else None, zmax=1 if metric == "Корелация" else None,
+        text=np.round(values, 2), texttemplate="%{text}", customdata=matrices.overlap,
+        hovertemplate="%{y} / %{x}: %{z:.2f}<br>Общи дни: %{customdata}<extra></extra>"))
+    fig.update_layout(margin=dict(l=10, r=10, t=30, b=10), height=max(360, 40 * len(matrices.labels)))
+    st.plotly_chart(fig, use_container_width=True, key="correlation_heatmap")
+    st.caption(f"Дневни лог-доходности за {window} дни към {matrices.as_of} · бета на реда спрямо колоната · "
+               f"празните клетки имат под {CORRELATION_MIN_OVERLAP} общи наблюдения")
+
+    # --- Сравнение ---
+    benchmark = CORRELATION_BENCHMARK if CORRELATION_BENCHMARK in matrices.labels else matrices.labels[0]
+    default = [label for label in dict.fromkeys([benchmark, f"cg:{asset_id}"]) if label in matrices.labels]
+    selected = st.multiselect("Сравнение на серии:", matrices.labels, default=default, key="corr_compare")
+    if not selected:
+        return
+    cumulative = service.cumulative_returns(selected, window)
+    fig = go.Figure([go.Scatter(x=cumulative['dates'], y=cumulative['values'][:, i], mode="lines", name=label)
+                     for i, label in enumerate(cumulative['labels'])])
+    fig.update_layout(margin=dict(l=10, r=10, t=30, b=10), height=360, yaxis_title="Натрупана доходност, %")
+    st.plotly_chart(fig, use_container_width=True, key="correlation_cumulative")
+
+    b = matrices.labels.index(benchmark)
+    rows = [matrices.labels.index(label) for label in selected]
+    st.dataframe(pd.DataFrame({
+        'Серия': selected,
+        'Волатилност (год.) %': [matrices.vol[i] * 100 for i in rows],
+        f'Бета спрямо {benchmark}': [matrices.beta[i, b] for i in rows],
+        f'Корелация с {benchmark}': [matrices.corr[i, b] for i in rows],
+        'Общи дни': [matrices.overlap[i, b] for i in rows],
+    }), hide_index=True, use_container_width=True)
+
+    rolling = service.rolling_vs_benchmark([label for label in selected if label != benchmark], window, benchmark)
+    if rolling and rolling['labels']:
+        fig = go.Figure([go.Scatter(x=rolling['dates'], y=rolling['corr'][:, i], mode="lines", name=label)
+                         for i, label in enumerate(rolling['labels'])])
+        fig.update_yaxes(range=[-1.05, 1.05])
+        fig.update_layout(margin=dict(l=10, r=10, t=30, b=10), height=320,
+                          yaxis_title=f"Корелация с {benchmark} ({window} дни)")
+        st.plotly_chart(fig, use_container_width=True, key="correlation_rolling")
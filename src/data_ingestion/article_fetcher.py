@@ -0,0 +1,217 @@
+# src/data_ingestion/article_fetcher.py
+
+import hashlib
+import itertools
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup
+
+from config import (
+    ARTICLE_FETCH_WORKERS, ARTICLE_FETCH_PER_DOMAIN, ARTICLE_FETCH_DOMAIN_DELAY, ARTICLE_FETCH_TIMEOUT,
+    ARTICLE_FETCH_MAX_BYTES, ARTICLE_FETCH_TIME_BUDGET, ARTICLE_BODY_MAX_CHARS, ARTICLE_FETCH_USER_AGENT
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+NOISE_TAGS = ['script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form', 'figure', 'iframe', 'svg']
+MIN_PARAGRAPH_CHARS = 40      # По-кратките <p> обикновено са надписи, бутони и навигация
+PERMANENT_HTTP_ERRORS = {401, 403, 404, 410, 451}  # Тези адреси не се опитват наново
+FETCH_BATCH_SIZE = 200
+FLUSH_ROWS = 50
+
+
+def extract_main_text(html: Any, max_chars: int = ARTICLE_BODY_MAX_CHARS,
+                      encoding: Optional[str] = None) -> Tuple[str, int]:
+    """
+    Основният текст на страницата: абзаците на елемента, който съдържа най-много
+    текст в абзаци (обикновено <article> или контейнерът на статията), без
+    скриптове, менюта и футъри. Връща (съкратения текст, пълната му дължина).
+    """
+    soup = BeautifulSoup(html, 'html.parser', from_encoding=encoding) if isinstance(html, bytes) \
+        else BeautifulSoup(html, 'html.parser')
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+
+    scores: Counter = Counter()
+    containers = {}
+    for paragraph in soup.find_all('p'):
+        length = len(paragraph.get_text(' ', strip=True))
+        if length >= MIN_PARAGRAPH_CHARS and paragraph.parent is not None:
+            scores[id(paragraph.parent)] += length
+            containers[id(paragraph.parent)] = paragraph.parent
+    if scores:
+        container = containers[scores.most_common(1)[0][0]]
+        paragraphs = [p.get_text(' ', strip=True) for p in container.find_all('p')]
+        paragraphs = [p for p in paragraphs if len(p) >= MIN_PARAGRAPH_CHARS]
+    else:
+        container = soup.find('article') or soup.body or soup
+        paragraphs = [container.get_text(' ', strip=True)]
+
+    text = "\n\n".join(re.sub(r'\s+', ' ', p).strip() for p in paragraphs if p.strip())
+    return text[:max_chars], len(text)
+
+
+class DomainThrottle:
+    """
+    Вежливост към сайтовете: най-много max_connections едновременни връзки към
+    един домейн и поне delay секунди между началото на две заявки към него.
+    """
+    def __init__(self, max_connections: int = ARTICLE_FETCH_PER_DOMAIN, delay: float = ARTICLE_FETCH_DOMAIN_DELAY):
+        self.max_connections = max_connections
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._next_slot: Dict[str, float] = {}
+
+    @contextmanager
+    def slot(self, domain: str):
+        with self._lock:
+            semaphore = self._semaphores.setdefault(domain, threading.BoundedSemaphore(self.max_connections))
+        with semaphore:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_slot.get(domain, now))
+                self._next_slot[domain] = start + self.delay
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+class ArticleFetcher:
+    """
+    Изтегля страниците на новите статии и записва почистения им основен текст
+    в article_bodies. Работи като поточна стъпка: опашката се чете от базата на
+    порции, в полет има най-много 2 x max_workers заявки, HTML-ът се чете до
+    max_bytes, а резултатите се записват на малки партиди - паметта не зависи
+    от броя статии. Вече извлечените адреси не се теглят наново (кешът по URL е
+    самата таблица), а content_hash позволява еднакъв текст да се резюмира веднъж.
+    """
+    def __init__(self, db_manager, max_workers: int = ARTICLE_FETCH_WORKERS,
+                 throttle: Optional[DomainThrottle] = None, timeout: float = ARTICLE_FETCH_TIMEOUT,
+                 max_bytes: int = ARTICLE_FETCH_MAX_BYTES, max_chars: int = ARTICLE_BODY_MAX_CHARS):
+        self.db_manager = db_manager
+        self.max_workers = max_workers
+        self.throttle = throttle or DomainThrottle()
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        # requests.Session не е гарантирано thread-safe - всяка нишка има своя (с keep-alive към домейните)
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({'User-Agent': ARTICLE_FETCH_USER_AGENT, 'Accept': 'text/html,application/xhtml+xml'})
+            self._local.session = session
+        return session
+
+    # --- Опашката ---
+    def _iter_pending(self) -> Iterator[Dict[str, Any]]:
+        """Статиите за изтегляне, на порции; в порцията домейните се редуват, за да не чакат нишките един сайт."""
+        before_id = None
+        while True:
+            batch = self.db_manager.get_articles_for_body_fetch(before_id, limit=FETCH_BATCH_SIZE)
+            if not batch:
+                return
+            before_id = batch[-1]['id']
+            by_domain = defaultdict(list)
+            for article in batch:
+                by_domain[urlparse(article['url']).netloc.lower()].append(article)
+            for group in itertools.zip_longest(*by_domain.values()):
+                yield from (article for article in group if article is not None)
+
+    # --- Една статия ---
+    def fetch_article(self, article: Dict[str, Any]) -> Dict[str, Any]:
+        """Изтегля и почиства една страница. Винаги връща ред за article_bodies (ok / failed / skipped)."""
+        url = article['url']
+        row = {'article_id': article['id'], 'url': url, 'status': 'failed', 'http_status': None,
+               'content_hash': None, 'body': None, 'body_chars': None, 'error': None, 'fetched_at': int(time.time())}
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            row.update(status='skipped', error='unsupported URL')
+            return row
+        try:
+            with self.throttle.slot(parsed.netloc.lower()):
+                with self._session().get(url, timeout=self.timeout, stream=True) as response:
+                    row['http_status'] = response.status_code
+                    if response.status_code >= 400:
+                        row.update(status='skipped' if response.status_code in PERMANENT_HTTP_ERRORS else 'failed',
+                                   error=f"HTTP {response.status_code}")
+                        return row
+                    content_type = response.headers.get('Content-Type', '')
+                    if 'html' not in content_type:
+                        row.update(status='skipped', error=f"not HTML ({content_type or 'no content type'})")
+                        return row
+                    html = self._read_capped(response)
+        except requests.RequestException as e:
+            row['error'] = str(e)[:300]
+            return row
+
+        # Парсването е извън слота на домейна - не държи връзката заета
+        encoding = response.encoding if 'charset=' in content_type.lower() else None
+        text, total_chars = extract_main_text(html, self.max_chars, encoding)
+        if not text:
+            row.update(status='skipped', error='no main text found')
+            return row
+        row.update(status='ok', body=text, body_chars=total_chars,
+                   content_hash=hashlib.sha256(text.encode('utf-8')).hexdigest())
+        return row
+
+    def _read_capped(self, response: requests.Response) -> bytes:
+        chunks, size = [], 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes:
+                break
+        return b"".join(chunks)[:self.max_bytes]
+
+    # --- Поточната стъпка ---
+    def run(self, max_articles: Optional[int] = None, time_budget: float = ARTICLE_FETCH_TIME_BUDGET) -> Dict[str, int]:
+        """
+        Изтегля текстовете на чакащите статии, докато опашката свърши, стигне се
+        max_articles или изтече time_budget (тогава се изчакват само вече
+        подадените). Връща броя резултати по статус.
+        """
+        deadline = time.monotonic() + time_budget
+        stats: Counter = Counter()
+        rows: List[Dict[str, Any]] = []
+        in_flight = set()
+
+        def collect(done):
+            for future in done:
+                try:
+                    row = future.result()
+                except Exception as e:  # Неочаквана грешка при парсване не бива да спира стъпката
+                    logging.error(f"❌ Unexpected error while extracting an article body: {e}")
+                    continue
+                stats[row['status']] += 1
+                rows.append(row)
+            if len(rows) >= FLUSH_ROWS:
+                self.db_manager.save_article_bodies(rows)
+                rows.clear()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for submitted, article in enumerate(self._iter_pending()):
+                if (max_articles is not None and submitted >= max_articles) or time.monotonic() > deadline:
+                    break
+                while len(in_flight) >= self.max_workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight.add(executor.submit(self.fetch_article, article))
+            done, _ = wait(in_flight)
+            collect(done)
+        self.db_manager.save_article_bodies(rows)
+        if stats:
+            logging.info(f"📄 Article bodies: {dict(stats)}")
+        return dict(stats)
@@ -0,0 +1,206 @@
+# src/data_ingestion/asset_refresh.py
+
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import (
+    ASSET_REFRESH_MAX_STALENESS, ASSET_REFRESH_MAX_ARTICLES, ASSET_REFRESH_CANDLE_DAYS, ORDERBOOK_DEPTH
+)
+from src.analysis.asset_matcher import AssetMatcher
+from src.analysis.orderbook import capture_snapshots
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DAY = 86400
+UNANALYZED_SCAN_LIMIT = 500  # Колко от най-новите неанализирани заглавия се преглеждат за статии на актива
+# Източник -> нужният клиент; стаканът и свещите се теглят само за активи с KuCoin символ
+SOURCE_CLIENTS = {'market': 'coingecko', 'candles': 'kucoin', 'orderbook': 'kucoin', 'news': 'newsapi'}
+
+
+class AssetRefresher:
+    """
+    Целево обновяване на един актив за секунди, без пълно пускане на pipeline-а.
+    Проверява кога за последно е обновен всеки източник (пазарен snapshot,
+    свещи, стакан, новини) и тегли паралелно само остарелите - по една-две
+    заявки на източник, само за този актив. След това анализира първо
+    неанализираните статии за актива (до max_articles) и обновява snapshot-а
+    на настроенията. Връща състоянието преди и след, за да е ясно какво е
+    останало остаряло (напр. изчерпана квота или недостъпен доставчик).
+    clients: {'coingecko': CoinGeckoClient, 'kucoin': KucoinHandler, 'newsapi': NewsApiClient} -
+    източниците без клиент само се проверяват.
+    """
+    def __init__(self, db_manager, clients: Dict[str, Any], ai_analyzer=None,
+                 max_articles: int = ASSET_REFRESH_MAX_ARTICLES):
+        self.db_manager = db_manager
+        self.clients = clients
+        self.ai_analyzer = ai_analyzer
+        self.max_articles = max_articles
+        self.matcher = ai_analyzer.asset_matcher if ai_analyzer is not None else AssetMatcher.from_database(db_manager)
+
+    def _asset(self, asset_id: str) -> Dict[str, Any]:
+        for asset in self.db_manager.get_tracked_assets():
+            if asset['id'] == asset_id:
+                return asset
+        raise ValueError(f"Unknown or disabled asset: {asset_id}")
+
+    # --- Проверка на свежестта ---
+    def check(self, asset_id: str, max_staleness: int = ASSET_REFRESH_MAX_STALENESS) -> Dict[str, Dict[str, Any]]:
+        """
+        Състоянието на всеки източник: кога е обновен (refreshed_at), преди
+        колко секунди (age) и дали е по-стар от max_staleness (stale).
+        За анализа: колко статии за актива чакат (pending).
+        """
+        symbol = self._asset(asset_id)['exchange_symbols'].get('kucoin')
+        now = int(time.time())
+        status = {}
+        for source, refreshed_at in self.db_manager.get_asset_freshness(asset_id, symbol).items():
+            if source in ('candles', 'orderbook') and not symbol:
+                continue
+            age = now - refreshed_at if refreshed_at else None
+            status[source] = {'refreshed_at': refreshed_at, 'age': age, 'stale': age is None or age > max_staleness}
+        pending = len(self._pending_article_ids(asset_id))
+        status['analysis'] = {'pending': pending, 'stale': pending > 0}
+        return status
+
+    def _pending_article_ids(self, asset_id: str) -> List[int]:
+        """Неанализираните статии, които се отнасят за актива (по категория или споменаване в заглавието)."""
+        return [a['id'] for a in self.db_manager.get_unprocessed_articles(limit=UNANALYZED_SCAN_LIMIT)
+                if asset_id in self.matcher.match_asset_ids(a['title'], a['category'])]
+
+    # --- Обновяване ---
+    def refresh(self, asset_id: str, max_staleness: int = ASSET_REFRESH_MAX_STALENESS) -> Dict[str, Any]:
+        """
+        Обновява остарелите източници на актива и връща
+        {'before': ..., 'after': ..., 'saved': {източник: записани редове / None при грешка}, 'seconds': ...}.
+        """
+        started = time.monotonic()
+        asset = self._asset(asset_id)
+        before = self.check(asset_id, max_staleness)
+        handlers = {'market': self._refresh_market, 'candles': self._refresh_candles,
+                    'orderbook': self._refresh_orderbook, 'news': self._refresh_news}
+        due = [source for source in handlers
+               if before.get(source, {}).get('stale') and SOURCE_CLIENTS[source] in self.clients]
+
+        saved: Dict[str, Optional[int]] = {}
+        if due:
+            with ThreadPoolExecutor(max_workers=len(due)) as executor:
+                futures = {source: executor.submit(handlers[source], asset, before[source]['refreshed_at'])
+                           for source in due}
+                for source, future in futures.items():
+                    try:
+                        saved[source] = future.result()
+                    except Exception as e:  # Един недостъпен доставчик не бива да спира останалите
+                        logging.error(f"❌ Refreshing {source} for {asset_id} failed: {e}")
+                        saved[source] = None
+
+        if self.ai_analyzer is not None:
+            saved['analysis'] = self._analyze(asset_id)
+        self.db_manager.refresh_sentiment_snapshots([asset_id])
+
+        after = self.check(asset_id, max_staleness)
+        seconds = round(time.monotonic() - started, 1)
+        still_stale = [source for source, state in after.items() if state['stale']]
+        logging.info(f"🎯 Refreshed {asset_id} in {seconds}s: {saved}"
+                     + (f" (still stale: {', '.join(still_stale)})" if still_stale else " (all sources fresh)"))
+        return {'asset_id': asset_id, 'before': before, 'after': after, 'saved': saved, 'seconds': seconds}
+
+    def _refresh_market(self, asset: Dict[str, Any], refreshed_at: Optional[int]) -> int:
+        """Текущият snapshot от /coins/markets; пропуснатите дни (или история за нов актив) - с една историческа заявка."""
+        coingecko = self.clients['coingecko']
+        rows_saved = 0
+        missing_days = self.db_manager.get_market_backfill_days([asset['id']]).get(asset['id'])
+        if missing_days:
+            history = coingecko.fetch_historical_data(asset['id'], days=missing_days)
+            rows_saved += self.db_manager.save_market_data(history) if history else 0
+        market_data = coingecko.markets_to_market_data(coingecko.fetch_markets([asset['id']]))
+        if market_data:
+            rows_saved += self.db_manager.save_market_data(market_data)
+            self.db_manager.record_freshness('market', [asset['id']])
+        return rows_saved
+
+    def _refresh_candles(self, asset: Dict[str, Any], refreshed_at: Optional[int]) -> int:
+        """Дневните свещи от последната записана (тя се презаписва - денят още тече) до сега."""
+        symbol = asset['exchange_symbols']['kucoin']
+        now = int(time.time())
+        start = self.db_manager.get_latest_candle_ts(symbol) or now - ASSET_REFRESH_CANDLE_DAYS * DAY
+        klines = self.clients['kucoin'].get_klines_range(symbol, start, now, '1day')
+        if not klines:
+            return 0
+        rows_saved = self.db_manager.save_historical_prices(symbol, klines)
+        self.db_manager.record_freshness('candles', [symbol])
+        return rows_saved
+
+    def _refresh_orderbook(self, asset: Dict[str, Any], refreshed_at: Optional[int]) -> int:
+        return capture_snapshots(self.db_manager, self.clients['kucoin'], [asset['exchange_symbols']['kucoin']],
+                                 ORDERBOOK_DEPTH)
+
+    def _refresh_news(self, asset: Dict[str, Any], refreshed_at: Optional[int]) -> int:
+        """Една NewsAPI заявка само за актива, от последното обновяване (в рамките на дневната квота)."""
+        news_api_client = self.clients['newsapi']
+        since = datetime.fromtimestamp(refreshed_at) if refreshed_at else None
+        articles = news_api_client.fetch_news_for_assets([asset['id']], since)
+        rows_saved = self.db_manager.save_articles(articles) if articles else 0
+        if asset['id'] in news_api_client.covered_assets:
+            self.db_manager.record_freshness('news', [asset['id']])
+        news_api_client.log_usage()
+        return rows_saved
+
+    def _analyze(self, asset_id: str) -> int:
+        """Заема и анализира само неанализираните статии за актива - най-новите първо."""
+        article_ids = self._pending_article_ids(asset_id)[:self.max_articles]
+        if not article_ids:
+            return 0
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:refresh"
+        claimed = self.db_manager.claim_articles_for_analysis(worker_id, limit=len(article_ids), article_ids=article_ids)
+        analyzed = 0
+        for article, analysis in self.ai_analyzer.analyze_articles(claimed):
+            if not analysis:
+                self.db_manager.release_article_lease(article['id'], error=f"analysis failed on attempt {article['attempts']}")
+                continue
+            if article.get('content_hash') and article.get('body_summary'):
+                self.db_manager.save_body_summary(article['content_hash'],
+                                                  self.ai_analyzer.triage_model or self.ai_analyzer.model,
+                                                  article['body_summary'])
+            self.db_manager.update_article_analysis(
+                article['id'], analysis, asset_ids=self.matcher.match_asset_ids(article['title'], article.get('category')),
+                published_at=article.get('published_at'), category=article.get('category'))
+            analyzed += 1
+        return analyzed
+
+
+def build_asset_refresher(db_manager, ai_analyzer=None) -> AssetRefresher:
+    """
+    AssetRefresher с всички налични клиенти (доставчик без ключ само се
+    пропуска). Клиентите са нови за всяко обновяване - бюджетът на NewsAPI е на пускане.
+    """
+    from src.data_ingestion.raw_lake import RawLake
+    from src.data_ingestion.coingecko_client import CoinGeckoClient
+    from src.data_ingestion.kucoin_client import KucoinHandler
+    from src.data_ingestion.newsapi_client import NewsApiClient
+
+    raw_lake = RawLake(db_manager)
+    clients = {'coingecko': CoinGeckoClient(raw_lake=raw_lake), 'kucoin': KucoinHandler(raw_lake=raw_lake)}
+    try:
+        clients['newsapi'] = NewsApiClient(db_manager, matcher=AssetMatcher.from_database(db_manager), raw_lake=raw_lake)
+    except ValueError as e:
+        logging.warning(f"⚠️ News will not be refreshed: {e}")
+    return AssetRefresher(db_manager, clients, ai_analyzer)
+
+
+def format_freshness(status: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Четими редове за състоянието на източниците (за CLI)."""
+    lines = []
+    for source, state in status.items():
+        if source == 'analysis':
+            detail = f"{state['pending']} articles pending"
+        elif state['age'] is None:
+            detail = "never refreshed"
+        else:
+            detail = f"{state['age'] // 60} min ago"
+        lines.append(f"{'⚠️' if state['stale'] else '✅'} {source:<10} {detail}")
+    return lines
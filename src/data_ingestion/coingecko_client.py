@@ -1,14 +1,20 @@
 # src/data_ingestion/coingecko_client.py
 from pycoingecko import CoinGeckoAPI
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Dict, Any
 
+from config import COINGECKO_MARKETS_PAGE_SIZE
+
+RAW_PROVIDER = 'coingecko'
+
 class CoinGeckoClient:
     """
     Клас за извличане на пазарни данни от CoinGecko.
+    Ако е подаден raw_lake, всеки суров отговор се пази за повторна обработка.
     """
-    def __init__(self):
+    def __init__(self, raw_lake=None):
         self.api = CoinGeckoAPI()
+        self.raw_lake = raw_lake
         print("🦎 CoinGecko Client initialized.")
 
     def fetch_historical_data(self, asset_id: str, days: int) -> List[Dict[str, Any]]:
@@ -24,6 +30,8 @@ class CoinGeckoClient:
                 days=days,
                 interval='daily' # Изискваме дневни данни
             )
+            if self.raw_lake is not None:
+                self.raw_lake.record(RAW_PROVIDER, 'market_chart', {'asset_id': asset_id, 'days': days}, chart_data)
 
             # Обработваме данните, за да ги върнем в удобен формат
             processed_data = self._process_chart_data(asset_id, chart_data)
@@ -35,8 +43,94 @@ class CoinGeckoClient:
             print(f"   -> ❌ Error fetching data from CoinGecko for '{asset_id}': {e}")
             return []
 
-    def _process_chart_data(self, asset_id: str, chart_data: dict) -> List[Dict[str, Any]]:
-        """Помощен метод за комбиниране на списъците от CoinGecko."""
+    def fetch_historical_range(self, asset_id: str, from_ts: int, to_ts: int) -> List[Dict[str, Any]]:
+        """
+        Пазарни данни в [from_ts, to_ts] (Unix секунди) - за запълване на дупки в средата на историята.
+        За интервали под 90 дни CoinGecko връща почасови точки; пазим първата точка на всеки ден,
+        най-близката до дневната точка от fetch_historical_data.
+        """
+        try:
+            chart_data = self.api.get_coin_market_chart_range_by_id(
+                id=asset_id, vs_currency='usd', from_timestamp=from_ts, to_timestamp=to_ts
+            )
+        except Exception as e:
+            print(f"   -> ❌ Error fetching range data from CoinGecko for '{asset_id}': {e}")
+            return []
+        if self.raw_lake is not None:
+            self.raw_lake.record(RAW_PROVIDER, 'market_chart_range',
+                                 {'asset_id': asset_id, 'from': from_ts, 'to': to_ts}, chart_data)
+        return self._first_per_day(self._process_chart_data(asset_id, chart_data))
+
+    @staticmethod
+    def _first_per_day(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        by_date: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            by_date.setdefault(record['date'], record)
+        return list(by_date.values())
+
+    def fetch_markets(self, asset_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Текущи цена, капитализация и обем за много активи наведнъж през
+        /coins/markets - до COINGECKO_MARKETS_PAGE_SIZE актива на заявка.
+        Връща суровите записи на CoinGecko.
+        """
+        markets = []
+        for i in range(0, len(asset_ids), COINGECKO_MARKETS_PAGE_SIZE):
+            chunk = asset_ids[i:i + COINGECKO_MARKETS_PAGE_SIZE]
+            try:
+                batch = self.api.get_coins_markets(
+                    vs_currency='usd', ids=','.join(chunk), per_page=COINGECKO_MARKETS_PAGE_SIZE, page=1
+                )
+            except Exception as e:
+                print(f"   -> ❌ Error fetching market snapshot for {len(chunk)} assets: {e}")
+                continue
+            if self.raw_lake is not None:
+                self.raw_lake.record(RAW_PROVIDER, 'markets', {'ids': chunk}, batch)
+            markets.extend(batch)
+        print(f"🦎 Fetched market snapshots for {len(markets)}/{len(asset_ids)} assets in "
+              f"{-(-len(asset_ids) // COINGECKO_MARKETS_PAGE_SIZE)} requests.")
+        return markets
+
+    def fetch_top_markets(self, top_n: int) -> List[Dict[str, Any]]:
+        """Първите top_n актива по капитализация (за синхронизация на вселената)."""
+        markets = []
+        pages = -(-top_n // COINGECKO_MARKETS_PAGE_SIZE)
+        for page in range(1, pages + 1):
+            try:
+                batch = self.api.get_coins_markets(
+                    vs_currency='usd', order='market_cap_desc', per_page=COINGECKO_MARKETS_PAGE_SIZE, page=page
+                )
+            except Exception as e:
+                print(f"   -> ❌ Error fetching top markets page {page}: {e}")
+                break
+            if self.raw_lake is not None:
+                self.raw_lake.record(RAW_PROVIDER, 'markets', {'order': 'market_cap_desc', 'page': page}, batch)
+            markets.extend(batch)
+            if len(batch) < COINGECKO_MARKETS_PAGE_SIZE:
+                break
+        return markets[:top_n]
+
+    @staticmethod
+    def markets_to_market_data(markets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Превръща записите от /coins/markets в дневни редове за market_data (датата е по UTC)."""
+        rows = []
+        for market in markets:
+            if market.get('current_price') is None:
+                continue
+            updated = market.get('last_updated')
+            date = updated[:10] if updated else datetime.now(timezone.utc).strftime('%Y-%m-%d')
+            rows.append({
+                'asset_id': market['id'],
+                'date': date,
+                'price': market['current_price'],
+                'market_cap': market.get('market_cap'),
+                'total_volume': market.get('total_volume'),
+            })
+        return rows
+
+    @staticmethod
+    def _process_chart_data(asset_id: str, chart_data: dict) -> List[Dict[str, Any]]:
+        """Помощен метод за комбиниране на списъците от CoinGecko (датата е по UTC, както в markets_to_market_data)."""
         processed = []
         prices = chart_data.get('prices', [])
         market_caps = chart_data.get('market_caps', [])
@@ -49,7 +143,7 @@ class CoinGeckoClient:
         for i in range(len(prices)):
             # Времето идва в милисекунди, преобразуваме го
             timestamp_ms = prices[i][0]
-            date = datetime.fromtimestamp(timestamp_ms / 1000).strftime('%Y-%m-%d')
+            date = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
 
             # Добавяме -1, ако някоя стойност липсва, за да не се чупи програмата
             daily_record = {
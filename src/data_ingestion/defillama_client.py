@@ -1,3 +1,4 @@
+import json
 import logging
 import time
 from typing import List, Dict, Any
@@ -10,11 +11,15 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()] 
 )
 
+RAW_PROVIDER = 'defillama'
+
 class DefiLlamaHandler:
     """
     Клас за извличане на on-chain данни от DefiLlama API.
+    Ако е подаден raw_lake, историята на TVL от всеки отговор се пази за повторна обработка.
     """
-    def __init__(self):
+    def __init__(self, raw_lake=None):
+        self.raw_lake = raw_lake
         try:
             self.llama = DefiLlama()
             logging.info("🦙 DefiLlama Handler initialized successfully.")
@@ -45,15 +50,11 @@ class DefiLlamaHandler:
                 response_df = self.llama.get_chain_hist_tvl(chain=chain)
 
                 if isinstance(response_df, pd.DataFrame) and not response_df.empty:
-                    # Взимаме последната (най-актуалната) стойност за TVL
-                    latest_tvl_value = response_df['tvl'].iloc[-1]
-                    
-                    chain_data = {
-                        'chain': chain,
-                        'tvl': float(latest_tvl_value),
-                        'timestamp': current_timestamp
-                    }
-                    all_chains_tvl.append(chain_data)
+                    # defillama2 вече е превърнал JSON-а в DataFrame - пазим го в "split" вид
+                    if self.raw_lake is not None:
+                        self.raw_lake.record(RAW_PROVIDER, 'chain_hist_tvl', {'chain': chain},
+                                             json.loads(response_df.to_json(orient='split', date_format='iso')))
+                    all_chains_tvl.append(self._latest_tvl(chain, response_df['tvl'].tolist(), current_timestamp))
                     # Малка пауза, за да не товарим API-то
                     time.sleep(0.2) 
                 else:
@@ -71,6 +72,15 @@ class DefiLlamaHandler:
             logging.error(f"❌ An exception occurred while fetching TVL data from DefiLlama: {e}", exc_info=True)
             return []
 
+    @staticmethod
+    def _latest_tvl(chain: str, tvl_values: List[float], timestamp: int) -> Dict[str, Any]:
+        """Взимаме последната (най-актуалната) стойност за TVL; timestamp е моментът на изтегляне."""
+        return {
+            'chain': chain,
+            'tvl': float(tvl_values[-1]),
+            'timestamp': timestamp
+        }
+
 # --- Тестовият блок остава същият ---
 if __name__ == '__main__':
     logging.info("--- Testing DefiLlamaHandler ---")
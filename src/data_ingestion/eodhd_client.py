@@ -1,28 +1,44 @@
 import os
 import logging
 import requests
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 import sys
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(project_root)
 
-from config import EODHD_API_KEY
+from config import EODHD_API_KEY, EODHD_MAX_CONCURRENCY
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+RAW_PROVIDER = 'eodhd'
+
 class EODHDClient:
     """
     Клас за извличане на Forex данни от EOD Historical Data (EODHD) API.
+    Ако е подаден raw_lake, суровите отговори се пазят за повторна обработка.
     """
     BASE_URL = "https://eodhd.com/api/"
+    # Колоните, които записваме във forex_data (bulk отговорът съдържа и други)
+    RECORD_FIELDS = ('date', 'open', 'high', 'low', 'close', 'adjusted_close', 'volume')
 
-    def __init__(self):
+    def __init__(self, max_concurrency: int = EODHD_MAX_CONCURRENCY, raw_lake=None):
         if not EODHD_API_KEY:
             logging.error("❌ EODHD API ключът не е конфигуриран!")
             raise ValueError("Моля, дефинирайте EODHD_API_KEY в .env и config.py файловете.")
         self.api_key = EODHD_API_KEY
+        self.max_concurrency = max_concurrency
+        self.raw_lake = raw_lake
+        # Една споделена сесия: keep-alive връзки и автоматичен повторен опит при 429/5xx
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=1.0, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=retry)
+        self.session.mount("https://", adapter)
         logging.info("📈 EODHD Client initialized successfully.")
 
     def get_forex_data(self, symbol: str, from_date: str, to_date: str) -> List[Dict[str, Any]]:
@@ -40,9 +56,11 @@ class EODHDClient:
 
         logging.info(f"Fetching Forex data from EODHD for {symbol}...")
         try:
-            response = requests.get(endpoint, params=params)
+            response = self.session.get(endpoint, params=params, timeout=30)
             response.raise_for_status()
             data = response.json()
+            if self.raw_lake is not None:
+                self.raw_lake.record(RAW_PROVIDER, 'eod', {'symbol': symbol, 'from': from_date, 'to': to_date}, data)
             if not isinstance(data, list):
                 logging.warning(f"EODHD API (forex) did not return a list for {symbol}.")
                 return []
@@ -52,6 +70,61 @@ class EODHDClient:
             logging.error(f"❌ Error fetching Forex data for {symbol}: {e}")
             return []
 
+    def get_forex_data_many(self, date_ranges: Dict[str, Tuple[str, str]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Извлича няколко символа паралелно (до max_concurrency заявки наведнъж).
+        date_ranges: {символ: (from_date, to_date)}.
+        """
+        if not date_ranges:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(date_ranges))) as executor:
+            futures = {
+                symbol: executor.submit(self.get_forex_data, symbol, from_date, to_date)
+                for symbol, (from_date, to_date) in date_ranges.items()
+            }
+            return {symbol: future.result() for symbol, future in futures.items()}
+
+    def get_bulk_last_day(self, symbols: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Последният дневен бар за много символи с по една заявка на борса
+        (eod-bulk-last-day). Символите са във формат КОД.БОРСА.
+        """
+        by_exchange = defaultdict(list)
+        for symbol in symbols:
+            code, _, exchange = symbol.rpartition('.')
+            by_exchange[exchange].append(code)
+
+        results = {}
+        for exchange, codes in by_exchange.items():
+            endpoint = f"{self.BASE_URL}eod-bulk-last-day/{exchange}"
+            params = {'api_token': self.api_key, 'fmt': 'json', 'symbols': ','.join(codes)}
+            logging.info(f"Fetching bulk last-day data from EODHD for {len(codes)} {exchange} symbols...")
+            try:
+                response = self.session.get(endpoint, params=params, timeout=30)
+                response.raise_for_status()
+                data = response.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logging.error(f"❌ Error fetching bulk data for {exchange}: {e}")
+                continue
+            if self.raw_lake is not None:
+                self.raw_lake.record(RAW_PROVIDER, 'eod_bulk_last_day', {'exchange': exchange, 'codes': codes}, data)
+            if not isinstance(data, list):
+                logging.warning(f"EODHD API (bulk) did not return a list for {exchange}.")
+                continue
+            for symbol, records in self._process_bulk(exchange, data).items():
+                results.setdefault(symbol, []).extend(records)
+        logging.info(f"✅ Bulk request returned data for {len(results)} symbols.")
+        return results
+
+    @classmethod
+    def _process_bulk(cls, exchange: str, data: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Разделя bulk отговора по символ (КОД.БОРСА), само с колоните за forex_data."""
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        for row in data:
+            symbol = f"{row.get('code')}.{exchange}"
+            results.setdefault(symbol, []).append({k: row.get(k) for k in cls.RECORD_FIELDS})
+        return results
+
 if __name__ == '__main__':
     # Тестовият блок е обновен да тества само Forex данните
     client = EODHDClient()
@@ -0,0 +1,215 @@
+# src/data_ingestion/gap_repair.py
+
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import GAP_REPAIR_MAX_REQUESTS, GAP_MAX_ATTEMPTS, GAP_MERGE_SLACK
+from src.utils.time_utils import to_epoch_seconds
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DAY = 86400
+# Сканираните набори: откъде идват, на каква стъпка се очакват точките и колко обхваща една заявка към доставчика
+GAP_DATASETS = {
+    'market_data': {
+        'table': 'market_data', 'key_column': 'asset_id', 'time_column': 'date',
+        'calendar': 'daily', 'interval': DAY, 'provider': 'coingecko', 'max_span': 365 * DAY,
+    },
+    'candles': {
+        'table': 'historical_prices', 'key_column': 'asset_symbol', 'time_column': 'timestamp',
+        'calendar': 'fixed', 'interval': DAY, 'provider': 'kucoin', 'max_span': 1500 * DAY,  # '1day' свещи, до 1500 на заявка
+    },
+    'forex': {
+        'table': 'forex_data', 'key_column': 'symbol', 'time_column': 'date',
+        'calendar': 'business', 'interval': DAY, 'provider': 'eodhd', 'max_span': 365 * DAY,
+    },
+}
+
+Gap = Tuple[int, int, int]  # (първа липсваща точка, последна липсваща точка, брой липсващи точки)
+
+
+def _to_epoch_array(values: List[Any]) -> np.ndarray:
+    if values and isinstance(values[0], str):
+        return np.array(values, dtype='datetime64[D]').astype('datetime64[s]').astype(np.int64)
+    return np.array(values, dtype=np.int64)
+
+
+def find_gaps(keys: np.ndarray, times: np.ndarray, interval: int, calendar: str = 'fixed') -> Dict[str, List[Gap]]:
+    """
+    Дупките във всички серии наведнъж с една векторизирана разлика по
+    подредените (ключ, време). Интервалът преди първата и след последната
+    точка на серията не е дупка - за тях отговарят инкременталните стъпки.
+    calendar='business' очаква точка във всеки делничен ден (Forex).
+    """
+    if len(times) < 2:
+        return {}
+    same_key = keys[1:] == keys[:-1]
+    if calendar == 'business':
+        days = (times // DAY).astype('datetime64[D]')
+        steps = np.busday_count(days[:-1], days[1:])
+        holes = same_key & (steps > 1)
+        starts = np.busday_offset(days[:-1][holes], 1, roll='forward').astype('datetime64[s]').astype(np.int64)
+        ends = np.busday_offset(days[1:][holes], -1, roll='backward').astype('datetime64[s]').astype(np.int64)
+        missing = steps[holes] - 1
+    else:
+        diffs = np.diff(times)
+        holes = same_key & (diffs > interval * 1.5)
+        starts = times[:-1][holes] + interval
+        ends = times[1:][holes] - interval
+        missing = diffs[holes] // interval - 1
+    gaps: Dict[str, List[Gap]] = defaultdict(list)
+    for key, start, end, count in zip(keys[:-1][holes], starts, ends, missing):
+        gaps[key].append((int(start), int(end), int(count)))
+    return dict(gaps)
+
+
+def merge_ranges(gaps: List[Gap], interval: int, slack: int = GAP_MERGE_SLACK,
+                 max_span: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Свежда дупките до минимален брой заявки: съседни дупки, разделени от до
+    slack налични точки, се теглят заедно, а никоя заявка не надхвърля max_span.
+    """
+    max_span = max_span or 365 * DAY
+    ranges: List[List[int]] = []
+    for start, end, _ in sorted(gaps):
+        if ranges and start - ranges[-1][1] <= (slack + 1) * interval and end - ranges[-1][0] < max_span:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    split: List[Tuple[int, int]] = []
+    for start, end in ranges:
+        while end - start >= max_span:
+            split.append((start, start + max_span - interval))
+            start += max_span
+        split.append((start, end))
+    return split
+
+
+class GapRepairer:
+    """
+    Открива дупки в пазарните серии и ги запълва с целеви заявки само за
+    липсващите прозорци. Бюджетът от заявки е отделен за всеки доставчик,
+    а дупка, която остава празна след max_attempts опита, се записва като
+    невъзстановима и повече не се тегли.
+    clients: {'coingecko': CoinGeckoClient, 'kucoin': KucoinHandler, 'eodhd': EODHDClient} -
+    наборите без клиент само се сканират.
+    """
+    def __init__(self, db_manager, clients: Dict[str, Any], max_requests: Dict[str, int] = None,
+                 max_attempts: int = GAP_MAX_ATTEMPTS):
+        self.db_manager = db_manager
+        self.clients = clients
+        self.max_requests = max_requests or GAP_REPAIR_MAX_REQUESTS
+        self.max_attempts = max_attempts
+
+    # --- Сканиране ---
+    def scan(self, datasets: Optional[List[str]] = None) -> Dict[str, Dict[str, List[Gap]]]:
+        """Сканира наборите, обновява series_gaps и връща отворените дупки (за поправка)."""
+        open_gaps = {}
+        for dataset in datasets or list(GAP_DATASETS):
+            spec = GAP_DATASETS[dataset]
+            rows = self.db_manager.get_series_times(spec['table'], spec['key_column'], spec['time_column'])
+            if not rows:
+                continue
+            keys = np.array([r[0] for r in rows], dtype=object)
+            gaps = find_gaps(keys, _to_epoch_array([r[1] for r in rows]), spec['interval'], spec['calendar'])
+            open_gaps[dataset] = self._reconcile(dataset, gaps)
+        return open_gaps
+
+    def _reconcile(self, dataset: str, gaps: Dict[str, List[Gap]]) -> Dict[str, List[Gap]]:
+        """Пренася опитите и статуса от предишните записи към текущите дупки (частично запълнена дупка ги наследява)."""
+        previous = defaultdict(list)
+        for row in self.db_manager.get_series_gaps(dataset, statuses=['open', 'unrecoverable']):
+            previous[row['series_key']].append(row)
+
+        rows, open_gaps, matched = [], defaultdict(list), set()
+        for key, key_gaps in gaps.items():
+            for start, end, missing in key_gaps:
+                overlaps = [p for p in previous.get(key, []) if p['gap_start'] <= end and p['gap_end'] >= start]
+                matched.update((key, p['gap_start']) for p in overlaps)
+                attempts = max((p['attempts'] for p in overlaps), default=0)
+                unrecoverable = attempts >= self.max_attempts or any(p['status'] == 'unrecoverable' for p in overlaps)
+                latest = max(overlaps, key=lambda p: p['last_attempt'] or '', default={})
+                rows.append({
+                    'dataset': dataset, 'series_key': key, 'gap_start': start, 'gap_end': end, 'missing_points': missing,
+                    'status': 'unrecoverable' if unrecoverable else 'open', 'attempts': attempts,
+                    'first_seen': min((p['first_seen'] for p in overlaps), default=None),
+                    'last_attempt': latest.get('last_attempt'), 'last_error': latest.get('last_error'),
+                })
+                if not unrecoverable:
+                    open_gaps[key].append((start, end, missing))
+        for key, key_rows in previous.items():
+            rows.extend(dict(p, status='repaired') for p in key_rows if (key, p['gap_start']) not in matched)
+        self.db_manager.sync_series_gaps(dataset, rows)
+        return dict(open_gaps)
+
+    # --- Поправка ---
+    def repair(self, datasets: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Сканира, тегли липсващите прозорци (най-новите първо, в рамките на
+        бюджета на доставчика), след което сканира отново, за да отчете
+        поправените и невъзстановимите дупки.
+        """
+        datasets = [d for d in (datasets or list(GAP_DATASETS)) if GAP_DATASETS[d]['provider'] in self.clients]
+        open_gaps = self.scan(datasets)
+        requests_made: Counter = Counter()
+        stats: Counter = Counter()
+        for dataset, gaps_by_key in open_gaps.items():
+            spec = GAP_DATASETS[dataset]
+            provider = spec['provider']
+            plan = [
+                (start, end, key, gaps)
+                for key, gaps in gaps_by_key.items()
+                for start, end in merge_ranges(gaps, spec['interval'], max_span=spec['max_span'])
+            ]
+            stats['gaps'] += sum(len(gaps) for gaps in gaps_by_key.values())
+            for start, end, key, gaps in sorted(plan, key=lambda p: p[0], reverse=True):
+                if requests_made[provider] >= self.max_requests.get(provider, 0):
+                    stats['deferred_ranges'] += 1
+                    continue
+                requests_made[provider] += 1
+                window = [(s, e) for s, e, _ in gaps if s <= end and e >= start]
+                saved = self._fetch(dataset, key, start, end, window)
+                stats['rows_saved'] += saved
+                self.db_manager.record_gap_attempt(dataset, key, start, end, None if saved else "no data returned")
+        if requests_made:
+            self.scan(list(open_gaps))
+        stats['requests'] = sum(requests_made.values())
+        logging.info(f"🩹 Gap repair: {dict(stats)} (requests per provider: {dict(requests_made)})")
+        return dict(stats)
+
+    def _fetch(self, dataset: str, key: str, start: int, end: int, window: List[Tuple[int, int]]) -> int:
+        """Тегли [start, end] и записва само точките, попадащи в дупките (не и наличните между тях)."""
+        def in_window(value) -> bool:
+            ts = to_epoch_seconds(value)
+            return ts is not None and any(s <= ts <= e for s, e in window)
+
+        if dataset == 'market_data':
+            rows = self.clients['coingecko'].fetch_historical_range(key, start, end + DAY - 1)
+            rows = [r for r in rows if in_window(r['date'])]
+            return self.db_manager.save_market_data(rows) if rows else 0
+        if dataset == 'candles':
+            rows = self.clients['kucoin'].get_klines_range(key, start, end + DAY, '1day')
+            rows = [r for r in rows if in_window(r['timestamp'])]
+            return self.db_manager.save_historical_prices(key, rows) if rows else 0
+        if dataset == 'forex':
+            rows = self.clients['eodhd'].get_forex_data(key, _iso_date(start), _iso_date(end))
+            rows = [r for r in rows if in_window(r.get('date'))]
+            return self.db_manager.save_forex_data(key, rows) if rows else 0
+        raise ValueError(f"Unknown gap dataset: {dataset}")
+
+
+def _iso_date(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def format_gap_report(rows: List[Dict[str, Any]]) -> List[str]:
+    """Четими редове за отчета с невъзстановими дупки."""
+    return [
+        f"{row['dataset']:<12} {row['series_key']:<18} {_iso_date(row['gap_start'])} -> {_iso_date(row['gap_end'])} "
+        f"({row['missing_points']} points, {row['attempts']} attempts, last error: {row['last_error'] or '-'})"
+        for row in rows
+    ]
@@ -1,8 +1,11 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from kucoin.client import Market
-from config import KUCOIN_API_KEY, KUCOIN_API_SECRET, KUCOIN_API_PASSPHRASE
-from typing import List, Dict, Any
+from config import KUCOIN_API_KEY, KUCOIN_API_SECRET, KUCOIN_API_PASSPHRASE, ORDERBOOK_MAX_CONCURRENCY
+from typing import List, Dict, Any, Optional
+
+RAW_PROVIDER = 'kucoin'
 
 # Конфигурираме логър за този модул
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -10,8 +13,10 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 class KucoinHandler:
     """
     Клас за работа с KuCoin API - само за ПУБЛИЧНИ данни (пазарни данни).
+    Ако е подаден raw_lake, суровите k-line отговори се пазят за повторна обработка.
     """
-    def __init__(self):
+    def __init__(self, raw_lake=None):
+        self.raw_lake = raw_lake
         try:
             self.market_client = Market(key=KUCOIN_API_KEY, secret=KUCOIN_API_SECRET, passphrase=KUCOIN_API_PASSPHRASE)
             logging.info("✅ KuCoin Market Client initialized successfully.")
@@ -21,30 +26,104 @@ class KucoinHandler:
 
     def get_historical_data(self, symbol: str, start_date: str, end_date: str, kline_type: str = '1day') -> List[Dict[str, Any]]:
         """Извлича исторически данни (свещи) за даден символ."""
+        logging.info(f"Fetching historical data for {symbol} from {start_date} to {end_date}...")
+        start_ts = int(datetime.strptime(start_date, '%Y-%m-%d').timestamp())
+        end_ts = int(datetime.strptime(end_date, '%Y-%m-%d').timestamp())
+        return self.get_klines_range(symbol, start_ts, end_ts, kline_type)
+
+    def get_klines_range(self, symbol: str, start_ts: int, end_ts: int, kline_type: str = '1day') -> List[Dict[str, Any]]:
+        """Свещите в [start_ts, end_ts] (Unix секунди); KuCoin връща до 1500 на заявка."""
         if not self.market_client:
             logging.error("KuCoin клиентът не е инициализиран. Заявката е прекратена.")
             return []
-            
         try:
-            logging.info(f"Fetching historical data for {symbol} from {start_date} to {end_date}...")
-            start_ts = int(datetime.strptime(start_date, '%Y-%m-%d').timestamp())
-            end_ts = int(datetime.strptime(end_date, '%Y-%m-%d').timestamp())
-            
             klines = self.market_client.get_kline(symbol, kline_type, start=start_ts, end=end_ts)
+            if self.raw_lake is not None:
+                self.raw_lake.record(RAW_PROVIDER, 'kline',
+                                     {'symbol': symbol, 'type': kline_type, 'start': start_ts, 'end': end_ts}, klines)
             
             logging.info(f"✅ Fetched {len(klines)} k-line records for {symbol}.")
-            
-            processed_klines = []
-            for k in klines:
-                processed_klines.append({
-                    'timestamp': int(k[0]),
-                    'open': float(k[1]),
-                    'close': float(k[2]),
-                    'high': float(k[3]),
-                    'low': float(k[4]),
-                    'volume': float(k[5])
-                })
-            return processed_klines
+            return self._process_klines(klines)
         except Exception as e:
             logging.error(f"❌ Error fetching historical data for {symbol}: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def get_all_tickers(self) -> List[Dict[str, Any]]:
+        """
+        Последна цена, 24h обем и промяна за всички двойки на борсата с една
+        заявка (/api/v1/market/allTickers). Всеки ред носи snapshot_ts на KuCoin.
+        """
+        if not self.market_client:
+            logging.error("KuCoin клиентът не е инициализиран. Заявката е прекратена.")
+            return []
+        try:
+            data = self.market_client.get_all_tickers()
+        except Exception as e:
+            logging.error(f"❌ Error fetching KuCoin all-tickers snapshot: {e}")
+            return []
+        if self.raw_lake is not None:
+            self.raw_lake.record(RAW_PROVIDER, 'all_tickers', {}, data)
+        tickers = self._process_all_tickers(data)
+        logging.info(f"✅ Fetched a KuCoin snapshot of {len(tickers)} trading pairs.")
+        return tickers
+
+    def get_order_book(self, symbol: str, depth: int = 100) -> Optional[Dict[str, Any]]:
+        """
+        Първите depth нива (20 или 100) от всяка страна на стакана:
+        {'time': ms, 'sequence': ..., 'bids': [[цена, размер], ...], 'asks': [...]}.
+        Не се пази в raw_lake - компактният blob в orderbook_snapshots е без загуба.
+        """
+        if not self.market_client:
+            logging.error("KuCoin клиентът не е инициализиран. Заявката е прекратена.")
+            return None
+        try:
+            return self.market_client.get_part_order(depth, symbol)
+        except Exception as e:
+            logging.error(f"❌ Error fetching order book for {symbol}: {e}")
+            return None
+
+    def get_order_books(self, symbols: List[str], depth: int = 100,
+                        max_concurrency: int = ORDERBOOK_MAX_CONCURRENCY) -> Dict[str, Dict[str, Any]]:
+        """Стаканите на няколко двойки паралелно; двойките с грешка липсват в резултата."""
+        if not symbols:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(symbols))) as executor:
+            books = dict(zip(symbols, executor.map(lambda s: self.get_order_book(s, depth), symbols)))
+        return {symbol: book for symbol, book in books.items() if book}
+
+    @staticmethod
+    def _process_all_tickers(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Полетата идват като низове (или None за двойки без сделки); time е в милисекунди."""
+        def to_float(value) -> Optional[float]:
+            try:
+                return float(value) if value is not None else None
+            except (TypeError, ValueError):
+                return None
+
+        snapshot_ts = int(data['time']) // 1000
+        return [
+            {
+                'snapshot_ts': snapshot_ts,
+                'symbol': ticker['symbol'],
+                'last': to_float(ticker.get('last')),
+                'change_rate': to_float(ticker.get('changeRate')),
+                'volume_24h': to_float(ticker.get('vol')),
+                'quote_volume_24h': to_float(ticker.get('volValue')),
+            }
+            for ticker in data.get('ticker', []) if ticker.get('symbol')
+        ]
+
+    @staticmethod
+    def _process_klines(klines: List[list]) -> List[Dict[str, Any]]:
+        """KuCoin връща [time, open, close, high, low, volume, turnover] като низове."""
+        processed_klines = []
+        for k in klines:
+            processed_klines.append({
+                'timestamp': int(k[0]),
+                'open': float(k[1]),
+                'close': float(k[2]),
+                'high': float(k[3]),
+                'low': float(k[4]),
+                'volume': float(k[5])
+            })
+        return processed_klines
\ No newline at end of file
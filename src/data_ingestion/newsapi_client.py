@@ -1,89 +1,228 @@
 import logging
-from datetime import datetime, timedelta
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 from newsapi import NewsApiClient as ApiClient
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 # Импортираме нужните променливи от твоя config файл
-from config import NEWSAPI_API_KEY, ASSETS_TO_TRACK 
+from config import (
+    NEWSAPI_API_KEY, NEWSAPI_DAILY_QUOTA, NEWSAPI_MAX_REQUESTS_PER_RUN,
+    NEWSAPI_MAX_QUERY_LENGTH, NEWSAPI_PAGE_SIZE, NEWSAPI_MAX_PAGES
+)
+from src.analysis.asset_matcher import AssetMatcher
 
 # Настройваме логър
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Преместваме константата тук, за да е на едно място
 ECONOMIC_NEWS_SOURCES = 'bloomberg,reuters,the-wall-street-journal,financial-times'
+# Добавя се към всяка пакетирана заявка, за да филтрира шума (напр. "solana" извън крипто)
+CRYPTO_CONTEXT = ' AND "crypto"'
+API_PROVIDER = 'newsapi'
+PACK_CURSOR_KEY = 'next_pack'  # freshness_watermarks: от кой пакет започва следващото пускане
 
 class NewsApiClient:
-    def __init__(self):
+    """
+    Клиент за NewsAPI, който пести дневната квота: активите се пакетират по
+    няколко в една OR заявка (до лимита за дължина на q), резултатите се
+    теглят с пълен размер на страница и се разпределят обратно по активи от
+    AssetMatcher. Всяка заявка се отчита в api_usage (ако има db_manager),
+    а суровият отговор се пази в raw_lake (ако е подаден).
+    """
+    def __init__(self, db_manager=None, matcher: Optional[AssetMatcher] = None,
+                 daily_quota: int = NEWSAPI_DAILY_QUOTA, max_requests_per_run: int = NEWSAPI_MAX_REQUESTS_PER_RUN,
+                 raw_lake=None):
         if not NEWSAPI_API_KEY:
             logging.error("❌ NewsAPI ключът не е конфигуриран!")
             raise ValueError("NewsAPI ключът не е конфигуриран в .env файла.")
         self.api = ApiClient(api_key=NEWSAPI_API_KEY)
+        self.db_manager = db_manager
+        self.matcher = matcher or AssetMatcher()
+        self.raw_lake = raw_lake
+        self.daily_quota = daily_quota
+        self.max_requests_per_run = max_requests_per_run
+        self.requests_made = 0
+        self.covered_assets: List[str] = []   # Активите, обходени от последното търсене (за freshness_watermarks)
+        self._rate_limited = False
+        self._day = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        self._used_before_run = db_manager.get_api_usage(API_PROVIDER, self._day) if db_manager else 0
         logging.info("📰 NewsAPI Client initialized successfully.")
 
-    def _make_api_request(self, q: str, **kwargs) -> List[Dict[str, Any]]:
+    @property
+    def remaining_budget(self) -> int:
+        """Колко заявки остават за това пускане - по-малкото от лимита на пускане и дневната квота."""
+        if self._rate_limited:
+            return 0
+        used_today = self._used_before_run + self.requests_made
+        return max(0, min(self.max_requests_per_run - self.requests_made, self.daily_quota - used_today))
+
+    def log_usage(self):
+        used_today = self._used_before_run + self.requests_made
+        logging.info(f"📊 NewsAPI usage: {self.requests_made} requests this run, "
+                     f"{used_today}/{self.daily_quota} today, {self.remaining_budget} left for this run.")
+
+    def _make_api_request(self, q: str, category: Optional[str] = None, **kwargs) -> List[Dict[str, Any]]:
         """
         Обединен помощен метод за извършване на заявки към NewsAPI.
-        Това премахва дублирането на код.
+        Това премахва дублирането на код. category се пази само в езерото -
+        по нея повторната обработка знае как да категоризира статиите.
         """
+        if self.remaining_budget <= 0:
+            logging.warning(f"⚠️ NewsAPI request budget exhausted - skipping query: '{q[:80]}'")
+            return []
+        self.requests_made += 1
+        if self.db_manager:
+            self.db_manager.record_api_usage(API_PROVIDER, self._day)
         try:
             logging.info(f"Fetching news from NewsAPI with query: '{q}'")
             response = self.api.get_everything(q=q, language='en', **kwargs)
             
             if response.get('status') == 'error':
                 logging.error(f"❌ NewsAPI Error: {response.get('message')}")
+                if response.get('code') == 'rateLimited':
+                    self._rate_limited = True
                 return []
 
+            if self.raw_lake is not None:
+                self.raw_lake.record(API_PROVIDER, 'everything', dict(kwargs, q=q, category=category), response)
             return response.get('articles', [])
         except Exception as e:
             logging.error(f"❌ An exception occurred during NewsAPI request: {e}")
             return []
 
-    # --- ТОВА Е НОВИЯТ, ПО-УМЕН МЕТОД ---
-    def fetch_asset_news(self) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _query_terms(asset_name: str, aliases: List[str]) -> List[str]:
+        """Синонимите, по които има смисъл да се търси - късите тикери ("sol", "eth") носят само шум."""
+        terms = [a for a in aliases if len(a) >= 4 and not a.startswith('$')]
+        return terms or [asset_name.replace('-', ' ')]
+
+    def build_packed_queries(self, asset_names: Optional[List[str]] = None) -> List[Tuple[List[str], str]]:
+        """
+        Пакетира активите в OR заявки, всяка до NEWSAPI_MAX_QUERY_LENGTH символа.
+        Връща (активите в заявката, самата заявка).
+        """
+        asset_names = asset_names or list(self.matcher.aliases)
+        budget = NEWSAPI_MAX_QUERY_LENGTH - len(CRYPTO_CONTEXT) - 2  # Скобите около OR групата
+        queries, current_assets, current_terms = [], [], []
+
+        def close_query():
+            if current_terms:
+                queries.append((list(current_assets), "(" + " OR ".join(current_terms) + ")" + CRYPTO_CONTEXT))
+
+        for asset_name in asset_names:
+            terms = [f'"{t}"' for t in self._query_terms(asset_name, self.matcher.aliases.get(asset_name, [asset_name]))]
+            while terms and len(" OR ".join(terms)) > budget:
+                terms.pop()
+            if len(" OR ".join(current_terms + terms)) > budget:
+                close_query()
+                current_assets, current_terms = [], []
+            current_assets.append(asset_name)
+            current_terms.extend(terms)
+        close_query()
+        return queries
+
+    @staticmethod
+    def _attribute(matcher: AssetMatcher, article: Dict[str, Any]) -> str:
+        """Категория = първият актив, споменат в заглавието или описанието."""
+        text = " ".join(filter(None, [article.get('title'), article.get('description')]))
+        names = matcher.match(text)
+        return names[0] if names else 'general'
+
+    @staticmethod
+    def process_response(articles_data: List[Dict[str, Any]], matcher: AssetMatcher,
+                         category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Статиите от един отговор; без category всяка се приписва на първия споменат актив."""
+        if category is not None:
+            return NewsApiClient._process_articles(articles_data, category=category)
+        processed = []
+        for article in articles_data:
+            processed.extend(NewsApiClient._process_articles([article], category=NewsApiClient._attribute(matcher, article)))
+        return processed
+
+    def fetch_asset_news(self, reserve: int = 1) -> List[Dict[str, Any]]:
         """
-        Автоматично извлича новини за всички активи, дефинирани в ASSETS_TO_TRACK.
+        Извлича новини за всички следени активи с минимален брой заявки.
+        reserve заявки се оставят за останалите търсения (икономическите новини).
+        Ако бюджетът не стига за всички пакети, следващото пускане започва
+        от първия необходен пакет (курсорът се пази в freshness_watermarks),
+        така че пакетите се обхождат по ред и всички получават покритие.
         """
-        all_asset_articles = []
-        
         # Изчисляваме "от вчера до днес", за да са актуални новините
         yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
         today = datetime.now().strftime('%Y-%m-%d')
-        
-        # ASSETS_TO_TRACK е речник, например {'bitcoin': 'btc-bitcoin', 'solana': 'sol-solana'}
-        # Ние ще използваме ключовете ('bitcoin', 'solana') за търсене.
-        for asset_name in ASSETS_TO_TRACK.keys():
-            logging.info(f"Searching news for asset: {asset_name}...")
-            # Търсим по име на актива + "crypto", за да филтрираме шума
-            query = f'"{asset_name}" AND "crypto"'
-            
-            articles_data = self._make_api_request(
-                q=query,
-                sort_by='publishedAt',
-                page_size=5,  # 5 новини за всеки актив са достатъчни
-                from_param=yesterday,
-                to=today
-            )
-            # Задаваме категория = името на актива
-            processed = self._process_articles(articles_data, category=asset_name)
-            all_asset_articles.extend(processed)
-        
-        logging.info(f"✅ Fetched a total of {len(all_asset_articles)} articles for tracked assets.")
+
+        queries = self.build_packed_queries()
+        if not queries:
+            return []
+        offset = (self.db_manager.get_watermark(API_PROVIDER, PACK_CURSOR_KEY) or 0) % len(queries) if self.db_manager else 0
+        queries = queries[offset:] + queries[:offset]
+        logging.info(f"Packed {sum(len(a) for a, _ in queries)} assets into {len(queries)} NewsAPI queries "
+                     f"(starting from pack {offset + 1}).")
+
+        all_asset_articles, covered_assets = self._fetch_packed(queries, yesterday, today, reserve)
+        if self.db_manager:
+            covered = set(covered_assets)
+            packs_fetched = sum(1 for asset_names, _ in queries if asset_names[0] in covered)
+            self.db_manager.set_watermark(API_PROVIDER, PACK_CURSOR_KEY, (offset + packs_fetched) % len(queries))
+        per_asset = Counter(a['category'] for a in all_asset_articles)
+        logging.info(f"✅ Fetched a total of {len(all_asset_articles)} articles for tracked assets "
+                     f"({len(covered_assets)} assets queried, {len(per_asset) - ('general' in per_asset)} with matches).")
+        skipped = len(self.matcher.aliases) - len(covered_assets)
+        if skipped > 0:
+            logging.warning(f"⚠️ {skipped} assets were not queried this run because the NewsAPI budget ran out.")
         return all_asset_articles
 
+    def _fetch_packed(self, queries: List[Tuple[List[str], str]], from_date: str, to_date: str,
+                      reserve: int = 0) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Изпълнява пакетираните заявки в рамките на бюджета. Връща (статиите без дубликати, обходените активи)."""
+        articles_by_url: Dict[str, Dict[str, Any]] = {}
+        covered_assets = []
+        for asset_names, query in queries:
+            if self.remaining_budget <= reserve:
+                break
+            for page in range(1, NEWSAPI_MAX_PAGES + 1):
+                articles_data = self._make_api_request(
+                    q=query,
+                    sort_by='publishedAt',
+                    page_size=NEWSAPI_PAGE_SIZE,
+                    page=page,
+                    from_param=from_date,
+                    to=to_date
+                )
+                for processed in self.process_response(articles_data, self.matcher):
+                    articles_by_url.setdefault(processed['url'], processed)
+                if len(articles_data) < NEWSAPI_PAGE_SIZE or self.remaining_budget <= reserve:
+                    break
+            covered_assets.extend(asset_names)
+        self.covered_assets = covered_assets
+        return list(articles_by_url.values()), covered_assets
+
+    def fetch_news_for_assets(self, asset_names: List[str], since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Новините само за дадените активи (обикновено една заявка) - за целево
+        обновяване на актив. since ограничава периода (по подразбиране - от вчера).
+        """
+        asset_names = [name for name in asset_names if name in self.matcher.aliases]
+        if not asset_names:
+            return []
+        since = since or datetime.now() - timedelta(days=1)
+        queries = self.build_packed_queries(asset_names)
+        articles, _ = self._fetch_packed(queries, since.strftime('%Y-%m-%d'), datetime.now().strftime('%Y-%m-%d'))
+        return articles
+
     def fetch_economic_news(self, keywords: List[str]) -> List[Dict[str, Any]]:
         query_string = ' OR '.join(f'"{k}"' for k in keywords)
         articles_data = self._make_api_request(
             q=query_string,
+            category='economic_event',
             sources=ECONOMIC_NEWS_SOURCES,
             sort_by='relevancy',
             page_size=20
         )
         return self._process_articles(articles_data, category='economic_event')
-    
-    # Този метод е премахнат, защото fetch_asset_news го замества и е по-добър
-    # def fetch_general_news(self, keywords: List[str]) -> List[Dict[str, Any]]: ...
 
-    def _process_articles(self, articles_data: List[Dict[str, Any]], category: Optional[str] = None) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _process_articles(articles_data: List[Dict[str, Any]], category: Optional[str] = None) -> List[Dict[str, Any]]:
         processed = []
         for article in articles_data:
             processed_article = {
@@ -0,0 +1,99 @@
+# src/data_ingestion/raw_lake.py
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from config import RAW_LAKE_DIR, RAW_LAKE_ENABLED, RAW_LAKE_COMPRESSION_LEVEL
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def canonical_json(payload: Any) -> bytes:
+    """Детерминистичен JSON (сортирани ключове, без интервали) - еднакво съдържание дава еднакъв хеш."""
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+
+class RawLake:
+    """
+    Локално езеро със суровите отговори на външните API-та.
+    Всеки отговор се записва компресиран (gzip) в
+    <root>/<provider>/<YYYY-MM-DD>/<sha256>.json.gz, а таблицата
+    raw_responses пази за коя заявка (endpoint + параметри) е бил.
+    Идентичните отговори се записват на диска само веднъж.
+    Грешка при запис в езерото никога не прекъсва самото извличане.
+    """
+    def __init__(self, db_manager, root: str = RAW_LAKE_DIR, enabled: bool = RAW_LAKE_ENABLED,
+                 compression_level: int = RAW_LAKE_COMPRESSION_LEVEL):
+        self.db_manager = db_manager
+        self.root = root
+        self.enabled = enabled
+        self.compression_level = compression_level
+        self._known_paths: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {'responses': 0, 'new_blobs': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+
+    def record(self, provider: str, endpoint: str, params: Dict[str, Any], payload: Any) -> Optional[str]:
+        """
+        Записва суровия отговор. params са параметрите, нужни за повторното му
+        парсване (без API ключове). Връща digest-а или None при изключено езеро/грешка.
+        """
+        if not self.enabled:
+            return None
+        try:
+            data = canonical_json(payload)
+            digest = hashlib.sha256(data).hexdigest()
+            fetched_at = int(time.time())
+            path, stored_bytes = self._store_blob(provider, digest, data, fetched_at)
+            self.db_manager.record_raw_response({
+                'provider': provider, 'endpoint': endpoint,
+                'params': canonical_json(params).decode('utf-8'), 'digest': digest, 'path': path,
+                'raw_bytes': len(data), 'stored_bytes': stored_bytes, 'fetched_at': fetched_at,
+            })
+            with self._lock:
+                self.stats['responses'] += 1
+            return digest
+        except (OSError, TypeError, ValueError, sqlite3.Error) as e:
+            logging.warning(f"⚠️ Could not store raw {provider}/{endpoint} response in the lake: {e}")
+            return None
+
+    def _store_blob(self, provider: str, digest: str, data: bytes, fetched_at: int):
+        with self._lock:
+            path = self._known_paths.get(digest)
+        path = path or self.db_manager.get_raw_blob_path(digest)
+        if path and os.path.exists(os.path.join(self.root, path)):
+            return path, os.path.getsize(os.path.join(self.root, path))
+
+        day = datetime.fromtimestamp(fetched_at, tz=timezone.utc).strftime('%Y-%m-%d')
+        path = f"{provider}/{day}/{digest}.json.gz"
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        compressed = gzip.compress(data, compresslevel=self.compression_level, mtime=0)
+        # Временен файл + os.replace: паралелните нишки никога не виждат наполовина записан blob
+        tmp_path = f"{full_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, full_path)
+        with self._lock:
+            self._known_paths[digest] = path
+            self.stats['new_blobs'] += 1
+            self.stats['raw_bytes'] += len(data)
+            self.stats['stored_bytes'] += len(compressed)
+        return path, len(compressed)
+
+    def load(self, path: str) -> Any:
+        """Чете и декомпресира един blob по относителния му път от манифеста."""
+        with open(os.path.join(self.root, path), 'rb') as f:
+            return json.loads(gzip.decompress(f.read()))
+
+    def log_stats(self):
+        ratio = self.stats['raw_bytes'] / self.stats['stored_bytes'] if self.stats['stored_bytes'] else 0.0
+        logging.info(f"🗃️ Raw lake: {self.stats['responses']} responses recorded, {self.stats['new_blobs']} new blobs "
+                     f"({self.stats['stored_bytes'] / 1024:.1f} KiB stored, compression x{ratio:.1f} on new data).")
@@ -0,0 +1,160 @@
+# src/data_ingestion/reprocessor.py
+
+import itertools
+import json
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import RAW_LAKE_DIR
+from src.database.database_manager import DatabaseManager
+from src.database.write_queue import WriteQueue
+from src.data_ingestion.raw_lake import RawLake
+from src.data_ingestion.coingecko_client import CoinGeckoClient
+from src.data_ingestion.kucoin_client import KucoinHandler
+from src.data_ingestion.newsapi_client import NewsApiClient
+from src.data_ingestion.defillama_client import DefiLlamaHandler
+from src.data_ingestion.eodhd_client import EODHDClient
+from src.analysis.asset_matcher import AssetMatcher
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Резултат на парсер: [(вид запис от WRITE_SQL, ключ за свещи/Forex, редове)]
+ParsedBatch = Tuple[str, Optional[str], List[Dict[str, Any]]]
+MAX_ENTRIES_PER_TASK = 200
+
+
+def _parse_news(params: Dict[str, Any], payload: Any, fetched_at: int) -> List[ParsedBatch]:
+    if not isinstance(payload, dict) or payload.get('status') == 'error':
+        return []
+    category = params.get('category')
+    if category is None and 'matcher' not in _WORKER:
+        _WORKER['matcher'] = AssetMatcher.from_database(DatabaseManager(_WORKER['db_path']))
+    matcher = _WORKER.get('matcher')
+    return [('articles', None, NewsApiClient.process_response(payload.get('articles', []), matcher, category))]
+
+
+def _parse_tvl(params: Dict[str, Any], payload: Any, fetched_at: int) -> List[ParsedBatch]:
+    # Отговорът е DataFrame в "split" вид: {'columns': [...], 'index': [...], 'data': [[...], ...]}
+    if 'tvl' not in payload.get('columns', []) or not payload.get('data'):
+        return []
+    tvl_index = payload['columns'].index('tvl')
+    tvl_values = [row[tvl_index] for row in payload['data']]
+    return [('chain_tvl_data', None, [DefiLlamaHandler._latest_tvl(params['chain'], tvl_values, fetched_at)])]
+
+
+# (доставчик, endpoint) -> парсер(params, payload, fetched_at); същите функции, които ползват клиентите
+PARSERS: Dict[Tuple[str, str], Callable[[Dict[str, Any], Any, int], List[ParsedBatch]]] = {
+    ('coingecko', 'market_chart'): lambda params, payload, _: [
+        ('market_data', None, CoinGeckoClient._process_chart_data(params['asset_id'], payload))],
+    ('coingecko', 'market_chart_range'): lambda params, payload, _: [
+        ('market_data', None, CoinGeckoClient._first_per_day(CoinGeckoClient._process_chart_data(params['asset_id'], payload)))],
+    ('coingecko', 'markets'): lambda params, payload, _: [
+        ('market_data', None, CoinGeckoClient.markets_to_market_data(payload))],
+    ('kucoin', 'kline'): lambda params, payload, _: [
+        ('historical_prices', params['symbol'], KucoinHandler._process_klines(payload))],
+    ('kucoin', 'all_tickers'): lambda params, payload, _: [
+        ('ticker_snapshots', 'kucoin', KucoinHandler._process_all_tickers(payload))],
+    ('newsapi', 'everything'): _parse_news,
+    ('defillama', 'chain_hist_tvl'): _parse_tvl,
+    ('eodhd', 'eod'): lambda params, payload, _: [
+        ('forex_data', params['symbol'], payload)] if isinstance(payload, list) else [],
+    ('eodhd', 'eod_bulk_last_day'): lambda params, payload, _: [
+        ('forex_data', symbol, records) for symbol, records in EODHDClient._process_bulk(params['exchange'], payload).items()
+    ] if isinstance(payload, list) else [],
+}
+
+# Състояние на worker процеса (езерото и AssetMatcher-ът се създават веднъж на процес)
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(lake_root: str, db_path: str):
+    _WORKER.clear()
+    _WORKER['lake'] = RawLake(None, root=lake_root)
+    _WORKER['db_path'] = db_path
+
+
+def _parse_entries(entries: List[Dict[str, Any]]) -> Tuple[List[ParsedBatch], int]:
+    """Декомпресира и парсва една порция от манифеста; споделените blob-ове се четат веднъж."""
+    batches: List[ParsedBatch] = []
+    failed = 0
+    payloads: Dict[str, Any] = {}
+    for entry in entries:
+        parser = PARSERS.get((entry['provider'], entry['endpoint']))
+        if parser is None:
+            failed += 1
+            continue
+        try:
+            if entry['path'] not in payloads:
+                payloads[entry['path']] = _WORKER['lake'].load(entry['path'])
+            parsed = parser(json.loads(entry['params']), payloads[entry['path']], entry['fetched_at'])
+        except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+            logging.warning(f"⚠️ Could not reprocess raw response #{entry['id']} ({entry['path']}): {e}")
+            failed += 1
+            continue
+        batches.extend(batch for batch in parsed if batch[2])
+    return batches, failed
+
+
+def _partition_tasks(entries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Порции по (доставчик, ден на изтегляне), разделени допълнително, за да се балансират процесите."""
+    def partition(entry):
+        return entry['provider'], datetime.fromtimestamp(entry['fetched_at'], tz=timezone.utc).date()
+
+    tasks = []
+    for _, group in itertools.groupby(entries, key=partition):
+        group = list(group)
+        tasks.extend(group[i:i + MAX_ENTRIES_PER_TASK] for i in range(0, len(group), MAX_ENTRIES_PER_TASK))
+    return tasks
+
+
+def reprocess(db_manager: DatabaseManager, providers: Optional[List[str]] = None, since_ts: Optional[int] = None,
+              until_ts: Optional[int] = None, workers: Optional[int] = None,
+              lake_root: str = RAW_LAKE_DIR) -> Dict[str, int]:
+    """
+    Възстановява производните таблици от езерото, без мрежови заявки.
+    Парсването върви паралелно в ProcessPoolExecutor (по порции от манифеста),
+    а всички записи минават през един WriteQueue в реда на изтегляне, така че
+    по-новият отговор презаписва по-стария точно както при оригиналното пускане.
+    Статиите са INSERT OR IGNORE - вече записаните не се променят.
+    Връща броя подадени редове по вид запис.
+    """
+    entries = db_manager.get_raw_responses(providers, since_ts, until_ts)
+    if not entries:
+        logging.info("🗃️ No raw responses match the reprocess filter.")
+        return {}
+    tasks = _partition_tasks(entries)
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    logging.info(f"🗃️ Reprocessing {len(entries)} raw responses in {len(tasks)} tasks on {workers} workers...")
+
+    rows_by_kind: Counter = Counter()
+    failed = 0
+    futures = []
+    with WriteQueue(db_manager) as write_queue:
+        if workers == 1:
+            _init_worker(lake_root, db_manager.db_path)
+            results = map(_parse_entries, tasks)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                           initargs=(lake_root, db_manager.db_path))
+            results = executor.map(_parse_entries, tasks)
+        try:
+            for batches, task_failed in results:
+                failed += task_failed
+                for kind, key, rows in batches:
+                    futures.append((kind, write_queue.submit(kind, rows, key)))
+        finally:
+            if workers > 1:
+                executor.shutdown()
+    for kind, future in futures:
+        try:
+            rows_by_kind[kind] += future.result()
+        except Exception as e:
+            logging.error(f"❌ Failed to write reprocessed {kind} rows: {e}")
+    if failed:
+        logging.warning(f"⚠️ {failed} raw responses could not be reprocessed.")
+    logging.info(f"✅ Reprocess finished: {dict(rows_by_kind)}")
+    return dict(rows_by_kind)
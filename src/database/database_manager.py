@@ -1,11 +1,123 @@
 import sqlite3
 import logging
-from typing import List, Dict, Any
+import time
+import json
+from datetime import date
+from typing import List, Dict, Any, Optional, Tuple
 from contextlib import contextmanager
-from config import DATABASE_PATH
+from config import (
+    DATABASE_PATH, ANALYSIS_LEASE_SECONDS, ANALYSIS_MAX_ATTEMPTS, SQLITE_BUSY_TIMEOUT, ARTICLE_FETCH_MAX_ATTEMPTS,
+    SENTIMENT_INDEX_RESOLUTIONS, SENTIMENT_MACRO_SCOPE, DEFAULT_SENTIMENT_CONFIDENCE, MARKET_BACKFILL_DAYS
+)
+from src.utils.time_utils import to_epoch_seconds, floor_to_bucket
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Прозорци (в часове), за които asset_snapshots пази броячи на настроенията
+SNAPSHOT_SENTIMENT_WINDOWS = {'24h': 24, '7d': 24 * 7, '30d': 24 * 30}
+SENTIMENT_COLUMNS = {'Positive': 'positive', 'Negative': 'negative', 'Neutral': 'neutral'}
+# Оценка за статиите, анализирани преди числовия score (само етикет)
+SENTIMENT_LABEL_SCORES = {'Positive': 1.0, 'Negative': -1.0, 'Neutral': 0.0}
+SNAPSHOT_RECENT_SUMMARIES = 5
+
+# SQL за всеки вид пакетен запис - общ за save_* методите и за WriteQueue
+WRITE_SQL = {
+    'articles': "INSERT OR IGNORE INTO articles (source, title, url, published_at, category) VALUES (:source, :title, :url, :published_at, :category)",
+    'market_data': "INSERT OR REPLACE INTO market_data (asset_id, date, price, market_cap, total_volume) VALUES (:asset_id, :date, :price, :market_cap, :total_volume)",
+    'historical_prices': """
+        INSERT OR REPLACE INTO historical_prices
+        (asset_symbol, timestamp, open, high, low, close, volume)
+        VALUES (:asset_symbol, :timestamp, :open, :high, :low, :close, :volume)
+    """,
+    'chain_tvl_data': "INSERT OR REPLACE INTO chain_tvl_data (chain, timestamp, tvl) VALUES (:chain, :timestamp, :tvl)",
+    'ticker_snapshots': """
+        INSERT OR REPLACE INTO ticker_snapshots
+        (snapshot_ts, symbol_id, last, change_rate, volume_24h, quote_volume_24h)
+        VALUES (:snapshot_ts, :symbol_id, :last, :change_rate, :volume_24h, :quote_volume_24h)
+    """,
+    'orderbook_snapshots': """
+        INSERT OR REPLACE INTO orderbook_snapshots
+        (symbol_id, snapshot_ts, sequence, levels, mid, spread_bps, imbalance, bid_depth, ask_depth, bid_slope, ask_slope)
+        VALUES (:symbol_id, :snapshot_ts, :sequence, :levels, :mid, :spread_bps, :imbalance, :bid_depth, :ask_depth,
+                :bid_slope, :ask_slope)
+    """,
+    'forex_data': """
+        INSERT OR REPLACE INTO forex_data
+        (symbol, date, open, high, low, close, adjusted_close, volume)
+        VALUES (:symbol, :date, :open, :high, :low, :close, :adjusted_close, :volume)
+    """,
+}
+
+# Кой набор от данни (за data_version и HTTP API-то) променя всеки вид пакетен запис
+WRITE_DATASETS = {
+    'articles': 'news',
+    'market_data': 'market_data',
+    'historical_prices': 'candles',
+    'chain_tvl_data': 'tvl',
+    'forex_data': 'forex',
+    'ticker_snapshots': 'tickers',
+    'orderbook_snapshots': 'orderbook',
+}
+
+# Видовете записи, чиито символи се пазят като id от market_symbols (key = борсата)
+SYMBOL_INTERNED_KINDS = ('ticker_snapshots', 'orderbook_snapshots')
+
+# Наборите, достъпни за страниране през get_series_page; order_column е уникален в рамките на ключа
+SERIES_DATASETS = {
+    'candles': {
+        'table': 'historical_prices', 'columns': ['timestamp', 'open', 'high', 'low', 'close', 'volume'],
+        'key_filter': 'asset_symbol = ?', 'order_column': 'timestamp', 'time_column': 'timestamp',
+    },
+    'market_data': {
+        'table': 'market_data', 'columns': ['date', 'price', 'market_cap', 'total_volume'],
+        'key_filter': 'asset_id = ?', 'order_column': 'date', 'time_column': 'date',
+    },
+    'tvl': {
+        'table': 'chain_tvl_data', 'columns': ['timestamp', 'tvl'],
+        'key_filter': 'chain = ?', 'order_column': 'timestamp', 'time_column': 'timestamp',
+    },
+    'forex': {
+        'table': 'forex_data', 'columns': ['date', 'open', 'high', 'low', 'close', 'adjusted_close', 'volume'],
+        'key_filter': 'symbol = ?', 'order_column': 'date', 'time_column': 'date',
+    },
+    'tickers': {
+        'table': 'ticker_snapshots', 'columns': ['snapshot_ts', 'last', 'change_rate', 'volume_24h', 'quote_volume_24h'],
+        'key_filter': 'symbol_id IN (SELECT id FROM market_symbols WHERE symbol = ?)',
+        'order_column': 'snapshot_ts', 'time_column': 'snapshot_ts',
+    },
+    'news': {
+        'table': 'articles', 'columns': ['id', 'source', 'title', 'url', 'published_at', 'category', 'fetched_at',
+                                         'summary', 'sentiment', 'reasoning', 'investment_factors',
+                                         'sentiment_score', 'sentiment_confidence'],
+        'key_filter': 'id IN (SELECT article_id FROM article_assets WHERE asset_id = ?)',
+        'order_column': 'id', 'time_column': 'fetched_at', 'where': 'summary IS NOT NULL', 'descending': True,
+    },
+    'sentiment': {
+        'table': 'sentiment_index', 'columns': ['bucket_start', 'article_count', 'positive', 'negative', 'neutral',
+                                                'mean_score', 'decayed_index'],
+        'key_filter': 'scope = ?', 'order_column': 'bucket_start', 'time_column': 'bucket_start',
+        'where': 'resolution = 86400',
+    },
+}
+
+# Всички дневни серии за корелациите: (серия, ден 'YYYY-MM-DD', стойност); свещите и TVL дават последната стойност за деня
+DAILY_CLOSES_SQL = """
+SELECT 'cg:' || asset_id AS series, date AS day, price AS value
+FROM market_data WHERE price IS NOT NULL AND date >= :since_day AND date < :until_day
+UNION ALL
+SELECT 'kucoin:' || asset_symbol, day, close FROM (
+    SELECT asset_symbol, date(timestamp, 'unixepoch') AS day, close, MAX(timestamp)
+    FROM historical_prices WHERE timestamp >= :since_ts AND timestamp < :until_ts GROUP BY asset_symbol, day
+)
+UNION ALL
+SELECT 'fx:' || symbol, date, close FROM forex_data WHERE close IS NOT NULL AND date >= :since_day AND date < :until_day
+UNION ALL
+SELECT 'tvl:' || chain, day, tvl FROM (
+    SELECT chain, date(timestamp, 'unixepoch') AS day, tvl, MAX(timestamp)
+    FROM chain_tvl_data WHERE timestamp >= :since_ts AND timestamp < :until_ts GROUP BY chain, day
+)
+"""
+
 def dict_factory(cursor, row):
     """Преобразува резултатите от заявките в речници."""
     fields = [column[0] for column in cursor.description]
@@ -20,7 +132,8 @@ class DatabaseManager:
     def managed_connection(self):
         conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
+            # timeout = busy_timeout: при зает write lock изчакваме, вместо веднага "database is locked"
+            conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT)
             conn.row_factory = dict_factory
             yield conn
             conn.commit()
@@ -41,68 +154,593 @@ class DatabaseManager:
         except sqlite3.Error as e:
             logging.error(f"❌ Failed to execute SQL script: {e}")
 
+    def add_missing_columns(self, table: str, columns: Dict[str, str]):
+        """Добавя колоните (име -> тип), които липсват в съществуваща таблица."""
+        try:
+            with self.managed_connection() as conn:
+                existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+                for name, column_type in columns.items():
+                    if name not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+                        logging.info(f"🧱 Added column {table}.{name}.")
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to add columns to {table}: {e}")
+
+    # --- Пакетни записи (използват се и от WriteQueue в една обща транзакция) ---
+    @staticmethod
+    def prepare_rows(kind: str, rows: List[Dict[str, Any]], key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Привежда входните записи до параметрите на WRITE_SQL[kind]; key е символът за свещи/Forex или борсата за тикери."""
+        if kind == 'articles':
+            return [
+                {'source': a.get('source'), 'title': a.get('title'), 'url': a.get('url'),
+                 'published_at': a.get('published_at'), 'category': a.get('category')}
+                for a in rows if a.get('url')
+            ]
+        if kind == 'historical_prices':
+            return [dict(row, asset_symbol=key) for row in rows]
+        if kind == 'forex_data':
+            return [dict(row, symbol=key) for row in rows]
+        if kind in SYMBOL_INTERNED_KINDS:
+            return [dict(row, exchange=key) for row in rows]
+        return list(rows)
+
+    def write_rows(self, conn, kind: str, rows: List[Dict[str, Any]]) -> int:
+        """Изпълнява пакетния запис в подадената връзка (без commit)."""
+        if kind in SYMBOL_INTERNED_KINDS:
+            rows = self._intern_symbols(conn, rows)
+        cursor = conn.executemany(WRITE_SQL[kind], rows)
+        if kind == 'market_data':
+            for asset_id in {row['asset_id'] for row in rows}:
+                self._refresh_market_snapshot(conn, asset_id)
+        if cursor.rowcount:
+            self._bump_data_version(conn, WRITE_DATASETS[kind])
+        return cursor.rowcount
+
+    @staticmethod
+    def _intern_symbols(conn, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Добавя symbol_id към всеки ред, като регистрира непознатите (борса, символ) двойки."""
+        pairs = {(row['exchange'], row['symbol']) for row in rows}
+        conn.executemany("INSERT OR IGNORE INTO market_symbols (exchange, symbol) VALUES (?, ?)", pairs)
+        symbol_ids = {}
+        for exchange in {exchange for exchange, _ in pairs}:
+            for row in conn.execute("SELECT id, symbol FROM market_symbols WHERE exchange = ?", (exchange,)):
+                symbol_ids[(exchange, row['symbol'])] = row['id']
+        return [dict(row, symbol_id=symbol_ids[(row['exchange'], row['symbol'])]) for row in rows]
+
+    def _bump_data_version(self, conn, dataset: str):
+        """Увеличава версията на набора - ETag-овете на API-то се изчисляват от нея."""
+        conn.execute(
+            "INSERT INTO data_version (dataset, version, updated_at) VALUES (?, 1, CURRENT_TIMESTAMP) "
+            "ON CONFLICT(dataset) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP",
+            (dataset,)
+        )
+
+    def get_data_versions(self, raise_errors: bool = False) -> Dict[str, int]:
+        return dict(self._fetch_tuples("SELECT dataset, version FROM data_version", (), raise_errors))
+
     def save_articles(self, articles: List[Dict[str, Any]]):
-        sql = "INSERT OR IGNORE INTO articles (source, title, url, published_at, category) VALUES (:source, :title, :url, :published_at, :category)"
-        data_to_insert = [
-            {'source': a.get('source'), 'title': a.get('title'), 'url': a.get('url'),
-             'published_at': a.get('published_at'), 'category': a.get('category')}
-            for a in articles if a.get('url')
-        ]
         try:
             with self.managed_connection() as conn:
-                cursor = conn.cursor()
-                cursor.executemany(sql, data_to_insert)
-                return cursor.rowcount
+                return self.write_rows(conn, 'articles', self.prepare_rows('articles', articles))
         except sqlite3.Error:
             return 0
 
-    def get_unprocessed_articles(self, limit: int = 5) -> List[Dict[str, Any]]:
-        sql = "SELECT id, title, category FROM articles WHERE summary IS NULL ORDER BY fetched_at DESC LIMIT ?"
+    def get_unprocessed_articles(self, limit: int = 5, max_attempts: int = ANALYSIS_MAX_ATTEMPTS) -> List[Dict[str, Any]]:
+        """Най-новите неанализирани статии, без "отровените" (>= max_attempts неуспешни опита)."""
+        sql = """
+        SELECT a.id, a.title, a.category FROM articles a LEFT JOIN analysis_jobs j ON j.article_id = a.id
+        WHERE a.summary IS NULL AND COALESCE(j.attempts, 0) < ?
+        ORDER BY a.fetched_at DESC LIMIT ?
+        """
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(sql, (max_attempts, limit)).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def get_articles_after_id(self, after_id: int, limit: int = 64) -> List[Dict[str, Any]]:
+        """Връща статиите с id > after_id във възходящ ред (за инкрементална обработка)."""
+        sql = "SELECT id, title, category FROM articles WHERE id > ? ORDER BY id ASC LIMIT ?"
         try:
             with self.managed_connection() as conn:
-                return conn.execute(sql, (limit,)).fetchall()
+                return conn.execute(sql, (after_id, limit)).fetchall()
         except sqlite3.Error:
             return []
 
-    def update_article_analysis(self, article_id: int, analysis: Dict[str, Any]):
-        sql = "UPDATE articles SET summary = :summary, sentiment = :sentiment, reasoning = :reasoning, investment_factors = :investment_factors WHERE id = :id"
-        analysis['id'] = article_id
+    def get_articles_by_ids(self, article_ids: List[int]) -> List[Dict[str, Any]]:
+        """Връща статиите с дадените id-та, в реда, в който са подадени."""
+        if not article_ids:
+            return []
+        placeholders = ",".join("?" * len(article_ids))
+        sql = f"SELECT id, source, title, url, published_at, sentiment, summary FROM articles WHERE id IN ({placeholders})"
+        try:
+            with self.managed_connection() as conn:
+                rows = {row['id']: row for row in conn.execute(sql, list(article_ids)).fetchall()}
+            return [rows[i] for i in article_ids if i in rows]
+        except sqlite3.Error:
+            return []
+
+    def claim_articles_for_analysis(self, worker_id: str, limit: int = 5,
+                                    lease_seconds: int = ANALYSIS_LEASE_SECONDS,
+                                    max_attempts: int = ANALYSIS_MAX_ATTEMPTS,
+                                    article_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Атомарно заема партида необработени статии за даден worker.
+        BEGIN IMMEDIATE взима write lock-а преди SELECT-а, така че два процеса
+        никога не получават една и съща статия. Статии с изтекъл lease се
+        заемат наново, а тези с >= max_attempts опита се пропускат.
+        Приоритет: economic_event първо, после по-малко опити, после най-новите.
+        article_ids ограничава заемането до тези статии (целево обновяване на актив).
+        """
+        select_sql = """
+        SELECT a.id, a.title, a.category, a.published_at, COALESCE(j.attempts, 0) AS attempts,
+               b.body, b.content_hash, s.summary AS body_summary
+        FROM articles a
+        LEFT JOIN analysis_jobs j ON j.article_id = a.id
+        LEFT JOIN article_bodies b ON b.article_id = a.id AND b.status = 'ok'
+        LEFT JOIN body_summaries s ON s.content_hash = b.content_hash
+        WHERE a.summary IS NULL
+          AND COALESCE(j.attempts, 0) < :max_attempts
+          AND (j.lease_expires_at IS NULL OR j.lease_expires_at < :now)
+          AND (:article_ids IS NULL OR a.id IN (SELECT value FROM json_each(:article_ids)))
+        ORDER BY (a.category = 'economic_event') DESC, COALESCE(j.attempts, 0) ASC, a.fetched_at DESC
+        LIMIT :limit
+        """
+        lease_sql = """
+        INSERT INTO analysis_jobs (article_id, lease_owner, lease_expires_at, attempts, updated_at)
+        VALUES (:article_id, :lease_owner, :lease_expires_at, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT(article_id) DO UPDATE SET
+            lease_owner = excluded.lease_owner,
+            lease_expires_at = excluded.lease_expires_at,
+            attempts = analysis_jobs.attempts + 1,
+            updated_at = CURRENT_TIMESTAMP
+        """
+        now = time.time()
+        try:
+            with self.managed_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                claimed = conn.execute(select_sql, {
+                    'max_attempts': max_attempts, 'now': now, 'limit': limit,
+                    'article_ids': json.dumps(article_ids) if article_ids is not None else None
+                }).fetchall()
+                conn.executemany(lease_sql, [
+                    {'article_id': a['id'], 'lease_owner': worker_id, 'lease_expires_at': now + lease_seconds}
+                    for a in claimed
+                ])
+                for article in claimed:
+                    article['attempts'] += 1
+                return claimed
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to claim articles for worker {worker_id}: {e}")
+            return []
+
+    def release_article_lease(self, article_id: int, error: str = None):
+        """
+        Освобождава lease-а на статия, която не е анализирана успешно,
+        така че друг worker да може да опита отново (до poison лимита).
+        """
+        sql = "UPDATE analysis_jobs SET lease_owner = NULL, lease_expires_at = NULL, last_error = ?, updated_at = CURRENT_TIMESTAMP WHERE article_id = ?"
+        try:
+            with self.managed_connection() as conn:
+                conn.execute(sql, (error, article_id))
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to release lease for article #{article_id}: {e}")
+
+    def recover_expired_leases(self) -> int:
+        """
+        Освобождава lease-ите на worker-и, които са спрели, без да приключат.
+        Връща броя на възстановените статии.
+        """
+        sql = """
+        UPDATE analysis_jobs
+        SET lease_owner = NULL, lease_expires_at = NULL,
+            last_error = COALESCE(last_error, 'lease expired'), updated_at = CURRENT_TIMESTAMP
+        WHERE lease_expires_at IS NOT NULL AND lease_expires_at < ?
+        """
+        try:
+            with self.managed_connection() as conn:
+                recovered = conn.execute(sql, (time.time(),)).rowcount
+            if recovered:
+                logging.info(f"♻️ Recovered {recovered} abandoned analysis leases.")
+            return recovered
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to recover expired leases: {e}")
+            return 0
+
+    # --- Пълен текст на статиите ---
+    def get_articles_for_body_fetch(self, before_id: Optional[int] = None, limit: int = 200,
+                                    max_attempts: int = ARTICLE_FETCH_MAX_ATTEMPTS) -> List[Dict[str, Any]]:
+        """
+        Статиите без извлечен текст (или с неуспешни опити под лимита), най-новите
+        първо. before_id е курсор, така че едно пускане обхожда опашката по
+        порции и не взима наново адресите, които току-що е опитало.
+        """
+        sql = """
+        SELECT a.id, a.url, a.category FROM articles a
+        LEFT JOIN article_bodies b ON b.article_id = a.id
+        WHERE a.url IS NOT NULL AND a.id < ?
+          AND (b.article_id IS NULL OR (b.status = 'failed' AND b.attempts < ?))
+        ORDER BY a.id DESC LIMIT ?
+        """
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(sql, (before_id if before_id is not None else 2 ** 63 - 1, max_attempts, limit)).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to read articles for body extraction: {e}")
+            return []
+
+    def save_article_bodies(self, bodies: List[Dict[str, Any]]) -> int:
+        """Записва резултатите от извличането; всеки нов опит за същата статия увеличава attempts."""
+        sql = """
+        INSERT INTO article_bodies (article_id, url, status, http_status, content_hash, body, body_chars, attempts, error, fetched_at)
+        VALUES (:article_id, :url, :status, :http_status, :content_hash, :body, :body_chars, 1, :error, :fetched_at)
+        ON CONFLICT(article_id) DO UPDATE SET
+            url = excluded.url, status = excluded.status, http_status = excluded.http_status,
+            content_hash = excluded.content_hash, body = excluded.body, body_chars = excluded.body_chars,
+            attempts = article_bodies.attempts + 1, error = excluded.error, fetched_at = excluded.fetched_at
+        """
+        if not bodies:
+            return 0
+        try:
+            with self.managed_connection() as conn:
+                conn.executemany(sql, bodies)
+            return len(bodies)
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to save article bodies: {e}")
+            return 0
+
+    def save_body_summary(self, content_hash: str, model: str, summary: str):
+        sql = "INSERT OR IGNORE INTO body_summaries (content_hash, model, summary) VALUES (?, ?, ?)"
+        try:
+            with self.managed_connection() as conn:
+                conn.execute(sql, (content_hash, model, summary))
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to save body summary {content_hash[:12]}: {e}")
+
+    def count_poisoned_articles(self, max_attempts: int = ANALYSIS_MAX_ATTEMPTS) -> int:
+        """Брои статиите, които са изчерпали опитите си и вече не се заемат."""
+        sql = """
+        SELECT COUNT(*) AS poisoned FROM analysis_jobs j
+        JOIN articles a ON a.id = j.article_id
+        WHERE a.summary IS NULL AND j.attempts >= ?
+        """
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(sql, (max_attempts,)).fetchone()['poisoned']
+        except sqlite3.Error:
+            return 0
+
+    def update_article_analysis(self, article_id: int, analysis: Dict[str, Any],
+                                asset_ids: Optional[List[str]] = None, published_at: Optional[str] = None,
+                                category: Optional[str] = None):
+        """
+        Записва AI анализа и в същата транзакция обновява кофите в sentiment_index
+        и snapshot-ите на засегнатите активи. Икономическите новини
+        (category = economic_event) влизат и в обхвата SENTIMENT_MACRO_SCOPE.
+        """
+        sql = """
+        UPDATE articles SET summary = :summary, sentiment = :sentiment, reasoning = :reasoning,
+            investment_factors = :investment_factors, sentiment_score = :score, sentiment_confidence = :confidence
+        WHERE id = :id
+        """
+        release_sql = "UPDATE analysis_jobs SET lease_owner = NULL, lease_expires_at = NULL, last_error = NULL, updated_at = CURRENT_TIMESTAMP WHERE article_id = ?"
+        params = dict(analysis, id=article_id, score=analysis.get('score'), confidence=analysis.get('confidence'))
+        scopes = list(asset_ids or [])
+        if category == 'economic_event':
+            scopes.append(SENTIMENT_MACRO_SCOPE)
         try:
             with self.managed_connection() as conn:
-                conn.execute(sql, analysis)
+                conn.execute(sql, params)
+                conn.execute(release_sql, (article_id,))
+                self._bump_data_version(conn, 'news')
+                if scopes:
+                    self._record_article_sentiment(conn, article_id, scopes, params, published_at)
         except sqlite3.Error as e:
             logging.error(f"❌ Failed to update article #{article_id}: {e}")
 
+    @staticmethod
+    def _sentiment_weight(article: Dict[str, Any]) -> Tuple[float, float]:
+        """(score, confidence) на статия; старите анализи без score се оценяват по етикета."""
+        score, confidence = article.get('score'), article.get('confidence')
+        if score is None:
+            score = SENTIMENT_LABEL_SCORES.get(article.get('sentiment'), 0.0)
+            confidence = DEFAULT_SENTIMENT_CONFIDENCE if confidence is None else confidence
+        return float(score), float(DEFAULT_SENTIMENT_CONFIDENCE if confidence is None else confidence)
+
+    def _record_article_sentiment(self, conn, article_id: int, scopes: List[str],
+                                  article: Dict[str, Any], published_at: Optional[str]):
+        """
+        Добавя статията в часовата и дневната кофа на всеки обхват и
+        преизчислява затихващия индекс от тези кофи нататък. Snapshot-ите на
+        активите се обновяват веднага.
+        """
+        column = SENTIMENT_COLUMNS.get(article.get('sentiment'), 'neutral')
+        score, confidence = self._sentiment_weight(article)
+        timestamp = to_epoch_seconds(published_at) or int(time.time())
+        link_sql = "INSERT OR IGNORE INTO article_assets (asset_id, article_id) VALUES (?, ?)"
+        bucket_sql = f"""
+        INSERT INTO sentiment_index (scope, resolution, bucket_start, {column}, article_count, score_sum, weight_sum)
+        VALUES (:scope, :resolution, :bucket_start, 1, 1, :score_sum, :weight_sum)
+        ON CONFLICT(scope, resolution, bucket_start) DO UPDATE SET
+            {column} = {column} + 1, article_count = article_count + 1,
+            score_sum = score_sum + excluded.score_sum, weight_sum = weight_sum + excluded.weight_sum
+        """
+        for scope in scopes:
+            # Броим статията само веднъж, дори ако е анализирана повторно
+            if not conn.execute(link_sql, (scope, article_id)).rowcount:
+                continue
+            for resolution in SENTIMENT_INDEX_RESOLUTIONS:
+                bucket_start = floor_to_bucket(timestamp, resolution)
+                conn.execute(bucket_sql, {'scope': scope, 'resolution': resolution, 'bucket_start': bucket_start,
+                                          'score_sum': score * confidence, 'weight_sum': confidence})
+                self._propagate_sentiment_decay(conn, scope, resolution, bucket_start)
+            if scope != SENTIMENT_MACRO_SCOPE:
+                self._refresh_sentiment_snapshot(conn, scope)
+        self._bump_data_version(conn, 'sentiment')
+
+    @staticmethod
+    def _propagate_sentiment_decay(conn, scope: str, resolution: int, from_bucket: int = 0):
+        """
+        Преизчислява mean_score и затихващия индекс на кофите от from_bucket
+        нататък: всяка кофа наследява предходната, умножена по 0.5^(Δt / полуживот).
+        При нормален ред на статиите това е само последната кофа; закъсняла
+        статия обновява и по-новите кофи след нейната.
+        """
+        half_life = SENTIMENT_INDEX_RESOLUTIONS[resolution]
+        previous = conn.execute("""
+            SELECT bucket_start, decayed_score, decayed_weight FROM sentiment_index
+            WHERE scope = ? AND resolution = ? AND bucket_start < ? ORDER BY bucket_start DESC LIMIT 1
+        """, (scope, resolution, from_bucket)).fetchone()
+        rows = conn.execute("""
+            SELECT bucket_start, score_sum, weight_sum FROM sentiment_index
+            WHERE scope = ? AND resolution = ? AND bucket_start >= ? ORDER BY bucket_start
+        """, (scope, resolution, from_bucket)).fetchall()
+        last_bucket, decayed_score, decayed_weight = (
+            (previous['bucket_start'], previous['decayed_score'] or 0.0, previous['decayed_weight'] or 0.0)
+            if previous else (None, 0.0, 0.0)
+        )
+        updates = []
+        for row in rows:
+            if last_bucket is not None:
+                factor = 0.5 ** ((row['bucket_start'] - last_bucket) / half_life)
+                decayed_score, decayed_weight = decayed_score * factor, decayed_weight * factor
+            decayed_score += row['score_sum']
+            decayed_weight += row['weight_sum']
+            last_bucket = row['bucket_start']
+            updates.append((
+                row['score_sum'] / row['weight_sum'] if row['weight_sum'] > 0 else None,
+                decayed_score, decayed_weight, decayed_score / decayed_weight if decayed_weight > 0 else None,
+                scope, resolution, row['bucket_start'],
+            ))
+        conn.executemany("""
+            UPDATE sentiment_index SET mean_score = ?, decayed_score = ?, decayed_weight = ?, decayed_index = ?
+            WHERE scope = ? AND resolution = ? AND bucket_start = ?
+        """, updates)
+
+    def get_analyzed_articles_after_id(self, after_id: int, limit: int = 500) -> List[Dict[str, Any]]:
+        sql = "SELECT id, title, category, sentiment, published_at FROM articles WHERE id > ? AND summary IS NOT NULL ORDER BY id ASC LIMIT ?"
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(sql, (after_id, limit)).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def link_article_scopes(self, articles: List[Dict[str, Any]]) -> int:
+        """
+        Еднократно попълване на article_assets за вече анализирани статии
+        (всяка статия трябва да има ключ 'asset_ids'; economic_event получава и
+        обхвата SENTIMENT_MACRO_SCOPE). Индексът се преизгражда отделно с rebuild_sentiment_index.
+        """
+        sql = "INSERT OR IGNORE INTO article_assets (asset_id, article_id) VALUES (?, ?)"
+        links = []
+        for article in articles:
+            scopes = list(article['asset_ids'])
+            if article.get('category') == 'economic_event':
+                scopes.append(SENTIMENT_MACRO_SCOPE)
+            links.extend((scope, article['id']) for scope in scopes)
+        try:
+            with self.managed_connection() as conn:
+                conn.executemany(sql, links)
+            return len(links)
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to link articles to assets: {e}")
+            return 0
+
+    def has_sentiment_index(self) -> bool:
+        return bool(self._fetch_tuples("SELECT 1 FROM sentiment_index LIMIT 1", ()))
+
+    def rebuild_sentiment_index(self, batch_size: int = 5000) -> int:
+        """
+        Преизгражда sentiment_index изцяло от article_assets + articles (след
+        смяна на схемата или промяна в полуживота). Кофите се сумират в паметта -
+        техният брой е малък спрямо статиите - и всяка верига се затихва с едно минаване.
+        Връща броя кофи.
+        """
+        buckets: Dict[Tuple[str, int, int], Dict[str, Any]] = {}
+        sql = """
+        SELECT aa.asset_id AS scope, a.id, a.sentiment, a.sentiment_score AS score,
+               a.sentiment_confidence AS confidence, a.published_at, a.fetched_at
+        FROM article_assets aa JOIN articles a ON a.id = aa.article_id
+        WHERE a.summary IS NOT NULL AND (a.id > ? OR (a.id = ? AND aa.asset_id > ?))
+        ORDER BY a.id, aa.asset_id LIMIT ?
+        """
+        try:
+            with self.managed_connection() as conn:
+                cursor = (0, 0, '')
+                while True:
+                    rows = conn.execute(sql, cursor + (batch_size,)).fetchall()
+                    if not rows:
+                        break
+                    for row in rows:
+                        score, confidence = self._sentiment_weight(row)
+                        timestamp = to_epoch_seconds(row['published_at']) or to_epoch_seconds(row['fetched_at']) or int(time.time())
+                        column = SENTIMENT_COLUMNS.get(row['sentiment'], 'neutral')
+                        for resolution in SENTIMENT_INDEX_RESOLUTIONS:
+                            key = (row['scope'], resolution, floor_to_bucket(timestamp, resolution))
+                            bucket = buckets.setdefault(key, {'positive': 0, 'negative': 0, 'neutral': 0,
+                                                              'article_count': 0, 'score_sum': 0.0, 'weight_sum': 0.0})
+                            bucket[column] += 1
+                            bucket['article_count'] += 1
+                            bucket['score_sum'] += score * confidence
+                            bucket['weight_sum'] += confidence
+                    cursor = (rows[-1]['id'], rows[-1]['id'], rows[-1]['scope'])
+
+                conn.execute("DELETE FROM sentiment_index")
+                conn.executemany("""
+                    INSERT INTO sentiment_index (scope, resolution, bucket_start, positive, negative, neutral,
+                                                 article_count, score_sum, weight_sum)
+                    VALUES (:scope, :resolution, :bucket_start, :positive, :negative, :neutral,
+                            :article_count, :score_sum, :weight_sum)
+                """, [dict(values, scope=scope, resolution=resolution, bucket_start=bucket_start)
+                      for (scope, resolution, bucket_start), values in buckets.items()])
+                for scope, resolution in {(scope, resolution) for scope, resolution, _ in buckets}:
+                    self._propagate_sentiment_decay(conn, scope, resolution)
+                self._bump_data_version(conn, 'sentiment')
+            if buckets:
+                logging.info(f"📊 Rebuilt sentiment index: {len(buckets)} buckets.")
+            return len(buckets)
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to rebuild the sentiment index: {e}")
+            return 0
+
+    def get_sentiment_index(self, scope: str, resolution: int = 86400, start_ts: Optional[int] = None,
+                            end_ts: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Кофите на обхват (актив или SENTIMENT_MACRO_SCOPE) в [start_ts, end_ts] - едно четене по първичния ключ."""
+        sql = """
+        SELECT bucket_start, article_count, positive, negative, neutral, mean_score, decayed_index, decayed_weight
+        FROM sentiment_index WHERE scope = ? AND resolution = ? AND bucket_start BETWEEN ? AND ?
+        ORDER BY bucket_start
+        """
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(sql, (scope, resolution, start_ts or 0, end_ts if end_ts is not None else 2 ** 62)).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def _refresh_sentiment_snapshot(self, conn, asset_id: str):
+        """Сумира до 720 часови кофи от sentiment_index и последните резюмета в snapshot реда на актива."""
+        now_bucket = floor_to_bucket(int(time.time()), 3600)
+        params = {'asset_id': asset_id, 'oldest': now_bucket - (max(SNAPSHOT_SENTIMENT_WINDOWS.values()) - 1) * 3600}
+        sums = []
+        for window, hours in SNAPSHOT_SENTIMENT_WINDOWS.items():
+            params[f'since_{window}'] = now_bucket - (hours - 1) * 3600
+            for column in SENTIMENT_COLUMNS.values():
+                sums.append(f"COALESCE(SUM(CASE WHEN bucket_start >= :since_{window} THEN {column} END), 0) AS {column}_{window}")
+        counts = conn.execute(
+            f"SELECT {', '.join(sums)} FROM sentiment_index "
+            f"WHERE scope = :asset_id AND resolution = 3600 AND bucket_start >= :oldest",
+            params
+        ).fetchone()
+        latest = conn.execute(
+            "SELECT decayed_index FROM sentiment_index WHERE scope = ? AND resolution = 3600 ORDER BY bucket_start DESC LIMIT 1",
+            (asset_id,)
+        ).fetchone()
+
+        recent = conn.execute("""
+            SELECT a.title, a.summary, a.sentiment, a.published_at
+            FROM article_assets aa JOIN articles a ON a.id = aa.article_id
+            WHERE aa.asset_id = ? AND a.summary IS NOT NULL
+            ORDER BY aa.article_id DESC LIMIT ?
+        """, (asset_id, SNAPSHOT_RECENT_SUMMARIES)).fetchall()
+
+        counts['asset_id'] = asset_id
+        counts['sentiment_index'] = latest['decayed_index'] if latest else None
+        counts['recent_summaries'] = json.dumps(recent, ensure_ascii=False)
+        columns = list(counts.keys())
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != 'asset_id')
+        conn.execute(f"""
+            INSERT INTO asset_snapshots ({', '.join(columns)}, sentiment_updated_at)
+            VALUES ({', '.join(':' + c for c in columns)}, CURRENT_TIMESTAMP)
+            ON CONFLICT(asset_id) DO UPDATE SET {updates}, sentiment_updated_at = CURRENT_TIMESTAMP
+        """, counts)
+
+    def refresh_sentiment_snapshots(self, asset_ids: List[str]):
+        """
+        Преизчислява прозорците 24h/7d/30d - нужно е, защото те се "плъзгат"
+        с времето дори когато няма нови статии за даден актив.
+        """
+        try:
+            with self.managed_connection() as conn:
+                for asset_id in asset_ids:
+                    self._refresh_sentiment_snapshot(conn, asset_id)
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to refresh sentiment snapshots: {e}")
+
     def save_market_data(self, market_data: List[Dict[str, Any]]):
-        sql = "INSERT OR REPLACE INTO market_data (asset_id, date, price, market_cap, total_volume) VALUES (:asset_id, :date, :price, :market_cap, :total_volume)"
         try:
             with self.managed_connection() as conn:
-                cursor = conn.cursor()
-                cursor.executemany(sql, market_data)
-                return cursor.rowcount
+                return self.write_rows(conn, 'market_data', market_data)
         except sqlite3.Error:
             return 0
 
+    def refresh_market_snapshots(self, asset_ids: List[str]):
+        try:
+            with self.managed_connection() as conn:
+                for asset_id in asset_ids:
+                    self._refresh_market_snapshot(conn, asset_id)
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to refresh market snapshots: {e}")
+
+    def _refresh_market_snapshot(self, conn, asset_id: str):
+        """Обновява пазарната част на snapshot-а от последните два дневни реда (индексиран достъп)."""
+        rows = conn.execute(
+            "SELECT date, price, market_cap, total_volume FROM market_data WHERE asset_id = ? ORDER BY date DESC LIMIT 2",
+            (asset_id,)
+        ).fetchall()
+        if not rows:
+            return
+        latest = rows[0]
+        price_change = price_change_pct = None
+        if len(rows) > 1 and latest['price'] is not None and rows[1]['price'] is not None:
+            price_change = latest['price'] - rows[1]['price']
+            price_change_pct = (price_change / rows[1]['price']) * 100 if rows[1]['price'] != 0 else 0
+        conn.execute("""
+            INSERT INTO asset_snapshots (asset_id, price, price_change, price_change_pct, market_cap, total_volume, market_date, market_updated_at)
+            VALUES (:asset_id, :price, :price_change, :price_change_pct, :market_cap, :total_volume, :market_date, CURRENT_TIMESTAMP)
+            ON CONFLICT(asset_id) DO UPDATE SET
+                price = excluded.price, price_change = excluded.price_change, price_change_pct = excluded.price_change_pct,
+                market_cap = excluded.market_cap, total_volume = excluded.total_volume,
+                market_date = excluded.market_date, market_updated_at = CURRENT_TIMESTAMP
+        """, {
+            'asset_id': asset_id, 'price': latest['price'], 'price_change': price_change,
+            'price_change_pct': price_change_pct, 'market_cap': latest['market_cap'],
+            'total_volume': latest['total_volume'], 'market_date': latest['date']
+        })
+
+    def get_asset_snapshots(self) -> Dict[str, Dict[str, Any]]:
+        """Връща snapshot-ите на всички активи (по един ред на актив)."""
+        try:
+            with self.managed_connection() as conn:
+                rows = conn.execute("SELECT * FROM asset_snapshots").fetchall()
+            for row in rows:
+                row['recent_summaries'] = json.loads(row['recent_summaries']) if row['recent_summaries'] else []
+            return {row['asset_id']: row for row in rows}
+        except sqlite3.Error:
+            return {}
+
+    def get_asset_articles(self, asset_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Последните анализирани статии за даден актив."""
+        sql = """
+        SELECT a.id, a.source, a.title, a.url, a.published_at, a.summary, a.sentiment, a.reasoning, a.investment_factors
+        FROM article_assets aa JOIN articles a ON a.id = aa.article_id
+        WHERE aa.asset_id = ? AND a.summary IS NOT NULL
+        ORDER BY aa.article_id DESC LIMIT ?
+        """
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(sql, (asset_id, limit)).fetchall()
+        except sqlite3.Error:
+            return []
+
     def save_historical_prices(self, asset_symbol: str, klines: List[Dict[str, Any]]):
         """
         Записва или заменя исторически данни (свещи) за даден актив.
         """
-        sql = """
-        INSERT OR REPLACE INTO historical_prices 
-        (asset_symbol, timestamp, open, high, low, close, volume) 
-        VALUES (:asset_symbol, :timestamp, :open, :high, :low, :close, :volume)
-        """
-        data_to_insert = []
-        for kline in klines:
-            record = kline.copy()
-            record['asset_symbol'] = asset_symbol
-            data_to_insert.append(record)
         try:
             with self.managed_connection() as conn:
-                cursor = conn.cursor()
-                cursor.executemany(sql, data_to_insert)
-                logging.info(f"✅ Успешно записани/обновени {cursor.rowcount} записа за {asset_symbol} в 'historical_prices'.")
-                return cursor.rowcount
+                rowcount = self.write_rows(conn, 'historical_prices', self.prepare_rows('historical_prices', klines, asset_symbol))
+                logging.info(f"✅ Успешно записани/обновени {rowcount} записа за {asset_symbol} в 'historical_prices'.")
+                return rowcount
         except sqlite3.Error as e:
             logging.error(f"❌ Грешка при запис на исторически данни за {asset_symbol}: {e}")
             return 0
@@ -111,17 +749,11 @@ class DatabaseManager:
         """
         Записва или заменя TVL данни за различни блокчейн мрежи.
         """
-        sql = """
-        INSERT OR REPLACE INTO chain_tvl_data 
-        (chain, timestamp, tvl) 
-        VALUES (:chain, :timestamp, :tvl)
-        """
         try:
             with self.managed_connection() as conn:
-                cursor = conn.cursor()
-                cursor.executemany(sql, tvl_data)
-                logging.info(f"✅ Успешно записани/обновени {cursor.rowcount} TVL записа.")
-                return cursor.rowcount
+                rowcount = self.write_rows(conn, 'chain_tvl_data', tvl_data)
+                logging.info(f"✅ Успешно записани/обновени {rowcount} TVL записа.")
+                return rowcount
         except sqlite3.Error as e:
             logging.error(f"❌ Грешка при запис на TVL данни: {e}")
             return 0
@@ -131,27 +763,606 @@ class DatabaseManager:
         """
         Записва или заменя дневни Forex данни за даден символ.
         """
-        sql = """
-        INSERT OR REPLACE INTO forex_data
-        (symbol, date, open, high, low, close, adjusted_close, volume)
-        VALUES (:symbol, :date, :open, :high, :low, :close, :adjusted_close, :volume)
-        """
-        data_to_insert = []
-        for record in forex_records:
-            entry = record.copy()
-            entry['symbol'] = symbol
-            data_to_insert.append(entry)
-        
         try:
             with self.managed_connection() as conn:
-                cursor = conn.cursor()
-                cursor.executemany(sql, data_to_insert)
-                logging.info(f"✅ Успешно записани/обновени {cursor.rowcount} записа за {symbol} в 'forex_data'.")
-                return cursor.rowcount
+                rowcount = self.write_rows(conn, 'forex_data', self.prepare_rows('forex_data', forex_records, symbol))
+                logging.info(f"✅ Успешно записани/обновени {rowcount} записа за {symbol} в 'forex_data'.")
+                return rowcount
         except sqlite3.Error as e:
             logging.error(f"❌ Грешка при запис на Forex данни за {symbol}: {e}")
             return 0
             
+    # --- Snapshot-и на всички двойки (all-tickers) с интернирани символи ---
+    def save_ticker_snapshot(self, exchange: str, tickers: List[Dict[str, Any]]) -> int:
+        """Записва един all-tickers snapshot (всеки ред носи snapshot_ts и symbol)."""
+        try:
+            with self.managed_connection() as conn:
+                return self.write_rows(conn, 'ticker_snapshots', self.prepare_rows('ticker_snapshots', tickers, exchange))
+        except sqlite3.Error as e:
+            logging.error(f"❌ Грешка при запис на ticker snapshot за {exchange}: {e}")
+            return 0
+
+    def get_latest_ticker_snapshot_ts(self, exchange: str) -> Optional[int]:
+        rows = self._fetch_tuples(
+            "SELECT MAX(t.snapshot_ts) FROM ticker_snapshots t JOIN market_symbols s ON s.id = t.symbol_id WHERE s.exchange = ?",
+            (exchange,)
+        )
+        return rows[0][0] if rows else None
+
+    def get_ticker_screen(self, exchange: str, metric: str = 'change_rate', limit: int = 20, ascending: bool = False,
+                          quote: Optional[str] = None, min_quote_volume: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Скрийнинг върху последния snapshot на борсата: най-големи движения
+        (metric='change_rate') или лидери по обем (metric='quote_volume_24h').
+        quote ограничава до двойки в дадена валута (напр. 'USDT').
+        """
+        if metric not in ('change_rate', 'quote_volume_24h', 'volume_24h', 'last'):
+            raise ValueError(f"Unsupported screening metric: {metric}")
+        latest = self.get_latest_ticker_snapshot_ts(exchange)
+        if latest is None:
+            return []
+        sql = f"""
+        SELECT s.symbol, t.snapshot_ts, t.last, t.change_rate, t.volume_24h, t.quote_volume_24h
+        FROM ticker_snapshots t JOIN market_symbols s ON s.id = t.symbol_id
+        WHERE t.snapshot_ts = ? AND s.exchange = ? AND s.symbol LIKE ? AND COALESCE(t.quote_volume_24h, 0) >= ?
+          AND t.{metric} IS NOT NULL
+        ORDER BY t.{metric} {'ASC' if ascending else 'DESC'} LIMIT ?
+        """
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(sql, (latest, exchange, f"%-{quote}" if quote else "%", min_quote_volume, limit)).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error screening tickers for {exchange}: {e}")
+            return []
+
+    def save_orderbook_snapshots(self, exchange: str, snapshots: List[Dict[str, Any]]) -> int:
+        """Записва snapshot-и на стакана (редовете от orderbook.build_snapshot_row)."""
+        try:
+            with self.managed_connection() as conn:
+                return self.write_rows(conn, 'orderbook_snapshots', self.prepare_rows('orderbook_snapshots', snapshots, exchange))
+        except sqlite3.Error as e:
+            logging.error(f"❌ Грешка при запис на стакани за {exchange}: {e}")
+            return 0
+
+    def get_latest_orderbook_ts(self, exchange: str) -> Dict[str, int]:
+        """Символ -> времето на последния snapshot на стакана."""
+        return dict(self._fetch_tuples(
+            "SELECT s.symbol, MAX(o.snapshot_ts) FROM orderbook_snapshots o JOIN market_symbols s ON s.id = o.symbol_id "
+            "WHERE s.exchange = ? GROUP BY s.symbol", (exchange,)
+        ))
+
+    def get_orderbook_blobs(self, symbol: str, start_ts: int, end_ts: int, exchange: str = 'kucoin') -> List[tuple]:
+        """(snapshot_ts, levels) за декодиране с orderbook.decode_levels."""
+        sql = """
+        SELECT o.snapshot_ts, o.levels FROM orderbook_snapshots o JOIN market_symbols s ON s.id = o.symbol_id
+        WHERE s.exchange = ? AND s.symbol = ? AND o.snapshot_ts BETWEEN ? AND ? ORDER BY o.snapshot_ts
+        """
+        return self._fetch_tuples(sql, (exchange, symbol, start_ts, end_ts))
+
+    def get_orderbook_features(self, symbol: str, since_ts: int, exchange: str = 'kucoin') -> List[Dict[str, Any]]:
+        """Характеристиките на ликвидността без да се декодират нивата."""
+        sql = """
+        SELECT o.snapshot_ts, o.mid, o.spread_bps, o.imbalance, o.bid_depth, o.ask_depth, o.bid_slope, o.ask_slope
+        FROM orderbook_snapshots o JOIN market_symbols s ON s.id = o.symbol_id
+        WHERE s.exchange = ? AND s.symbol = ? AND o.snapshot_ts >= ? ORDER BY o.snapshot_ts
+        """
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(sql, (exchange, symbol, since_ts)).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error fetching order book features for {symbol}: {e}")
+            return []
+
+    # --- Прозорци от времеви редове за графиките (само нужния диапазон, без dict_factory) ---
+    def _fetch_tuples(self, sql: str, params: tuple, raise_errors: bool = False) -> List[tuple]:
+        """
+        Редовете като кортежи; при грешка логва и връща []. С raise_errors=True
+        грешката се пропуска нагоре - за API-то, което не бива да кешира празен
+        отговор като валиден.
+        """
+        try:
+            with self.managed_connection() as conn:
+                conn.row_factory = None
+                return conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            if raise_errors:
+                raise
+            logging.error(f"❌ Failed to fetch series: {e}")
+            return []
+
+    def get_candle_symbols(self) -> List[str]:
+        return [r[0] for r in self._fetch_tuples("SELECT DISTINCT asset_symbol FROM historical_prices ORDER BY asset_symbol", ())]
+
+    def get_candle_time_range(self, asset_symbol: str):
+        rows = self._fetch_tuples("SELECT MIN(timestamp), MAX(timestamp) FROM historical_prices WHERE asset_symbol = ?", (asset_symbol,))
+        return rows[0] if rows and rows[0][0] is not None else (None, None)
+
+    def get_candles_window(self, asset_symbol: str, start_ts: int, end_ts: int) -> List[tuple]:
+        """(timestamp, open, high, low, close, volume) в [start_ts, end_ts], възходящо."""
+        sql = """
+        SELECT timestamp, open, high, low, close, volume FROM historical_prices
+        WHERE asset_symbol = ? AND timestamp BETWEEN ? AND ? ORDER BY timestamp
+        """
+        return self._fetch_tuples(sql, (asset_symbol, start_ts, end_ts))
+
+    def get_market_data_window(self, asset_id: str, start_date: str, end_date: str) -> List[tuple]:
+        """(date, price, market_cap, total_volume) в [start_date, end_date], възходящо."""
+        sql = """
+        SELECT date, price, market_cap, total_volume FROM market_data
+        WHERE asset_id = ? AND date BETWEEN ? AND ? ORDER BY date
+        """
+        return self._fetch_tuples(sql, (asset_id, start_date, end_date))
+
+    def get_market_data_date_range(self, asset_id: str):
+        rows = self._fetch_tuples("SELECT MIN(date), MAX(date) FROM market_data WHERE asset_id = ?", (asset_id,))
+        return rows[0] if rows and rows[0][0] is not None else (None, None)
+
+    def get_tvl_chains(self) -> List[str]:
+        return [r[0] for r in self._fetch_tuples("SELECT DISTINCT chain FROM chain_tvl_data ORDER BY chain", ())]
+
+    def get_tvl_time_range(self):
+        rows = self._fetch_tuples("SELECT MIN(timestamp), MAX(timestamp) FROM chain_tvl_data", ())
+        return rows[0] if rows and rows[0][0] is not None else (None, None)
+
+    def get_tvl_window(self, chain: str, start_ts: int, end_ts: int) -> List[tuple]:
+        """(timestamp, tvl) в [start_ts, end_ts], възходящо."""
+        sql = "SELECT timestamp, tvl FROM chain_tvl_data WHERE chain = ? AND timestamp BETWEEN ? AND ? ORDER BY timestamp"
+        return self._fetch_tuples(sql, (chain, start_ts, end_ts))
+
+    # --- Вселена от активи ---
+    def seed_assets(self, assets: List[Dict[str, Any]]):
+        """Добавя активите, само ако ги няма - ръчните промени в таблицата се запазват."""
+        sql = """
+        INSERT OR IGNORE INTO assets (id, name, symbol, aliases, exchange_symbols)
+        VALUES (:id, :name, :symbol, :aliases, :exchange_symbols)
+        """
+        rows = [dict(a, aliases=json.dumps(a.get('aliases') or []), exchange_symbols=json.dumps(a.get('exchange_symbols') or {}))
+                for a in assets]
+        try:
+            with self.managed_connection() as conn:
+                return conn.executemany(sql, rows).rowcount
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error seeding assets: {e}")
+            return 0
+
+    def upsert_assets(self, assets: List[Dict[str, Any]]) -> int:
+        """
+        Синхронизира вселената от CoinGecko: новите активи се добавят с подадения
+        tier, а при съществуващите се обновяват само име, символ и ранг
+        (enabled, tier, синоними и борсови символи остават ръчно управлявани).
+        """
+        sql = """
+        INSERT INTO assets (id, name, symbol, aliases, exchange_symbols, refresh_tier, market_cap_rank)
+        VALUES (:id, :name, :symbol, :aliases, :exchange_symbols, :refresh_tier, :market_cap_rank)
+        ON CONFLICT(id) DO UPDATE SET
+            name = excluded.name, symbol = excluded.symbol,
+            market_cap_rank = excluded.market_cap_rank, updated_at = CURRENT_TIMESTAMP
+        """
+        rows = [dict(a, aliases=json.dumps(a.get('aliases') or []), exchange_symbols=json.dumps(a.get('exchange_symbols') or {}))
+                for a in assets]
+        try:
+            with self.managed_connection() as conn:
+                return conn.executemany(sql, rows).rowcount
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error upserting assets: {e}")
+            return 0
+
+    def get_tracked_assets(self, max_tier: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Включените активи (по желание - само до даден tier), по ранг."""
+        sql = "SELECT * FROM assets WHERE enabled = 1"
+        params: tuple = ()
+        if max_tier is not None:
+            sql += " AND refresh_tier <= ?"
+            params = (max_tier,)
+        sql += " ORDER BY market_cap_rank IS NULL, market_cap_rank, id"
+        try:
+            with self.managed_connection() as conn:
+                rows = conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error fetching tracked assets: {e}")
+            return []
+        for row in rows:
+            row['aliases'] = json.loads(row['aliases'] or '[]')
+            row['exchange_symbols'] = json.loads(row['exchange_symbols'] or '{}')
+        return rows
+
+    def get_tracked_asset_ids(self) -> List[str]:
+        return [r[0] for r in self._fetch_tuples("SELECT id FROM assets WHERE enabled = 1 ORDER BY id", ())]
+
+    def get_assets_due_for_snapshot(self, refresh_intervals: Dict[int, int]) -> List[str]:
+        """
+        Включените активи, чийто пазарен snapshot е по-стар от интервала на техния tier.
+        Гледа кога е изтеглен текущ snapshot (watermark 'market'), а не кога е писано
+        в market_data - историческите записи (backfill, поправка на дупки) не са snapshot.
+        """
+        interval = "CASE a.refresh_tier " + " ".join(
+            f"WHEN {int(tier)} THEN {int(seconds)}" for tier, seconds in refresh_intervals.items()
+        ) + f" ELSE {int(max(refresh_intervals.values()))} END"
+        sql = f"""
+        SELECT a.id FROM assets a
+        LEFT JOIN freshness_watermarks w ON w.source = 'market' AND w.key = a.id
+        WHERE a.enabled = 1 AND (
+            w.refreshed_at IS NULL
+            OR CAST(strftime('%s', 'now') AS INTEGER) - w.refreshed_at >= {interval}
+        )
+        ORDER BY a.refresh_tier, a.market_cap_rank IS NULL, a.market_cap_rank
+        """
+        return [r[0] for r in self._fetch_tuples(sql, ())]
+
+    def get_market_data_bounds(self, asset_ids: List[str]) -> Dict[str, Tuple[str, str]]:
+        """Първата и последната дата с пазарни данни за всеки актив - с една заявка."""
+        bounds: Dict[str, Tuple[str, str]] = {}
+        # На части - старите версии на SQLite позволяват до 999 параметъра в заявка
+        for i in range(0, len(asset_ids), 500):
+            chunk = asset_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            sql = f"SELECT asset_id, MIN(date), MAX(date) FROM market_data WHERE asset_id IN ({placeholders}) GROUP BY asset_id"
+            bounds.update((asset_id, (first, last)) for asset_id, first, last in self._fetch_tuples(sql, tuple(chunk)))
+        return bounds
+
+    def get_market_backfill_days(self, asset_ids: List[str], history_days: int = MARKET_BACKFILL_DAYS) -> Dict[str, int]:
+        """
+        Колко дни история да се изтеглят за всеки актив, на който тя липсва.
+        Решава по дълбочината на историята, а не само по последната дата:
+        активите от sync_assets имат днешен snapshot, но нито ден преди него.
+        (Актив, листнат преди по-малко от history_days, се тегли отново, докато не навърши толкова дни.)
+        """
+        bounds = self.get_market_data_bounds(asset_ids)
+        today = date.today()
+        plan = {}
+        for asset_id in asset_ids:
+            if asset_id not in bounds:
+                plan[asset_id] = history_days
+                continue
+            first, last = (date.fromisoformat(d[:10]) for d in bounds[asset_id])
+            if (today - first).days < history_days - 1:
+                plan[asset_id] = history_days
+            elif (today - last).days > 1:
+                plan[asset_id] = (today - last).days
+        return plan
+
+    # --- Квоти на външните API-та ---
+    def get_api_usage(self, provider: str, day: str) -> int:
+        try:
+            with self.managed_connection() as conn:
+                row = conn.execute("SELECT requests FROM api_usage WHERE provider = ? AND day = ?", (provider, day)).fetchone()
+                return row['requests'] if row else 0
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error fetching API usage for {provider}: {e}")
+            return 0
+
+    def record_api_usage(self, provider: str, day: str, requests: int = 1):
+        sql = """
+        INSERT INTO api_usage (provider, day, requests) VALUES (?, ?, ?)
+        ON CONFLICT(provider, day) DO UPDATE SET requests = requests + excluded.requests
+        """
+        try:
+            with self.managed_connection() as conn:
+                conn.execute(sql, (provider, day, requests))
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error recording API usage for {provider}: {e}")
+
+    # --- Дупки във времевите редове ---
+    def get_series_times(self, table: str, key_column: str, time_column: str) -> List[tuple]:
+        """(ключ, време) за всички редове на таблицата, подредени по ключ и време - вход за скенера на дупки."""
+        return self._fetch_tuples(
+            f"SELECT {key_column}, {time_column} FROM {table} ORDER BY {key_column}, {time_column}", ()
+        )
+
+    def get_series_gaps(self, dataset: Optional[str] = None, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if dataset:
+            clauses.append("dataset = ?")
+            params.append(dataset)
+        if statuses:
+            clauses.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(
+                    f"SELECT * FROM series_gaps {where} ORDER BY dataset, series_key, gap_start", params
+                ).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error fetching series gaps: {e}")
+            return []
+
+    def sync_series_gaps(self, dataset: str, gaps: List[Dict[str, Any]]):
+        """
+        Заменя активните (open/unrecoverable) дупки на набора с резултата от
+        последното сканиране; поправените остават в историята като repaired.
+        """
+        sql = """
+        INSERT OR REPLACE INTO series_gaps
+        (dataset, series_key, gap_start, gap_end, missing_points, status, attempts, first_seen, last_attempt, last_error)
+        VALUES (:dataset, :series_key, :gap_start, :gap_end, :missing_points, :status, :attempts,
+                COALESCE(:first_seen, CURRENT_TIMESTAMP), :last_attempt, :last_error)
+        """
+        try:
+            with self.managed_connection() as conn:
+                conn.execute("DELETE FROM series_gaps WHERE dataset = ? AND status IN ('open', 'unrecoverable')", (dataset,))
+                conn.executemany(sql, gaps)
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error saving series gaps for {dataset}: {e}")
+
+    def record_gap_attempt(self, dataset: str, series_key: str, start: int, end: int, error: Optional[str] = None):
+        """Отбелязва опит за поправка на всички отворени дупки на ключа в [start, end]."""
+        sql = """
+        UPDATE series_gaps SET attempts = attempts + 1, last_attempt = CURRENT_TIMESTAMP, last_error = ?
+        WHERE dataset = ? AND series_key = ? AND status = 'open' AND gap_start <= ? AND gap_end >= ?
+        """
+        try:
+            with self.managed_connection() as conn:
+                conn.execute(sql, (error, dataset, series_key, end, start))
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error recording gap repair attempt for {dataset}/{series_key}: {e}")
+
+    # --- Свежест на източниците ---
+    def record_freshness(self, source: str, keys: List[str], refreshed_at: Optional[int] = None):
+        """Отбелязва, че source е обновен за ключовете (актив за новините, символ за свещите)."""
+        refreshed_at = refreshed_at or int(time.time())
+        try:
+            with self.managed_connection() as conn:
+                conn.executemany(
+                    "INSERT INTO freshness_watermarks (source, key, refreshed_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(source, key) DO UPDATE SET refreshed_at = MAX(refreshed_at, excluded.refreshed_at)",
+                    [(source, key, refreshed_at) for key in keys]
+                )
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to record {source} freshness: {e}")
+
+    def get_watermark(self, source: str, key: str) -> Optional[int]:
+        rows = self._fetch_tuples("SELECT refreshed_at FROM freshness_watermarks WHERE source = ? AND key = ?", (source, key))
+        return rows[0][0] if rows else None
+
+    def set_watermark(self, source: str, key: str, value: int):
+        """Записва стойността както е (без MAX) - за курсори, които се превъртат, напр. следващият пакет на NewsAPI."""
+        try:
+            with self.managed_connection() as conn:
+                conn.execute(
+                    "INSERT INTO freshness_watermarks (source, key, refreshed_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(source, key) DO UPDATE SET refreshed_at = excluded.refreshed_at",
+                    (source, key, int(value))
+                )
+        except sqlite3.Error as e:
+            logging.error(f"❌ Failed to set {source}/{key} watermark: {e}")
+
+    def get_asset_freshness(self, asset_id: str, kucoin_symbol: Optional[str] = None) -> Dict[str, Optional[int]]:
+        """
+        Кога за последно е обновен всеки източник на актива (Unix секунди, None = никога):
+        market - текущият пазарен snapshot, news - новините, candles и orderbook - по KuCoin символа.
+        """
+        sql = """
+        SELECT
+            (SELECT refreshed_at FROM freshness_watermarks WHERE source = 'market' AND key = :asset_id),
+            (SELECT refreshed_at FROM freshness_watermarks WHERE source = 'news' AND key = :asset_id),
+            (SELECT refreshed_at FROM freshness_watermarks WHERE source = 'candles' AND key = :symbol),
+            (SELECT MAX(o.snapshot_ts) FROM orderbook_snapshots o JOIN market_symbols s ON s.id = o.symbol_id
+             WHERE s.exchange = 'kucoin' AND s.symbol = :symbol)
+        """
+        rows = self._fetch_tuples(sql, {'asset_id': asset_id, 'symbol': kucoin_symbol})
+        values = rows[0] if rows else (None, None, None, None)
+        return dict(zip(('market', 'news', 'candles', 'orderbook'), values))
+
+    def get_latest_candle_ts(self, asset_symbol: str) -> Optional[int]:
+        rows = self._fetch_tuples("SELECT MAX(timestamp) FROM historical_prices WHERE asset_symbol = ?", (asset_symbol,))
+        return rows[0][0] if rows else None
+
+    # --- Езеро със сурови отговори ---
+    def get_raw_blob_path(self, digest: str) -> Optional[str]:
+        """Пътят на вече записан blob със същото съдържание (ако има такъв)."""
+        rows = self._fetch_tuples("SELECT path FROM raw_responses WHERE digest = ? LIMIT 1", (digest,))
+        return rows[0][0] if rows else None
+
+    def record_raw_response(self, entry: Dict[str, Any]) -> bool:
+        """Добавя ред в манифеста; повторение на същата заявка със същото съдържание се игнорира."""
+        sql = """
+        INSERT OR IGNORE INTO raw_responses (provider, endpoint, params, digest, path, raw_bytes, stored_bytes, fetched_at)
+        VALUES (:provider, :endpoint, :params, :digest, :path, :raw_bytes, :stored_bytes, :fetched_at)
+        """
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(sql, entry).rowcount > 0
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error recording raw response for {entry.get('provider')}: {e}")
+            return False
+
+    def get_raw_responses(self, providers: Optional[List[str]] = None, since_ts: Optional[int] = None,
+                          until_ts: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Манифестът за повторна обработка, в реда на изтегляне (по-новите отговори печелят при INSERT OR REPLACE)."""
+        clauses, params = [], []
+        if providers:
+            clauses.append(f"provider IN ({','.join('?' * len(providers))})")
+            params.extend(providers)
+        if since_ts is not None:
+            clauses.append("fetched_at >= ?")
+            params.append(since_ts)
+        if until_ts is not None:
+            clauses.append("fetched_at < ?")
+            params.append(until_ts)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(
+                    f"SELECT id, provider, endpoint, params, path, fetched_at FROM raw_responses {where} ORDER BY fetched_at, id",
+                    params
+                ).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error fetching raw response manifest: {e}")
+            return []
+
+    # --- Alert-и ---
+    def get_alert_rule_states(self, rule_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not rule_ids:
+            return {}
+        placeholders = ",".join("?" * len(rule_ids))
+        try:
+            with self.managed_connection() as conn:
+                rows = conn.execute(f"SELECT rule_id, state FROM alert_rule_state WHERE rule_id IN ({placeholders})", list(rule_ids)).fetchall()
+                return {row['rule_id']: json.loads(row['state']) for row in rows}
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error loading alert rule states: {e}")
+            return {}
+
+    def save_alert_rule_states(self, states: Dict[str, Dict[str, Any]]):
+        sql = """
+        INSERT INTO alert_rule_state (rule_id, state, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(rule_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+        """
+        try:
+            with self.managed_connection() as conn:
+                conn.executemany(sql, [(rule_id, json.dumps(state)) for rule_id, state in states.items()])
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error saving alert rule states: {e}")
+
+    def save_alerts(self, alerts: List[Dict[str, Any]]) -> int:
+        sql = """
+        INSERT OR IGNORE INTO alerts (rule_id, key, message, value, event_ts, dedup_key)
+        VALUES (:rule_id, :key, :message, :value, :event_ts, :dedup_key)
+        """
+        rows = [dict(a, dedup_key=f"{a['rule_id']}@{a['event_ts']}") for a in alerts]
+        try:
+            with self.managed_connection() as conn:
+                return conn.executemany(sql, rows).rowcount
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error saving alerts: {e}")
+            return 0
+
+    def get_recent_alerts(self, limit: int = 50) -> List[Dict[str, Any]]:
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute("SELECT * FROM alerts ORDER BY event_ts DESC, id DESC LIMIT ?", (limit,)).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error fetching alerts: {e}")
+            return []
+
+    # --- Страниране за HTTP API-то ---
+    def get_series_page(self, dataset: str, key: Optional[str] = None, start: Any = None, end: Any = None,
+                        after: Any = None, limit: int = 1000, raise_errors: bool = False) -> List[tuple]:
+        """
+        Keyset страница от набор в SERIES_DATASETS: редовете след курсора `after`
+        (по order_column), в интервала [start, end] на time_column. Не зависи от
+        OFFSET, така че дълбоките страници струват колкото първата.
+        """
+        spec = SERIES_DATASETS[dataset]
+        clauses, params = [], []
+        if spec.get('where'):
+            clauses.append(spec['where'])
+        if key is not None:
+            clauses.append(spec['key_filter'])
+            params.append(key)
+        if start is not None:
+            clauses.append(f"{spec['time_column']} >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append(f"{spec['time_column']} <= ?")
+            params.append(end)
+        descending = spec.get('descending', False)
+        if after is not None:
+            clauses.append(f"{spec['order_column']} {'<' if descending else '>'} ?")
+            params.append(after)
+        sql = f"SELECT {', '.join(spec['columns'])} FROM {spec['table']}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {spec['order_column']} {'DESC' if descending else 'ASC'} LIMIT ?"
+        params.append(limit)
+        return self._fetch_tuples(sql, tuple(params), raise_errors)
+
+    # --- Панели за backtest-а ---
+    def get_price_rows(self, asset_ids: List[str]) -> List[tuple]:
+        """(asset_id, date, price) за подадените активи, подредени по дата."""
+        if not asset_ids:
+            return []
+        placeholders = ",".join("?" * len(asset_ids))
+        sql = f"SELECT asset_id, date, price FROM market_data WHERE asset_id IN ({placeholders}) AND price IS NOT NULL ORDER BY date"
+        return self._fetch_tuples(sql, tuple(asset_ids))
+
+    def get_daily_sentiment_rows(self, asset_ids: List[str]) -> List[tuple]:
+        """(asset_id, day_start, mean_score) - дневните кофи от sentiment_index (score в -1..1, претеглен по увереност)."""
+        if not asset_ids:
+            return []
+        placeholders = ",".join("?" * len(asset_ids))
+        sql = f"""
+        SELECT scope, bucket_start, mean_score FROM sentiment_index
+        WHERE resolution = 86400 AND scope IN ({placeholders}) AND mean_score IS NOT NULL
+        ORDER BY bucket_start
+        """
+        return self._fetch_tuples(sql, tuple(asset_ids))
+
+    # --- Дневни серии за корелациите ---
+    @staticmethod
+    def _daily_closes_params(since_day: Optional[str], until_day: Optional[str]) -> Dict[str, Any]:
+        since_day, until_day = since_day or '0000-01-01', until_day or '9999-12-31'
+        return {'since_day': since_day, 'until_day': until_day,
+                'since_ts': to_epoch_seconds(since_day) if since_day > '1970' else 0,
+                'until_ts': to_epoch_seconds(until_day) if until_day < '9999' else 2 ** 62}
+
+    def get_daily_closes(self, since_day: Optional[str] = None, until_day: Optional[str] = None) -> List[tuple]:
+        """(серия, ден, стойност) за дните в [since_day, until_day), подредени по ден."""
+        return self._fetch_tuples(f"SELECT * FROM ({DAILY_CLOSES_SQL}) ORDER BY day",
+                                  self._daily_closes_params(since_day, until_day))
+
+    def get_daily_closes_fingerprint(self, since_day: Optional[str] = None, until_day: Optional[str] = None) -> Tuple[int, float]:
+        """(брой, сума) на дневните точки в [since_day, until_day) - за проверка дали кешираните стари дни не са се променили."""
+        rows = self._fetch_tuples(f"SELECT COUNT(*), TOTAL(value) FROM ({DAILY_CLOSES_SQL})",
+                                  self._daily_closes_params(since_day, until_day))
+        return tuple(rows[0]) if rows else (0, 0.0)
+
+    def get_latest_daily_close_day(self) -> Optional[str]:
+        """Последният ден с данни в някой от наборите на get_daily_closes (по индексите - без пълно сканиране)."""
+        sql = """
+        SELECT MAX(day) FROM (
+            SELECT MAX(date) AS day FROM market_data
+            UNION ALL SELECT date(MAX(timestamp), 'unixepoch') FROM historical_prices
+            UNION ALL SELECT MAX(date) FROM forex_data
+            UNION ALL SELECT date(MAX(timestamp), 'unixepoch') FROM chain_tvl_data
+        )
+        """
+        rows = self._fetch_tuples(sql, ())
+        return rows[0][0] if rows else None
+
+    # --- Последни редове за зареждане на HotStore ---
+    def get_recent_candles(self, asset_symbol: str, limit: int, since_ts: Optional[int] = None) -> List[tuple]:
+        """Последните limit свещи (по желание - само от since_ts нататък), възходящо."""
+        sql = """
+        SELECT timestamp, open, high, low, close, volume FROM (
+            SELECT * FROM historical_prices WHERE asset_symbol = ? AND timestamp >= ?
+            ORDER BY timestamp DESC LIMIT ?
+        ) ORDER BY timestamp
+        """
+        return self._fetch_tuples(sql, (asset_symbol, since_ts if since_ts is not None else 0, limit))
+
+    def get_market_data_asset_ids(self) -> List[str]:
+        return [r[0] for r in self._fetch_tuples("SELECT DISTINCT asset_id FROM market_data ORDER BY asset_id", ())]
+
+    def get_recent_market_data(self, asset_id: str, limit: int, since_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Последните limit дневни реда на актива (по желание - от since_date нататък), възходящо."""
+        sql = """
+        SELECT asset_id, date, price, market_cap, total_volume FROM (
+            SELECT * FROM market_data WHERE asset_id = ? AND date >= ?
+            ORDER BY date DESC LIMIT ?
+        ) ORDER BY date
+        """
+        try:
+            with self.managed_connection() as conn:
+                return conn.execute(sql, (asset_id, since_date or '', limit)).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error fetching recent market data for {asset_id}: {e}")
+            return []
+
+    def get_latest_forex_dates(self, symbols: List[str]) -> Dict[str, str]:
+        """Последната записана дата за всеки Forex символ - с една заявка."""
+        if not symbols:
+            return {}
+        placeholders = ",".join("?" * len(symbols))
+        sql = f"SELECT symbol, MAX(date) AS latest_date FROM forex_data WHERE symbol IN ({placeholders}) GROUP BY symbol"
+        try:
+            with self.managed_connection() as conn:
+                return {row['symbol']: row['latest_date'] for row in conn.execute(sql, list(symbols)).fetchall()}
+        except sqlite3.Error as e:
+            logging.error(f"❌ Error fetching latest forex dates: {e}")
+            return {}
+
     def get_latest_market_data_date(self, asset_id: str) -> str or None:
         """
         Намира последната дата, за която имаме пазарни данни за даден актив.
@@ -0,0 +1,220 @@
+# src/database/hot_store.py
+
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+import numpy as np
+
+from config import HOT_STORE_CAPACITY
+from src.utils.time_utils import to_epoch_seconds
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CANDLE_DTYPE = np.dtype([
+    ('timestamp', 'i8'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+])
+
+
+class CandleRing:
+    """
+    Ring buffer с фиксиран размер върху предварително заделен структуриран масив.
+    Всеки ред се записва два пъти (на позиция i и i + capacity), затова
+    последните `size` реда винаги са непрекъснат участък от паметта и
+    view() връща срез без копиране.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.storage = np.zeros(2 * capacity, dtype=CANDLE_DTYPE)
+        self.head = 0  # Следващата позиция за запис в [0, capacity)
+        self.size = 0
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        if not self.size:
+            return None
+        return int(self.storage[self.head - 1 + self.capacity]['timestamp'])
+
+    def extend(self, rows: np.ndarray):
+        """
+        Добавя сортирани редове; по-стари от последния се пропускат, равен го
+        презаписва. При повторен timestamp в самата порция печели последният ред
+        (напр. дневната история на CoinGecko връща и 00:00, и "сега" за днес).
+        """
+        if not len(rows):
+            return
+        timestamps = rows['timestamp']
+        rows = rows[np.append(timestamps[1:] != timestamps[:-1], True)]
+        last_ts = self.last_timestamp
+        if last_ts is not None:
+            same = rows['timestamp'] == last_ts
+            if same.any():
+                # Текущата (незатворена) свещ се обновява на място
+                newest = rows[same][-1]
+                position = (self.head - 1) % self.capacity
+                self.storage[position] = newest
+                self.storage[position + self.capacity] = newest
+            rows = rows[rows['timestamp'] > last_ts]
+        if not len(rows):
+            return
+        rows = rows[-self.capacity:]
+        positions = (self.head + np.arange(len(rows))) % self.capacity
+        self.storage[positions] = rows
+        self.storage[positions + self.capacity] = rows
+        self.head = int((self.head + len(rows)) % self.capacity)
+        self.size = min(self.size + len(rows), self.capacity)
+
+    def view(self, n: Optional[int] = None) -> np.ndarray:
+        end = self.head + self.capacity
+        start = end - (self.size if n is None else min(n, self.size))
+        window = self.storage[start:end]
+        window.flags.writeable = False
+        return window
+
+
+class HotStore:
+    """
+    In-process кеш на последните N свещи за всеки символ.
+    Захранва се от ingestion стъпките след всеки запис в SQLite и може да се
+    възстанови (или догони) от базата при стартиране. Паметта на символ е
+    фиксирана: 2 x capacity x 48 байта. AlertEngine чете от него прозорците
+    на новите ценови правила.
+    Освен прозорците по символ, пази и матрица с последния ред на всеки символ,
+    така че заявки като "последна цена на всички символи" са един numpy срез.
+    """
+    def __init__(self, capacity: int = HOT_STORE_CAPACITY):
+        self.capacity = capacity
+        self._rings: Dict[str, CandleRing] = {}
+        self._index: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        self._latest = np.zeros(16, dtype=CANDLE_DTYPE)
+        self._lock = threading.RLock()
+
+    # --- Запис ---
+    def _ring_for(self, symbol: str) -> CandleRing:
+        ring = self._rings.get(symbol)
+        if ring is None:
+            ring = self._rings[symbol] = CandleRing(self.capacity)
+            self._index[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+            if len(self._symbols) > len(self._latest):
+                grown = np.zeros(len(self._latest) * 2, dtype=CANDLE_DTYPE)
+                grown[:len(self._latest)] = self._latest
+                self._latest = grown
+        return ring
+
+    def append(self, symbol: str, rows: np.ndarray):
+        """Добавя структурирани редове (CANDLE_DTYPE) за символ."""
+        if not len(rows):
+            return
+        # Стабилно сортиране - при равни timestamp-и редът на постъпване се запазва
+        rows = rows[np.argsort(rows['timestamp'], kind='stable')]
+        with self._lock:
+            ring = self._ring_for(symbol)
+            ring.extend(rows)
+            if ring.size:
+                self._latest[self._index[symbol]] = ring.view(1)[0]
+
+    def append_candles(self, symbol: str, klines: Iterable[Dict[str, Any]]):
+        """Свещи във формата на KucoinHandler.get_historical_data / historical_prices."""
+        rows = np.array([
+            (int(k['timestamp']), k['open'], k['high'], k['low'], k['close'], k['volume'])
+            for k in klines
+        ], dtype=CANDLE_DTYPE)
+        self.append(symbol, rows)
+
+    def append_market_data(self, market_data: Iterable[Dict[str, Any]]):
+        """Дневни редове от CoinGecko - цената е open/high/low/close на "свещта"."""
+        by_asset: Dict[str, list] = {}
+        for row in market_data:
+            timestamp = to_epoch_seconds(row['date'])
+            if timestamp is None or row.get('price') is None:
+                continue
+            price = row['price']
+            by_asset.setdefault(row['asset_id'], []).append(
+                (timestamp, price, price, price, price, row.get('total_volume') or 0.0)
+            )
+        for asset_id, rows in by_asset.items():
+            self.append(asset_id, np.array(rows, dtype=CANDLE_DTYPE))
+
+    # --- Четене ---
+    def symbols(self) -> List[str]:
+        with self._lock:
+            return list(self._symbols)
+
+    def window(self, symbol: str, n: Optional[int] = None) -> np.ndarray:
+        """Последните n свещи на символа като read-only view (без копиране)."""
+        with self._lock:
+            ring = self._rings.get(symbol)
+            return ring.view(n) if ring else np.zeros(0, dtype=CANDLE_DTYPE)
+
+    def closes(self, symbol: str, n: Optional[int] = None) -> np.ndarray:
+        return self.window(symbol, n)['close']
+
+    def latest(self) -> Tuple[List[str], np.ndarray]:
+        """Последният ред на всеки символ: (символи, структуриран масив в същия ред)."""
+        with self._lock:
+            count = len(self._symbols)
+            return list(self._symbols), self._latest[:count].copy()
+
+    def latest_close(self) -> Dict[str, float]:
+        symbols, rows = self.latest()
+        return dict(zip(symbols, rows['close'].tolist()))
+
+    # --- Синхронизация с SQLite ---
+    @classmethod
+    def from_database(cls, db_manager, capacity: int = HOT_STORE_CAPACITY) -> 'HotStore':
+        """Възстановява последните capacity реда на всеки символ от базата."""
+        store = cls(capacity)
+        store.sync_from_database(db_manager)
+        logging.info(f"🔥 Hot store loaded {len(store._symbols)} symbols from SQLite.")
+        return store
+
+    def sync_from_database(self, db_manager):
+        """
+        Догонва базата инкрементално: за всеки символ тегли само редовете след
+        последния timestamp в паметта (нужно за процеси, които не пишат сами,
+        напр. dashboard-ът).
+        """
+        for symbol in db_manager.get_candle_symbols():
+            since = self._last_timestamp(symbol)
+            rows = db_manager.get_recent_candles(symbol, self.capacity, since_ts=since)
+            if rows:
+                self.append(symbol, np.array(rows, dtype=CANDLE_DTYPE))
+        for asset_id in db_manager.get_market_data_asset_ids():
+            since = self._last_timestamp(asset_id)
+            since_date = datetime.fromtimestamp(since, tz=timezone.utc).strftime('%Y-%m-%d') if since else None
+            self.append_market_data(db_manager.get_recent_market_data(asset_id, self.capacity, since_date=since_date))
+
+    def _last_timestamp(self, symbol: str) -> Optional[int]:
+        with self._lock:
+            ring = self._rings.get(symbol)
+            return ring.last_timestamp if ring else None
+
+
+_default_store: Optional[HotStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_hot_store(db_manager=None) -> HotStore:
+    """Споделеният за процеса HotStore; при първо извикване се зарежда от SQLite."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            if db_manager is None:
+                from src.database.database_manager import DatabaseManager
+                db_manager = DatabaseManager()
+            _default_store = HotStore.from_database(db_manager)
+        return _default_store
+
+
+def peek_hot_store() -> Optional[HotStore]:
+    """Споделеният HotStore, ако вече е зареден; не чете базата."""
+    with _default_store_lock:
+        return _default_store
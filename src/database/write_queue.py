@@ -0,0 +1,197 @@
+# src/database/write_queue.py
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import WRITE_QUEUE_MAX_ROWS, WRITE_QUEUE_FLUSH_SECONDS
+from src.database.database_manager import DatabaseManager, WRITE_SQL
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_STOP = object()
+_FLUSH = object()  # Записва натрупаното веднага, без да чака flush_seconds
+
+
+class WriteQueue:
+    """
+    Един писател за всички пакетни записи в SQLite.
+    Произволен брой нишки подават записи чрез submit()/save_*() и получават
+    Future; отделна writer нишка ги натрупва и ги записва в една транзакция,
+    когато се съберат max_rows реда или най-старата заявка е чакала
+    flush_seconds. Така конкурентните ingestion стъпки не се борят за write
+    lock-а при всяко извикване. От asyncio код Future-ът се чака с
+    asyncio.wrap_future(), а последователният код ползва sync().
+    Резултатът на Future-а е rowcount на заявката (напр. само новите статии).
+    """
+    def __init__(self, db_manager: DatabaseManager, max_rows: int = WRITE_QUEUE_MAX_ROWS,
+                 flush_seconds: float = WRITE_QUEUE_FLUSH_SECONDS, max_pending: int = 10000):
+        self.db_manager = db_manager
+        self.max_rows = max_rows
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)  # Ограничен - естествен backpressure
+        self._closed = False
+        self.stats = {'requests': 0, 'rows': 0, 'transactions': 0, 'failed_requests': 0}
+        self._writer = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+    # --- Производители ---
+    def submit(self, kind: str, rows: List[Dict[str, Any]], key: Optional[str] = None) -> Future:
+        """Поставя записи от вид kind (ключ в WRITE_SQL) в опашката."""
+        if kind not in WRITE_SQL:
+            raise ValueError(f"Unknown write kind: {kind}")
+        if self._closed:
+            raise RuntimeError("WriteQueue is closed")
+        future: Future = Future()
+        prepared = DatabaseManager.prepare_rows(kind, rows, key)
+        if not prepared:
+            future.set_result(0)
+            return future
+        self._queue.put((kind, prepared, future))
+        return future
+
+    def save_articles(self, articles: List[Dict[str, Any]]) -> Future:
+        return self.submit('articles', articles)
+
+    def save_market_data(self, market_data: List[Dict[str, Any]]) -> Future:
+        return self.submit('market_data', market_data)
+
+    def save_historical_prices(self, asset_symbol: str, klines: List[Dict[str, Any]]) -> Future:
+        return self.submit('historical_prices', klines, asset_symbol)
+
+    def save_chain_tvl_data(self, tvl_data: List[Dict[str, Any]]) -> Future:
+        return self.submit('chain_tvl_data', tvl_data)
+
+    def save_forex_data(self, symbol: str, forex_records: List[Dict[str, Any]]) -> Future:
+        return self.submit('forex_data', forex_records, symbol)
+
+    def save_ticker_snapshot(self, exchange: str, tickers: List[Dict[str, Any]]) -> Future:
+        return self.submit('ticker_snapshots', tickers, exchange)
+
+    def save_orderbook_snapshots(self, exchange: str, snapshots: List[Dict[str, Any]]) -> Future:
+        return self.submit('orderbook_snapshots', snapshots, exchange)
+
+    def flush(self):
+        """Кара писателя да запише натрупаното сега, без да чака flush_seconds (не блокира)."""
+        if not self._closed:
+            self._queue.put(_FLUSH)
+
+    def sync(self) -> 'SyncWriter':
+        """Изглед със save_* методите на DatabaseManager, които чакат записа и връщат броя редове."""
+        return SyncWriter(self)
+
+    def close(self, timeout: Optional[float] = None):
+        """Записва всичко чакащо и спира writer нишката."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join(timeout)
+        logging.info(f"🗄️ Write queue closed: {self.stats}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- Писател ---
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch: List[Tuple[str, List[Dict[str, Any]], Future]] = []
+            rows = 0
+            deadline = time.monotonic() + self.flush_seconds
+            stop = False
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if item is _FLUSH:
+                    break
+                # Отменените заявки се пропускат; след това cancel() вече не може да успее
+                if item[2].set_running_or_notify_cancel():
+                    batch.append(item)
+                    rows += len(item[1])
+                if rows >= self.max_rows:
+                    break
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._flush(batch)
+                except Exception as e:  # Writer нишката не бива да умира - иначе следващите Future-и висят вечно
+                    logging.exception("❌ Write queue flush failed unexpectedly")
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+            if stop:
+                return
+
+    def _flush(self, batch: List[Tuple[str, List[Dict[str, Any]], Future]]):
+        # Всички заявки в една транзакция (един commit); всяка със своя executemany, за да има свой rowcount
+        try:
+            with self.db_manager.managed_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row_counts = [self.db_manager.write_rows(conn, kind, rows) for kind, rows, _ in batch]
+        except Exception as e:
+            # Една лоша заявка не бива да проваля останалите - повтаряме ги поотделно
+            logging.warning(f"⚠️ Batched write of {len(batch)} requests failed ({e}). Retrying individually.")
+            self._flush_individually(batch)
+            return
+        self.stats['transactions'] += 1
+        for (_, rows, future), row_count in zip(batch, row_counts):
+            self._record(future, len(rows), row_count)
+
+    def _flush_individually(self, batch: List[Tuple[str, List[Dict[str, Any]], Future]]):
+        for kind, rows, future in batch:
+            try:
+                with self.db_manager.managed_connection() as conn:
+                    row_count = self.db_manager.write_rows(conn, kind, rows)
+            except Exception as e:  # Writer нишката не бива да умира - иначе Future-ите висят вечно
+                self.stats['failed_requests'] += 1
+                future.set_exception(e)
+                continue
+            self.stats['transactions'] += 1
+            self._record(future, len(rows), row_count)
+
+    def _record(self, future: Future, submitted: int, row_count: int):
+        self.stats['requests'] += 1
+        self.stats['rows'] += submitted
+        future.set_result(row_count)
+
+
+class SyncWriter:
+    """
+    Синхронен изглед към WriteQueue със save_* интерфейса на DatabaseManager:
+    всяко извикване чака своя Future и връща броя записани редове (0 при
+    грешка, както DatabaseManager). Така последователните pipeline стъпки
+    пишат през общия писател без да се пренаписват около Future-и.
+    Щом някой чака синхронно, писателят записва веднага заедно с вече
+    натрупаното от другите нишки, вместо да чака flush_seconds.
+    """
+    def __init__(self, write_queue: WriteQueue):
+        self.write_queue = write_queue
+
+    def __getattr__(self, name: str):
+        if not name.startswith('save_'):
+            raise AttributeError(name)
+        submit = getattr(self.write_queue, name)
+
+        def save(*args) -> int:
+            try:
+                future = submit(*args)
+                self.write_queue.flush()
+                return future.result()
+            except Exception as e:
+                logging.error(f"❌ Queued write {name} failed: {e}")
+                return 0
+        return save
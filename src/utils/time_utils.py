@@ -0,0 +1,49 @@
+# src/utils/time_utils.py
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Union
+
+
+def to_epoch_seconds(value: Union[str, int, float, datetime, None]) -> Optional[int]:
+    """
+    Преобразува дата от произволен източник в Unix timestamp (секунди, UTC).
+    Поддържа ISO 8601 (NewsAPI), RFC 822 (RSS), 'YYYY-MM-DD' и числа
+    в секунди или милисекунди. Връща None, ако стойността не може да се разчете.
+    """
+    if value is None or value == '' or value == 'N/A':
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, (int, float)):
+        # Стойности след 2286 г. в секунди са почти сигурно милисекунди
+        return int(value / 1000) if value > 10_000_000_000 else int(value)
+    else:
+        text = str(value).strip()
+        try:
+            dt = datetime.fromisoformat(text.replace('Z', '+00:00'))
+        except ValueError:
+            try:
+                dt = parsedate_to_datetime(text)
+            except (TypeError, ValueError):
+                return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def floor_to_bucket(timestamp: int, bucket_seconds: int) -> int:
+    """Закръгля timestamp надолу до началото на кофата (напр. 3600 за час)."""
+    return timestamp - timestamp % bucket_seconds
+
+
+def count_business_days(after: date, until: date) -> int:
+    """Брой делнични дни в интервала (after, until] - колко дневни бара липсват."""
+    if until <= after:
+        return 0
+    days = (until - after).days
+    full_weeks, remainder = divmod(days, 7)
+    count = full_weeks * 5
+    for i in range(1, remainder + 1):
+        if (after + timedelta(days=i)).weekday() < 5:
+            count += 1
+    return count
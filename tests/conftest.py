@@ -0,0 +1,23 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# Същият трик като в scripts/: коренът на проекта трябва да е в sys.path за `config` и `src`
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """Празна база с пълната схема от scripts/init_db.py."""
+    from scripts.init_db import CREATE_TABLES_SQL, ADDED_COLUMNS
+    from src.database.database_manager import DatabaseManager
+
+    manager = DatabaseManager(str(tmp_path / "test.sqlite"))
+    manager.execute_script(CREATE_TABLES_SQL)
+    for table, columns in ADDED_COLUMNS.items():
+        manager.add_missing_columns(table, columns)
+    return manager
@@ -0,0 +1,57 @@
+# tests/test_alert_engine.py
+import numpy as np
+import pytest
+
+from src.analysis.alert_engine import AlertEngine, AlertRule, PercentMoveRule
+from src.database.hot_store import CANDLE_DTYPE, HotStore
+
+DAY = 86400
+
+
+class ListSink:
+    def __init__(self):
+        self.alerts = []
+
+    def send(self, alerts):
+        self.alerts.extend(alerts)
+
+
+def _store_with_history(symbol: str, closes):
+    store = HotStore(capacity=16)
+    store.append(symbol, np.array([(i * DAY, c, c, c, c, 1.0) for i, c in enumerate(closes)], dtype=CANDLE_DTYPE))
+    return store
+
+
+def test_hot_store_loader_runs_only_when_a_rule_needs_seeding(db_manager):
+    store = _store_with_history('BTC', [100.0, 100.0, 100.0])
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return store
+
+    rule = PercentMoveRule('move', 'BTC', window=2, pct=5.0)
+    sink = ListSink()
+    engine = AlertEngine(db_manager, rules=[rule], sinks=[sink], max_event_age=10 ** 10, hot_store=loader)
+
+    engine.on_candles('ETH', [{'timestamp': 3 * DAY, 'close': 1.0, 'volume': 1.0}])
+    assert calls == []
+
+    alerts = engine.on_candles('BTC', [{'timestamp': 3 * DAY, 'close': 110.0, 'volume': 1.0}])
+    assert calls == [1]
+    assert [a['rule_id'] for a in alerts] == ['move']
+
+    # Правилото вече има състояние - следващите събития не зареждат store-а
+    engine.on_candles('BTC', [{'timestamp': 4 * DAY, 'close': 111.0, 'volume': 1.0}])
+    assert calls == [1]
+
+
+def test_alert_rule_requires_evaluate():
+    with pytest.raises(TypeError):
+        AlertRule('base', 'BTC')
+
+    class IncompleteRule(AlertRule):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteRule('incomplete', 'BTC')
@@ -0,0 +1,81 @@
+# tests/test_api.py
+import json
+
+import pytest
+
+from config import API_MAX_PAGE_SIZE
+from src.api.server import DataAPI
+
+
+def _insert_candles(db_manager, symbol: str, timestamps):
+    with db_manager.managed_connection() as conn:
+        conn.executemany(
+            "INSERT INTO historical_prices (asset_symbol, timestamp, open, high, low, close, volume) "
+            "VALUES (?, ?, 1, 1, 1, 1, 1)",
+            [(symbol, ts) for ts in timestamps]
+        )
+
+
+def _get(api, path, **params):
+    status, headers, body = api.handle(path, {k: [str(v)] for k, v in params.items()}, None)
+    return status, headers, json.loads(body)
+
+
+def test_cursor_pages_through_all_rows_once(db_manager):
+    _insert_candles(db_manager, 'BTCUSDT', range(0, 25 * 60, 60))
+    api = DataAPI(db_manager)
+
+    seen, cursor = [], None
+    while True:
+        params = {'symbol': 'BTCUSDT', 'limit': 10}
+        if cursor:
+            params['cursor'] = cursor
+        status, _, payload = _get(api, '/api/candles', **params)
+        assert status == 200
+        seen.extend(row['timestamp'] for row in payload['data'])
+        cursor = payload['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == list(range(0, 25 * 60, 60))
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', str(API_MAX_PAGE_SIZE + 1), 'abc'])
+def test_invalid_limit_is_rejected(db_manager, limit):
+    status, headers, payload = _get(DataAPI(db_manager), '/api/candles', symbol='BTCUSDT', limit=limit)
+    assert status == 400
+    assert 'limit' in payload['error']
+    assert 'ETag' not in headers
+
+
+def test_database_error_is_500_and_not_cached(db_manager):
+    api = DataAPI(db_manager)
+    with db_manager.managed_connection() as conn:
+        conn.execute("ALTER TABLE market_data RENAME TO market_data_broken")
+
+    status, headers, payload = _get(api, '/api/market_data', asset_id='bitcoin')
+    assert status == 500
+    assert payload == {'error': "Database error."}
+    assert 'ETag' not in headers
+
+    # Таблицата се връща без смяна на data_version - кешът не бива да пази празна страница
+    with db_manager.managed_connection() as conn:
+        conn.execute("ALTER TABLE market_data_broken RENAME TO market_data")
+        conn.execute("INSERT INTO market_data (asset_id, date, price, market_cap, total_volume) "
+                     "VALUES ('bitcoin', '2024-01-01', 42000, 1, 1)")
+
+    status, headers, payload = _get(api, '/api/market_data', asset_id='bitcoin')
+    assert status == 200
+    assert [row['price'] for row in payload['data']] == [42000]
+    assert 'ETag' in headers
+
+
+def test_stream_database_error_is_500_before_headers(db_manager):
+    api = DataAPI(db_manager)
+    with db_manager.managed_connection() as conn:
+        conn.execute("DROP TABLE historical_prices")
+
+    status, headers, body = api.handle('/api/candles', {'symbol': ['BTCUSDT'], 'format': ['ndjson']}, None)
+    assert status == 500
+    assert 'ETag' not in headers
+    assert json.loads(body) == {'error': "Database error."}
@@ -0,0 +1,39 @@
+# tests/test_backtester.py
+import numpy as np
+
+from src.analysis.backtester import lag, run_strategy, strategy_positions
+
+PARAMS = {'fast': 2, 'slow': 4, 'sent_window': 1, 'sent_entry': 0.5, 'sent_exit': -0.5}
+
+
+def _uptrend(days: int = 30) -> np.ndarray:
+    return np.linspace(100.0, 200.0, days)[:, None]
+
+
+def test_lag_shifts_rows_down():
+    values = np.arange(6, dtype=float).reshape(3, 2)
+    lagged = lag(values)
+    assert np.isnan(lagged[0]).all()
+    np.testing.assert_array_equal(lagged[1:], values[:-1])
+
+
+def test_sentiment_spike_moves_position_only_from_next_bar():
+    """Новини от ден t (известни в края му) не може да търгуват доходността от t към t + 1."""
+    close = _uptrend()
+    sentiment = np.zeros_like(close)
+    spike = 10
+    sentiment[spike] = 1.0
+
+    position = strategy_positions(close, sentiment, PARAMS)
+
+    assert position[spike, 0] == 0.0
+    assert position[spike + 1, 0] == 1.0
+
+
+def test_spike_on_last_day_is_not_traded():
+    close = _uptrend()
+    sentiment = np.zeros_like(close)
+    sentiment[-1] = 1.0
+    metrics = run_strategy(close, sentiment, PARAMS)
+    assert metrics['trades'][0] == 0.0
+    assert metrics['total_return'][0] == 0.0
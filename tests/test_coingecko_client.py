@@ -0,0 +1,25 @@
+# tests/test_coingecko_client.py
+import time
+
+from src.data_ingestion.coingecko_client import CoinGeckoClient
+
+
+def test_chart_and_markets_rows_use_the_same_utc_date(monkeypatch):
+    # 2024-01-01 23:30 UTC е вече 2 януари в UTC+2 - датата не бива да зависи от часовата зона на машината
+    monkeypatch.setenv('TZ', 'Europe/Sofia')
+    if hasattr(time, 'tzset'):
+        time.tzset()
+    try:
+        ts_ms = 1704151800 * 1000
+        chart = CoinGeckoClient._process_chart_data('bitcoin', {
+            'prices': [[ts_ms, 42000.0]], 'market_caps': [[ts_ms, 1.0]], 'total_volumes': [[ts_ms, 2.0]],
+        })
+        markets = CoinGeckoClient.markets_to_market_data([
+            {'id': 'bitcoin', 'current_price': 42000.0, 'last_updated': '2024-01-01T23:30:00.000Z'},
+        ])
+    finally:
+        monkeypatch.delenv('TZ')
+        if hasattr(time, 'tzset'):
+            time.tzset()
+
+    assert chart[0]['date'] == markets[0]['date'] == '2024-01-01'
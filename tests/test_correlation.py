@@ -0,0 +1,65 @@
+# tests/test_correlation.py
+import numpy as np
+import pytest
+
+from src.analysis.correlation import CorrelationService
+
+ASSETS = ['bitcoin', 'ethereum', 'solana']
+WINDOWS = [25, 40]
+
+
+def _market_rows(prices: np.ndarray, first_day: int):
+    start = np.datetime64('2024-01-01') + first_day
+    return [
+        {'asset_id': asset, 'date': str(start + day), 'price': float(prices[day, column]),
+         'market_cap': 1.0, 'total_volume': 1.0}
+        for day in range(len(prices)) for column, asset in enumerate(ASSETS)
+    ]
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(7)
+    return 100.0 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(130, len(ASSETS))), axis=0))
+
+
+def _assert_same(incremental: CorrelationService, rebuilt: CorrelationService):
+    rebuilt.refresh()
+    assert incremental.labels == rebuilt.labels
+    np.testing.assert_array_equal(incremental.dates, rebuilt.dates)
+    for window in WINDOWS:
+        a, b = incremental.matrices(window), rebuilt.matrices(window)
+        for name in ('corr', 'beta', 'vol'):
+            np.testing.assert_allclose(getattr(a, name), getattr(b, name), rtol=1e-9, atol=1e-12, equal_nan=True)
+        np.testing.assert_array_equal(a.overlap, b.overlap)
+
+
+def test_incremental_append_matches_full_rebuild(db_manager, prices, monkeypatch):
+    db_manager.save_market_data(_market_rows(prices[:100], 0))
+    service = CorrelationService(db_manager, windows=WINDOWS, history_days=60)
+    assert service.refresh()
+
+    # Последният кеширан ден се обновява (незатворен бар) и идват нови дни, по-стари отпадат от history_days
+    revised = prices[99:].copy()
+    revised[0] *= 1.01
+    db_manager.save_market_data(_market_rows(revised, 99))
+    monkeypatch.setattr(service, '_rebuild', lambda: pytest.fail("expected an incremental update"))
+    assert service.refresh()
+    monkeypatch.undo()
+
+    rebuilt = CorrelationService(db_manager, windows=WINDOWS, history_days=60)
+    _assert_same(service, rebuilt)
+    assert len(service.dates) == 60
+
+
+def test_changed_history_inside_the_panel_forces_rebuild(db_manager, prices):
+    db_manager.save_market_data(_market_rows(prices[:100], 0))
+    service = CorrelationService(db_manager, windows=WINDOWS, history_days=60)
+    service.refresh()
+
+    # Поправка на ден вътре в панела (напр. запълнена дупка) - инкременталното обновяване не е валидно
+    repaired = prices[70:71].copy() * 1.05
+    db_manager.save_market_data(_market_rows(repaired, 70))
+    service.refresh()
+
+    _assert_same(service, CorrelationService(db_manager, windows=WINDOWS, history_days=60))
@@ -0,0 +1,57 @@
+# tests/test_downsampling.py
+import numpy as np
+
+from src.analysis.downsampling import bucket_ohlcv, lttb, lttb_indices
+
+
+def _series(n: int = 1000):
+    x = np.arange(n, dtype=float)
+    return x, np.sin(x / 25.0)
+
+
+def test_lttb_keeps_endpoints_and_returns_threshold_points():
+    x, y = _series()
+    idx = lttb_indices(x, y, 100)
+    assert len(idx) == 100
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_picks_one_point_from_each_bucket():
+    x, y = _series()
+    threshold = 50
+    idx = lttb_indices(x, y, threshold)
+    edges = np.linspace(1, len(x) - 1, threshold - 1).astype(np.int64)
+    buckets = np.searchsorted(edges, idx[1:-1], side='right') - 1
+    np.testing.assert_array_equal(buckets, np.arange(threshold - 2))
+
+
+def test_lttb_preserves_a_single_spike():
+    x = np.arange(500, dtype=float)
+    y = np.zeros(500)
+    y[321] = 10.0
+    sampled_x, sampled_y = lttb(x, y, 20)
+    assert 321.0 in sampled_x
+    assert sampled_y.max() == 10.0
+
+
+def test_lttb_returns_everything_below_threshold():
+    x, y = _series(10)
+    np.testing.assert_array_equal(lttb_indices(x, y, 50), np.arange(10))
+    np.testing.assert_array_equal(lttb_indices(x, y, 2), np.arange(10))
+
+
+def test_bucket_ohlcv_keeps_extremes_and_volume():
+    n = 1000
+    ts = np.arange(n, dtype=np.int64) * 60
+    close = np.linspace(100.0, 200.0, n)
+    high, low = close + 1.0, close - 1.0
+    high[437], low[612] = 500.0, 1.0
+    volume = np.ones(n)
+    buckets = bucket_ohlcv(ts, close, high, low, close, volume, max_buckets=40)
+
+    assert len(buckets['timestamp']) <= 40
+    assert buckets['timestamp'][0] == ts[0]
+    assert buckets['open'][0] == close[0] and buckets['close'][-1] == close[-1]
+    assert buckets['high'].max() == 500.0 and buckets['low'].min() == 1.0
+    assert buckets['volume'].sum() == n
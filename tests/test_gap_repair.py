@@ -0,0 +1,41 @@
+# tests/test_gap_repair.py
+import numpy as np
+
+from src.data_ingestion.gap_repair import DAY, _to_epoch_array, find_gaps, merge_ranges
+
+
+def _days(*dates):
+    return _to_epoch_array(list(dates))
+
+
+def test_fixed_calendar_finds_missing_points_per_key():
+    keys = np.array(['BTC'] * 4 + ['ETH'] * 2)
+    times = np.array([0, 1, 4, 5, 0, 1], dtype=np.int64) * DAY
+    gaps = find_gaps(keys, times, DAY)
+    assert gaps == {'BTC': [(2 * DAY, 3 * DAY, 2)]}
+
+
+def test_fixed_calendar_does_not_bridge_two_keys():
+    keys = np.array(['BTC', 'ETH'])
+    times = np.array([0, 10], dtype=np.int64) * DAY
+    assert find_gaps(keys, times, DAY) == {}
+
+
+def test_business_calendar_ignores_weekends():
+    # Петък -> понеделник не е дупка
+    keys = np.array(['EURUSD'] * 2)
+    assert find_gaps(keys, _days('2024-01-05', '2024-01-08'), DAY, calendar='business') == {}
+
+
+def test_business_calendar_counts_only_weekdays():
+    # Четвъртък -> вторник: липсват петък и понеделник
+    keys = np.array(['EURUSD'] * 2)
+    gaps = find_gaps(keys, _days('2024-01-04', '2024-01-09'), DAY, calendar='business')
+    start, end = _days('2024-01-05', '2024-01-08')
+    assert gaps == {'EURUSD': [(int(start), int(end), 2)]}
+
+
+def test_merge_ranges_joins_close_gaps_and_splits_long_ones():
+    gaps = [(2 * DAY, 3 * DAY, 2), (5 * DAY, 5 * DAY, 1)]
+    assert merge_ranges(gaps, DAY, slack=1) == [(2 * DAY, 5 * DAY)]
+    assert merge_ranges([(0, 9 * DAY, 10)], DAY, max_span=4 * DAY) == [(0, 3 * DAY), (4 * DAY, 7 * DAY), (8 * DAY, 9 * DAY)]
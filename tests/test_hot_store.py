@@ -0,0 +1,44 @@
+# tests/test_hot_store.py
+import numpy as np
+
+from src.database.hot_store import CANDLE_DTYPE, CandleRing, HotStore
+
+
+def _rows(*pairs):
+    return np.array([(ts, close, close, close, close, 1.0) for ts, close in pairs], dtype=CANDLE_DTYPE)
+
+
+def test_duplicate_timestamps_in_one_batch_keep_last_row():
+    ring = CandleRing(8)
+    ring.extend(_rows((60, 1.0), (120, 2.0), (120, 3.0), (180, 4.0)))
+    window = ring.view()
+    assert window['timestamp'].tolist() == [60, 120, 180]
+    assert window['close'].tolist() == [1.0, 3.0, 4.0]
+
+
+def test_duplicate_of_last_timestamp_updates_in_place():
+    ring = CandleRing(8)
+    ring.extend(_rows((60, 1.0), (120, 2.0)))
+    ring.extend(_rows((120, 5.0), (120, 6.0), (180, 7.0)))
+    window = ring.view()
+    assert window['timestamp'].tolist() == [60, 120, 180]
+    assert window['close'].tolist() == [1.0, 6.0, 7.0]
+
+
+def test_market_data_today_and_now_points_collapse_to_one_day():
+    store = HotStore(capacity=8)
+    store.append_market_data([
+        {'asset_id': 'bitcoin', 'date': '2024-01-01', 'price': 100.0, 'total_volume': 1.0},
+        {'asset_id': 'bitcoin', 'date': '2024-01-02', 'price': 110.0, 'total_volume': 1.0},
+        {'asset_id': 'bitcoin', 'date': '2024-01-02', 'price': 115.0, 'total_volume': 2.0},
+    ])
+    assert store.closes('bitcoin').tolist() == [100.0, 115.0]
+    assert store.latest_close() == {'bitcoin': 115.0}
+
+
+def test_ring_wraps_and_keeps_last_capacity_rows():
+    ring = CandleRing(4)
+    ring.extend(_rows(*[(ts, float(ts)) for ts in range(1, 4)]))
+    ring.extend(_rows(*[(ts, float(ts)) for ts in range(4, 8)]))
+    assert ring.view()['timestamp'].tolist() == [4, 5, 6, 7]
+    assert ring.view(2)['timestamp'].tolist() == [6, 7]
@@ -0,0 +1,67 @@
+# tests/test_write_queue.py
+import threading
+import time
+
+from src.database.write_queue import WriteQueue
+
+
+def _klines(*timestamps):
+    return [{'timestamp': ts, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0} for ts in timestamps]
+
+
+def _gate_writes(db_manager):
+    """Спира писателя в първия запис, докато тестът не отвори вратата."""
+    gate, entered = threading.Event(), threading.Event()
+    write_rows = db_manager.write_rows
+
+    def gated(conn, kind, rows):
+        entered.set()
+        gate.wait(5)
+        return write_rows(conn, kind, rows)
+
+    db_manager.write_rows = gated
+    return gate, entered
+
+
+def test_future_result_is_rowcount_of_each_request(db_manager):
+    with WriteQueue(db_manager, flush_seconds=0.05) as write_queue:
+        first = write_queue.save_historical_prices('BTCUSDT', _klines(60, 120))
+        second = write_queue.save_historical_prices('ETHUSDT', _klines(60))
+        empty = write_queue.save_historical_prices('XRPUSDT', [])
+        assert (first.result(5), second.result(5), empty.result(5)) == (2, 1, 0)
+
+
+def test_cancelled_request_is_skipped_and_writer_survives(db_manager):
+    gate, entered = _gate_writes(db_manager)
+    with WriteQueue(db_manager, max_rows=1, flush_seconds=0.05) as write_queue:
+        blocking = write_queue.save_historical_prices('BTCUSDT', _klines(60))
+        assert entered.wait(5)
+        cancelled = write_queue.save_historical_prices('ETHUSDT', _klines(60))
+        assert cancelled.cancel()
+        gate.set()
+
+        assert blocking.result(5) == 1
+        assert write_queue.save_historical_prices('XRPUSDT', _klines(60)).result(5) == 1
+
+    with db_manager.managed_connection() as conn:
+        symbols = {row['asset_symbol'] for row in conn.execute("SELECT asset_symbol FROM historical_prices")}
+    assert symbols == {'BTCUSDT', 'XRPUSDT'}
+
+
+def test_failed_request_sets_exception_and_others_succeed(db_manager):
+    with WriteQueue(db_manager, flush_seconds=0.05) as write_queue:
+        bad = write_queue.submit('historical_prices', [{'timestamp': 60, 'open': None, 'high': 1, 'low': 1,
+                                                        'close': 1, 'volume': 1}], 'BTCUSDT')
+        good = write_queue.save_historical_prices('ETHUSDT', _klines(60))
+        assert good.result(5) == 1
+        assert bad.exception(5) is not None
+    assert write_queue.stats['failed_requests'] == 1
+
+
+def test_sync_writer_does_not_wait_out_the_flush_deadline(db_manager):
+    with WriteQueue(db_manager, flush_seconds=30) as write_queue:
+        writer = write_queue.sync()
+        started = time.monotonic()
+        assert writer.save_historical_prices('BTCUSDT', _klines(60, 120)) == 2
+        assert writer.save_historical_prices('ETHUSDT', _klines(60)) == 1
+        assert time.monotonic() - started < 5